@@ -10,10 +10,116 @@ import urllib.request, urllib.error, urllib.parse
 import datetime
 import os
 import argparse
+import shutil
 import yfinance as yf
 import re
 
-def get_data(data_path, ls_symbols, src="Yahoo"):
+# The first date of a full download.
+FULL_START = "2006-01-01"
+
+def fetch_yahoo(symbol, start, end):
+    """
+    Download the daily prices of symbol from start up to end (exclusive) with yfinance.
+    The Dividends and Stock Splits of the period are included as columns.
+    """
+    return yf.download(symbol, start=start, end=end, actions=True)
+
+def fetch_yahoo_actions(symbol):
+    """ Download all the dividends and splits of symbol with yfinance. """
+    return yf.Ticker(symbol).actions
+
+def write_csv(file, frame):
+    """ Write frame to file through a temporary file, so readers never see a partial file. """
+    tmp_file = file + ".tmp"
+    frame.to_csv(tmp_file)
+    os.replace(tmp_file, file)
+
+def append_csv(file, frame):
+    """
+    Append the rows of frame to the CSV file, in the column order of the file header.
+    The rows are appended to a copy of the file, which then replaces the file.
+    """
+    with open(file, "r") as f:
+        header = f.readline().strip().split(',')
+    columns = [c.strip() for c in header[1:]]
+    tmp_file = file + ".tmp"
+    shutil.copyfile(file, tmp_file)
+    with open(tmp_file, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    with open(tmp_file, "a", newline='') as f:
+        frame[columns].to_csv(f, header=False, date_format="%Y-%m-%d")
+    os.replace(tmp_file, file)
+
+def has_new_actions(data):
+    """ True if data has a dividend or a split, so the adjusted history has to be rewritten. """
+    for col in ["Dividends", "Stock Splits"]:
+        if col in data and (data[col].fillna(0) != 0).any():
+            return True
+    return False
+
+def yahoo_symbol(symbol_name):
+    """ The Yahoo ticker of symbol_name. Indices like $SPX are ^SPX at Yahoo. """
+    if symbol_name[0] == '$':
+        return '^' + symbol_name[1:]
+    return symbol_name
+
+def local_last(data_path, symbol_name):
+    """ The date of the last local row of symbol_name, or None if there is no usable local file. """
+    file = os.path.join(data_path, symbol_name + ".csv")
+    if not os.path.isfile(file) or os.stat(file).st_size <= 6:
+        return None
+    last = latest_local_dt(data_path, symbol_name)
+    if last.year <= 1950:
+        # latest_local_dt found no date on the last line.
+        return None
+    return last
+
+def save_full(data_path, symbol_name, data, actions):
+    """ Replace the local files of symbol_name with the whole history in data and actions. """
+    write_csv(os.path.join(data_path, symbol_name + ".csv"), data.drop(columns=["Dividends", "Stock Splits"], errors="ignore"))
+    write_csv(os.path.join(data_path, symbol_name + "_actions" + ".csv"), actions)
+    return len(data)
+
+def save_delta(data_path, symbol_name, data, last):
+    """
+    Append the rows of data after last to the local file of symbol_name.
+    Return the number of new rows, or None without writing anything if the
+    new rows have a dividend or a split and the whole history has to be downloaded again.
+    """
+    data = data[data.index > last]
+    if has_new_actions(data):
+        return None
+    if len(data) > 0:
+        append_csv(os.path.join(data_path, symbol_name + ".csv"), data)
+    return len(data)
+
+def pull_yahoo(data_path, symbol_name, incremental=False, fetch=fetch_yahoo, fetch_actions=fetch_yahoo_actions, now=None):
+    """
+    Download symbol_name into data_path.
+    If incremental is True and there is a local file, only the dates after the last local row are
+    fetched and appended. The whole history is downloaded again when there is no local file, or when
+    the new dates have a dividend or a split.
+        :param fetch: fetch(symbol, start, end) returns a DataFrame of daily prices indexed by date.
+        :param fetch_actions: fetch_actions(symbol) returns a DataFrame of all the dividends and splits.
+        :return: The number of new rows.
+    """
+    symbol = yahoo_symbol(symbol_name)
+    if now is None:
+        now = datetime.datetime.now()
+    end = now.strftime("%Y-%m-%d")
+    last = local_last(data_path, symbol_name) if incremental else None
+    if last is not None:
+        start = (last + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+        if start >= end:
+            return 0
+        rows = save_delta(data_path, symbol_name, fetch(symbol, start, end), last)
+        if rows is not None:
+            return rows
+    return save_full(data_path, symbol_name, fetch(symbol, FULL_START, end), fetch_actions(symbol))
+
+def get_data(data_path, ls_symbols, src="Yahoo", incremental=False, fetch=fetch_yahoo, fetch_actions=fetch_yahoo_actions):
 
     # Create path if it doesn't exist
     if not (os.access(data_path, os.F_OK)):
@@ -59,15 +165,7 @@ def get_data(data_path, ls_symbols, src="Yahoo"):
                 print("URL Error for stock: {0} at {1}".format(symbol_name, url))
         elif src == "Yahoo":
             try:
-                data = yf.download(symbol, start="2006-01-01", end=_now.strftime("%Y-%m-%d"))
-                data.to_csv(file)
-                actions = yf.Ticker(symbol).actions
-                actions.to_csv(actions_file)
-            except:
-                miss_ctr += 1
-                print("Unable to fetch data for stock: {0}".format(symbol_name))
-            try:    
-                stock = data.getHistorical()
+                pull_yahoo(data_path, symbol_name, incremental, fetch, fetch_actions, _now)
             except:
                 miss_ctr += 1
                 print("Unable to fetch data for stock: {0}".format(symbol_name))
@@ -105,7 +203,8 @@ def read_symbols(s_symbols_file):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser( description='Yahoo Stock Data Pull.')
     parser.add_argument('-ticks', default="symbols.txt", help="symbols file. This contains a ticker per line")
+    parser.add_argument('-incremental', action='store_true', help="only download the dates after the last local row")
     args = parser.parse_args()
     path = './'
     ls_symbols = read_symbols(args.ticks)
-    get_data(path, ls_symbols)
+    get_data(path, ls_symbols, incremental=args.incremental)
@@ -0,0 +1,102 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+In-process cache of the full price history of each symbol.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+import pandas as pd
+from .colstore import as_i8, locate, ACTION_COLUMNS
+
+
+class FrameCache(object):
+    """
+    A least recently used cache of DataFrames, bounded by bytes.
+    Each entry remembers when it was loaded, so the reader can ask for
+    entries that are not older than a given number of hours, and the
+    source it was read from, so an entry of a file that changed since
+    is dropped.
+    One instance, shared_cache, is shared by every DataAccess in the process.
+    """
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stall_hours, source=None):
+        """
+        Return the cached DataFrame of key, or None if there is no entry,
+        the entry is older than stall_hours, or it was put with another source.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                frame, nbytes, loaded, put_source = entry
+                if time.time() - loaded <= stall_hours * 3600 and put_source == source:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return frame
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, frame, source=None):
+        """
+        Add frame, read from source, then evict the least recently used entries until the cache fits in max_bytes.
+        source is anything that changes with the files frame was read from, like colstore.source_key.
+        """
+        nbytes = int(frame.memory_usage(index=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (frame, nbytes, time.time(), source)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, data_path, symbol):
+        """ Drop every entry of symbol in data_path. """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == data_path and k[1] == symbol]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _drop(self, key):
+        frame, nbytes, loaded, source = self._entries.pop(key)
+        self.nbytes -= nbytes
+
+
+def frame_window(frame, ts_list, data_item, actions=True):
+    """
+    Return the rows of a full history frame on ts_list.
+    Dates missing from the history are NaN, except the actions columns:
+    no dividend, and the split factor of the next date in the history.
+    """
+    index = pd.DatetimeIndex(ts_list)
+    cols = list(data_item) + (ACTION_COLUMNS if actions else [])
+    where, found = locate(frame.index.asi8, as_i8(index))
+    if found is None:
+        window = frame.iloc[where][cols].copy()
+        window.index = index
+        return window
+    window = frame[cols].reindex(index)
+    if actions:
+        window['Dividends'] = window['Dividends'].fillna(0)
+        window['Stock Splits'] = frame['Stock Splits'].reindex(index, method='bfill').fillna(1)
+    return window
+
+
+shared_cache = FrameCache()
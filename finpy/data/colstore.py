@@ -0,0 +1,274 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Memory-mapped columnar store of the Yahoo CSV files.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Column positions of the Yahoo CSV files, the same mapping used by
+# DataAccess.get_data_hardread.
+FIELD_COLUMNS = {
+    'open': 1,
+    'high': 2,
+    'low': 3,
+    'actual_close': 4,
+    'close': 5,
+    'volume': 6,
+}
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']
+# Prices are float32, as in get_data_hardread. Volume is float64, which holds
+# every share count exactly, where float32 is exact only up to 2**24.
+FIELD_DTYPES = dict((field, np.float64 if field == 'volume' else np.float32) for field in FIELD_COLUMNS)
+# Part of the name of an entry, so a change of the layout rebuilds the entries.
+FORMAT = 2
+
+
+def as_i8(ts_list):
+    """ Return the timestamps as an int64 array of nanoseconds. """
+    return pd.DatetimeIndex(ts_list).asi8
+
+
+def locate(dates, ts):
+    """
+    Find ts inside the sorted int64 array dates.
+    Return (slice, None) when ts is a contiguous run of dates, so the
+    columns are sliced instead of gathered.
+    Otherwise return (positions, found), where found marks the timestamps
+    that exist in dates.
+    """
+    n = len(ts)
+    if n == 0:
+        return slice(0, 0), None
+    lo = int(np.searchsorted(dates, ts[0]))
+    hi = lo + n
+    if hi <= len(dates) and np.array_equal(dates[lo:hi], ts):
+        return slice(lo, hi), None
+    pos = np.searchsorted(dates, ts)
+    pos = np.minimum(pos, max(len(dates) - 1, 0))
+    if len(dates) == 0:
+        return pos, np.zeros(n, dtype=bool)
+    found = dates[pos] == ts
+    return pos, found
+
+
+def take(col, where, found):
+    """ Take the rows located by locate() from col. Missing rows are NaN. """
+    if found is None:
+        return col[where]
+    if len(col) == 0:
+        return np.full(len(found), np.nan, dtype=col.dtype)
+    return np.where(found, col[where], col.dtype.type(np.nan))
+
+
+def empty_frame(ts_list, data_item, actions=True):
+    """ A frame of NaN for a symbol that cannot be read. """
+    cols = list(data_item) + (ACTION_COLUMNS if actions else [])
+    return pd.DataFrame(np.nan, index=pd.DatetimeIndex(ts_list), columns=cols, dtype=np.float32)
+
+
+def source_key(data_path, symbol):
+    """
+    The mtimes and sizes of the CSV and the actions files of symbol in data_path,
+    as "mtime-size_mtime-size". The actions part is 0-0 if there is no actions file.
+    """
+    st = os.stat(os.path.join(data_path, symbol + ".csv"))
+    key = "%d-%d" % (st.st_mtime_ns, st.st_size)
+    try:
+        st = os.stat(os.path.join(data_path, symbol + "_actions.csv"))
+        key += "_%d-%d" % (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key += "_0-0"
+    return key
+
+
+def split_factor(splits):
+    """
+    Cumulative split factor from each date to the end of the history.
+    It is the reversed cumulative product of 'Stock Splits', where 0
+    means there was no split on that date.
+    """
+    s = np.where(splits == 0, np.float32(1), splits)
+    return np.cumprod(s[::-1], dtype=np.float32)[::-1]
+
+
+class ColumnStore(object):
+    """
+    One memory-mapped array per field per symbol, built from the
+    Yahoo CSV files in data_path and kept in store_path.
+
+    An entry holds the fully processed frame of a symbol: an int64 date
+    index shared by all fields, one array per field (see FIELD_DTYPES), the
+    dividends, and the split factor already accumulated over the whole
+    history. Entries live in store_path/<symbol>/<key>, where key is made
+    of FORMAT and the mtimes and sizes of the CSV and actions files, so a
+    change of either file selects a new entry and a new process never
+    parses or adjusts a file that is already in the store.
+
+    An entry is written to a temporary directory and renamed into place,
+    so several processes can share the store: a reader only ever sees
+    complete entries, and when two processes build the same entry the
+    first rename wins.
+    """
+    def __init__(self, data_path, store_path):
+        self.data_path = data_path
+        self.store_path = store_path
+        self._open = {}
+        if not os.path.exists(self.store_path):
+            os.makedirs(self.store_path)
+
+    def csv_path(self, symbol):
+        return os.path.join(self.data_path, symbol + ".csv")
+
+    def actions_path(self, symbol):
+        return os.path.join(self.data_path, symbol + "_actions.csv")
+
+    def _source_key(self, symbol):
+        " Name of the entry of symbol, from FORMAT and source_key. "
+        return "v%d_%s" % (FORMAT, source_key(self.data_path, symbol))
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.store_path, symbol)
+
+    def _read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, "meta.json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _process(self, symbol, has_actions):
+        """
+        Parse the CSV and actions files of symbol.
+        Return a dict of columns with the split factor accumulated.
+        """
+        b = pd.read_csv(self.csv_path(symbol), index_col=0, parse_dates=True, na_values='null')
+        b = b[~b.index.isna()]
+        columns = dict()
+        columns['date'] = b.index.values.astype('datetime64[ns]').view(np.int64)
+        for field, i in FIELD_COLUMNS.items():
+            if i <= len(b.columns):
+                columns[field] = pd.to_numeric(b.iloc[:, i - 1], errors='coerce').values.astype(FIELD_DTYPES[field])
+            else:
+                columns[field] = np.full(len(b), np.nan, dtype=FIELD_DTYPES[field])
+        if has_actions:
+            c = pd.read_csv(self.actions_path(symbol), index_col='Date', parse_dates=True, na_values='null', dtype=np.float32)
+            c = c[~c.index.duplicated(keep='last')].reindex(b.index)
+            c = c.fillna(0)
+        else:
+            c = pd.DataFrame(0, index=b.index, columns=ACTION_COLUMNS, dtype=np.float32)
+        for col in ACTION_COLUMNS:
+            columns[col] = c[col].values.astype(np.float32) if col in c else np.zeros(len(b), dtype=np.float32)
+        columns['Stock Splits'] = split_factor(columns['Stock Splits'])
+        return columns
+
+    def build(self, symbol, key=None):
+        """
+        Process symbol and publish its entry. Return the entry directory.
+        """
+        if key is None:
+            key = self._source_key(symbol)
+        columns = self._process(symbol, not key.endswith("_0-0"))
+        symbol_dir = self._symbol_dir(symbol)
+        if not os.path.exists(symbol_dir):
+            os.makedirs(symbol_dir, exist_ok=True)
+        entry_dir = os.path.join(symbol_dir, key)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp", dir=symbol_dir)
+        names = dict()
+        for i, (name, values) in enumerate(columns.items()):
+            names[name] = "c%d.npy" % i
+            np.save(os.path.join(tmp_dir, names[name]), values)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump({'rows': len(columns['date']), 'columns': names}, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process published the same entry first.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._prune(symbol_dir, key)
+        return entry_dir
+
+    def _prune(self, symbol_dir, key):
+        """ Remove the entries of older versions of the files, and abandoned temporary directories. """
+        now = time.time()
+        for name in os.listdir(symbol_dir):
+            path = os.path.join(symbol_dir, name)
+            if name == key:
+                continue
+            if name.startswith(".tmp"):
+                try:
+                    if now - os.stat(path).st_mtime < 3600:
+                        continue
+                except OSError:
+                    continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def load(self, symbol):
+        """
+        Return a dict of the memory-mapped columns of symbol.
+        The entry is built first if there is none for the current source files.
+        """
+        key = self._source_key(symbol)
+        cached = self._open.get(symbol)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        entry_dir = os.path.join(self._symbol_dir(symbol), key)
+        meta = self._read_meta(entry_dir)
+        if meta is None:
+            entry_dir = self.build(symbol, key)
+            meta = self._read_meta(entry_dir)
+        mode = 'r' if meta['rows'] > 0 else None
+        columns = dict()
+        for name, file_name in meta['columns'].items():
+            columns[name] = np.load(os.path.join(entry_dir, file_name), mmap_mode=mode)
+        self._open[symbol] = (key, columns)
+        return columns
+
+    def get_frame(self, symbol, ts_list, data_item, actions=True):
+        """
+        Return a DataFrame of data_item on ts_list, the same layout as
+        DataAccess.get_data_hardread. When ts_list is a contiguous run of
+        the symbol's dates, the columns are sliced from the memory map
+        instead of gathered. The DataFrame owns its values either way:
+        pandas copies the columns into its own block.
+        """
+        columns = self.load(symbol)
+        ts = as_i8(ts_list)
+        where, found = locate(columns['date'], ts)
+        data = dict()
+        for item in data_item:
+            data[item] = take(columns[item if item in FIELD_COLUMNS else 'volume'], where, found)
+        if actions:
+            factor = columns['Stock Splits']
+            if found is None:
+                data['Dividends'] = columns['Dividends'][where]
+                data['Stock Splits'] = factor[where]
+            elif len(factor) == 0:
+                data['Dividends'] = np.zeros(len(ts), dtype=np.float32)
+                data['Stock Splits'] = np.ones(len(ts), dtype=np.float32)
+            else:
+                # A date missing from the file has no dividend, and carries
+                # the split factor of the next date in the file.
+                data['Dividends'] = np.nan_to_num(take(columns['Dividends'], where, found))
+                after = ts > columns['date'][-1]
+                data['Stock Splits'] = np.where(after, np.float32(1), factor[where])
+        return pd.DataFrame(data, index=pd.DatetimeIndex(ts_list), columns=list(data))
+
+    def get_history(self, symbol, data_item, actions=True):
+        """ Return the whole history of symbol as a DataFrame. """
+        dates = pd.DatetimeIndex(np.asarray(self.load(symbol)['date']))
+        return self.get_frame(symbol, dates, data_item, actions)
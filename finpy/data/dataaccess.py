@@ -23,7 +23,13 @@ import pickle as pkl
 import time
 import datetime as dt
 import tempfile
-from . import DataPull 
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .colstore import ColumnStore, empty_frame, source_key, ACTION_COLUMNS
+from .panel import PricePanel
+from .cache import shared_cache, frame_window
+from .downloader import PriceDownloader
+from .manifest import SymbolManifest
 
 
 class Exchange (object):
@@ -55,6 +61,58 @@ class DataSource(object):
     #class DataSource ends
 
 
+def _read_csv_symbol(symbol, data_path, ts_list, data_item, actions):
+    '''
+    Read the CSV and actions files of symbol. It is a module function, so a process pool can run it.
+    '''
+    file_path = os.path.join(data_path, symbol + ".csv")
+    a = pd.DataFrame(index=ts_list)
+    col_list = [0]
+    for i in data_item:
+        if i == "open":
+            col_list.append(1)
+        elif i == "high":
+            col_list.append(2)
+        elif i == "low":
+            col_list.append(3)
+        elif i == "actual_close":
+            col_list.append(4)
+        elif i == "close":
+            col_list.append(5)
+        else:
+            col_list.append(6)
+    b = pd.read_csv(file_path, index_col='Date', usecols = col_list, parse_dates=True,na_values='null', dtype = np.float32)
+    b.columns = data_item
+    a = pd.concat([a, b], axis=1,)
+    a = a[data_item]
+    if actions:
+        file_path = os.path.join(data_path, symbol + "_actions.csv")
+        c = pd.read_csv(file_path, index_col='Date', parse_dates=True ,na_values='null', dtype = np.float32)
+        a = a.join(c)
+        a = a.fillna(0)
+        a_reversed = a[::-1]
+        a_reversed['Stock Splits'] = a_reversed['Stock Splits'].replace(0, 1)
+        a_reversed['Stock Splits'] = a_reversed['Stock Splits'].cumprod()
+        a['Stock Splits'] = a_reversed['Stock Splits'][::-1]
+    return a
+
+
+def _read_store_symbol(symbol, data_path, store_path, ts_list, data_item, actions):
+    '''
+    Read the rows of symbol on ts_list from the column store in store_path. It is a module function, so a process pool can run it.
+    '''
+    return ColumnStore(data_path, store_path).get_frame(symbol, ts_list, data_item, actions)
+
+
+def _read_csv_window(symbol, data_path, ts_list, data_item, actions):
+    '''
+    Read the rows of symbol on ts_list from the CSV files, as get_window does without the store.
+    It is a module function, so a process pool can run it.
+    '''
+    history = _read_csv_symbol(symbol, data_path, pd.DatetimeIndex([]), data_item, actions)
+    return frame_window(history, ts_list, data_item, actions)
+
+
 class DataAccess(object):
     '''
     @summary: This class is used to access all the symbol data. It readin in pickled numpy arrays converts them into appropriate pandas objects
@@ -62,11 +120,16 @@ class DataAccess(object):
     @note: The earliest time for which this works is platform dependent because the python date functionality is platform dependent.
     '''
     def __init__(self, sourcein=DataSource.YAHOO, s_datapath=None,
-                 s_scratchpath=None, cachestalltime=12):
+                 s_scratchpath=None, cachestalltime=12, colstore=True, workers=1, pool="thread"):
         '''
         @param sourcestr: Specifies the source of the data. Initializes paths based on source.
         @note: No data is actually read in the constructor. Only paths for the source are initialized
         @param: Scratch defaults to a directory in /tmp/QSScratch
+        @param colstore: If true, get_data reads through the memory-mapped column store in the scratch directory.
+        @param cachestalltime: Hours a symbol's history stays in the in-process cache. 0 disables the cache.
+        @param workers: The maximum number of symbols read, or downloaded, at the same time.
+        @param pool: "thread" or "process". How get_data, get_data_hardread and get_panel read the symbols when workers is greater than 1.
+        With "process", every worker process opens the column store itself, and the in-process cache is not used.
         '''
         self.folderList = []
         try:
@@ -106,8 +169,99 @@ class DataAccess(object):
         else:
             raise ValueError("Incorrect data source requested.")
 
+        self.cachestalltime = cachestalltime
+        self.workers = max(1, int(workers))
+        if pool not in ("thread", "process"):
+            raise ValueError("pool must be thread or process.")
+        self.pool = pool
+        self.failed_symbols = dict()
+        self.downloader = None
+        self.cache = shared_cache
+        self.store = None
+        self.data_path = os.path.join(self.rootdir, self.source)
+        # One store and one manifest per data folder, so different FINPYDATA roots can share the scratch directory.
+        folder_id = self.source + "_" + hashlib.md5(os.path.abspath(self.data_path).encode("utf-8")).hexdigest()[:12]
+        self.manifest = SymbolManifest(self.data_path, os.path.join(self.scratchdir, "manifest_" + folder_id + ".db"))
+        if colstore:
+            self.store = ColumnStore(self.data_path, os.path.join(self.scratchdir, "colstore", folder_id))
+
         #__init__ ends
 
+    def is_stale(self, symbol, latest_req_dt):
+        '''
+        @return: True if there is no local file of symbol, or the local file ends before latest_req_dt.
+        @note: It is a lookup in self.manifest, the files are not opened.
+        '''
+        entry = self.manifest.get(symbol)
+        if entry is None or entry.last_date is None:
+            return True
+        return entry.last_date < latest_req_dt
+
+    def update_symbols(self, symbol_list, latest_req_dt):
+        '''
+        Download the stale symbols of symbol_list, all at once, with self.downloader.
+        A symbol that cannot be downloaded keeps its local file, if any.
+        @param latest_req_dt: The last timestamp needed.
+        @return: The list of the symbols that were stale.
+        '''
+        stale = [s for s in dict.fromkeys(symbol_list) if self.is_stale(s, latest_req_dt)]
+        if len(stale) == 0:
+            return stale
+        if self.downloader is None:
+            self.downloader = PriceDownloader(os.path.join(self.rootdir, "Yahoo"), max_concurrency=self.workers)
+        metrics = self.downloader.download(stale)
+        self.manifest.refresh(stale)
+        for symbol in stale:
+            self.cache.invalidate(self.data_path, symbol)
+            if metrics[symbol].error is not None:
+                print("Unable to fetch data for stock: {0} {1}".format(symbol, metrics[symbol].error))
+        return stale
+
+    def update_symbol(self, symbol, latest_req_dt):
+        '''
+        Download symbol if there is no local file, or the local file ends before latest_req_dt.
+        @param symbol: The symbol to check.
+        @param latest_req_dt: The last timestamp needed.
+        @return: True if the symbol was downloaded.
+        '''
+        return len(self.update_symbols([symbol], latest_req_dt)) > 0
+
+    def _map_symbols(self, func, symbol_list, args, pool="thread"):
+        '''
+        Run func(symbol, *args) for every symbol, on up to self.workers threads or processes.
+        @param pool: "thread" or "process". func must be picklable for "process".
+        @return: The list of results in the order of symbol_list, and a dict of the symbols that failed
+        and their exceptions. The result of a failed symbol is None.
+        '''
+        results = [None] * len(symbol_list)
+        errors = dict()
+        workers = min(self.workers, len(symbol_list))
+        if workers <= 1:
+            for i, symbol in enumerate(symbol_list):
+                try:
+                    results[i] = func(symbol, *args)
+                except Exception as e:
+                    errors[symbol] = e
+            return results, errors
+        if pool == "process":
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        with executor:
+            futures = [executor.submit(func, symbol, *args) for symbol in symbol_list]
+            for i, (symbol, future) in enumerate(zip(symbol_list, futures)):
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    errors[symbol] = e
+        return results, errors
+
+    def _report(self, errors):
+        ''' Print and keep the symbols that could not be read. '''
+        self.failed_symbols = errors
+        for symbol in errors:
+            print("Error:" + symbol + " " + str(errors[symbol]))
+
     def get_data_hardread(self, ts_list, symbol_list, data_item, verbose=False, actions=True):
         '''
         Read data into a DataFrame no matter what.
@@ -116,78 +270,117 @@ class DataAccess(object):
         @param data_item: The data_item needed. Like open, close, volume etc.  May be a list, in which case a list of DataFrame is returned.
         @note: If a symbol is not found then a message is printed. All the values in the column for that stock will be NaN. Execution then
         continues as usual. No errors are raised at the moment.
+        @note: The symbols are read by self.workers threads or processes, see self.pool. The failed symbols are kept in self.failed_symbols.
         '''
         #read in data for a stock
-        latest_req_dt = ts_list[-1]
+        self.update_symbols(symbol_list, ts_list[-1])
+        frames, errors = self._map_symbols(_read_csv_symbol, symbol_list,
+            (os.path.join(self.rootdir, "Yahoo"), ts_list, data_item, actions), self.pool)
+        self._report(errors)
+        frames = dict(zip(symbol_list, frames))
         ldmReturn = []
-        data_path = os.path.join(self.rootdir, "Yahoo")
         for symbol in symbol_list:
-            try:
-                file_path = os.path.join(self.rootdir, "Yahoo",  symbol + ".csv")
-                dir_name = os.path.dirname(file_path) + os.sep
-                data_update = False
-                if not os.path.isfile(file_path):
-                    data_update = True
-                elif os.stat(file_path).st_size <= 6:
-                    data_update = True
-                else:
-                    latest_local_dt = DataPull.latest_local_dt(data_path, symbol)
-                    if latest_local_dt < latest_req_dt: 
-                        data_update = True
-                if data_update:    
-                    DataPull.get_data(dir_name, [symbol])
-                
-            except IOError:
-                # If unable to read then continue. The value for this stock will be nan
-                print("Error:" + symbol)
-                continue;
-                
-            a = pd.DataFrame(index=ts_list)
-            col_list = [0]
-            for i in data_item:
-                if i == "open":
-                    col_list.append(1)
-                elif i == "high":
-                    col_list.append(2)
-                elif i == "low":
-                    col_list.append(3)
-                elif i == "actual_close":
-                    col_list.append(4)
-                elif i == "close":
-                    col_list.append(5)
-                else:
-                    col_list.append(6)
-            b = pd.read_csv(file_path, index_col='Date', usecols = col_list, parse_dates=True,na_values='null', dtype = np.float32)
-            b.columns = data_item
-            a = pd.concat([a, b], axis=1,)
-            a = a[data_item]
-            if actions:
-                file_path = os.path.join(self.rootdir, "Yahoo",  symbol + "_actions.csv")
-                c = pd.read_csv(file_path, index_col='Date', parse_dates=True ,na_values='null', dtype = np.float32)
-                a = a.join(c)
-                a = a.fillna(0)
-                a_reversed = a[::-1]
-                a_reversed['Stock Splits'] = a_reversed['Stock Splits'].replace(0, 1)
-                a_reversed['Stock Splits'] = a_reversed['Stock Splits'].cumprod()
-                a['Stock Splits'] = a_reversed['Stock Splits'][::-1]
-            ldmReturn.append(a)
-                
+            if frames.get(symbol) is None:
+                # The value for this stock will be nan
+                ldmReturn.append(empty_frame(ts_list, data_item, actions))
+            else:
+                ldmReturn.append(frames[symbol])
         return ldmReturn            
         
         #get_data_hardread ends
 
     def get_data (self, ts_list, symbol_list, data_item, verbose=False, bIncDelist=False, actions=True):
         '''
-        Read data into a DataFrame, but check to see if it is in a cache first.
+        Read data into a DataFrame, through the column store if it is enabled.
         @param ts_list: List of timestamps for which the data values are needed. Timestamps must be sorted.
         @param symbol_list: The list of symbols for which the data values are needed
         @param data_item: The data_item needed. Like open, close, volume etc.  May be a list, in which case a list of DataFrame is returned.
         @param bIncDelist: If true, delisted securities will be included.
         @note: If a symbol is not found then a message is printed. All the values in the column for that stock will be NaN. Execution then 
         continues as usual. No errors are raised at the moment.
+        @note: The symbols are read by self.workers threads or processes, see self.pool. The failed symbols are kept in self.failed_symbols.
+        '''
+        if self.store is None:
+            return self.get_data_hardread(ts_list, symbol_list, data_item, verbose, actions)
+        self.update_symbols(symbol_list, ts_list[-1])
+        if self.pool == "process" and self.workers > 1:
+            frames, errors = self._map_symbols(_read_store_symbol, symbol_list,
+                (self.data_path, self.store.store_path, ts_list, data_item, actions), "process")
+        else:
+            # Threads share the memory maps and the in-process cache.
+            frames, errors = self._map_symbols(self.get_window, symbol_list, (ts_list, data_item, actions))
+        self._report(errors)
+        return [empty_frame(ts_list, data_item, actions) if f is None else f for f in frames]
+
+    def get_panel(self, ts_list, symbol_list, data_item, actions=True):
+        '''
+        Read data into one PricePanel, a (dates x symbols x fields) ndarray.
+        The fields are data_item, then Dividends and Stock Splits if actions is true.
+        The ndarray is float32, or float64 if data_item has volume, so the volume is exact as in get_data.
+        @note: If a symbol is not found then a message is printed and the symbol is NaN, as in get_data.
+        @note: The symbols are read as in get_data, by self.workers threads or processes. Threads write
+        straight into the panel; the rows read by processes are copied into it.
+        '''
+        fields = list(data_item) + (ACTION_COLUMNS if actions else [])
+        dtype = np.float64 if 'volume' in fields else np.float32
+        values = np.full((len(ts_list), len(symbol_list), len(fields)), np.nan, dtype=dtype)
+        positions = dict()
+        for j, symbol in enumerate(symbol_list):
+            positions.setdefault(symbol, []).append(j)
+        self.update_symbols(symbol_list, ts_list[-1])
+        if self.pool == "process" and self.workers > 1:
+            symbols = list(positions)
+            if self.store is not None:
+                read, args = _read_store_symbol, (self.data_path, self.store.store_path, ts_list, data_item, actions)
+            else:
+                read, args = _read_csv_window, (self.data_path, ts_list, data_item, actions)
+            frames, errors = self._map_symbols(read, symbols, args, "process")
+            for symbol, frame in zip(symbols, frames):
+                if frame is not None:
+                    values[:, positions[symbol], :] = frame[fields].to_numpy()[:, None, :]
+        else:
+            def fill(symbol):
+                frame = self.get_window(symbol, ts_list, data_item, actions)
+                values[:, positions[symbol], :] = frame[fields].to_numpy()[:, None, :]
+            _, errors = self._map_symbols(fill, symbol_list, ())
+        self._report(errors)
+        return PricePanel(values, ts_list, symbol_list, fields)
+
+    def _read_history(self, symbol, data_item, actions):
+        ''' Read the whole history of symbol from the column store, or from the CSV files if there is no store. '''
+        if self.store is not None:
+            return self.store.get_history(symbol, data_item, actions)
+        return _read_csv_symbol(symbol, self.data_path, pd.DatetimeIndex([]), data_item, actions)
+
+    def get_history(self, symbol, data_item, actions=True):
+        '''
+        Return the whole history of symbol. The history is kept in the shared in-process cache
+        for cachestalltime hours, keyed by the symbol, the set of data_item and actions.
+        A cached history is read again when the CSV or the actions file of symbol changed.
+        @param symbol: The symbol.
+        @param data_item: The list of data items.
+        @param actions: If true, the Dividends and Stock Splits columns are included.
+        @note: Without the column store, the history is read as get_data_hardread reads it.
+        '''
+        if self.cachestalltime <= 0:
+            return self._read_history(symbol, data_item, actions)
+        key = (self.data_path, symbol, frozenset(data_item), actions)
+        source = source_key(self.data_path, symbol)
+        frame = self.cache.get(key, self.cachestalltime, source)
+        if frame is None:
+            frame = self._read_history(symbol, data_item, actions)
+            self.cache.put(key, frame, source)
+        return frame
+
+    def get_window(self, symbol, ts_list, data_item, actions=True):
         '''
-        retval = self.get_data_hardread(ts_list, symbol_list, data_item, verbose, actions)
-        return retval
+        Return the rows of symbol on ts_list.
+        With the cache enabled, it is a slice of the cached history. Otherwise it is read from the column store,
+        or it is a slice of the history read from the CSV files if there is no store.
+        '''
+        if self.cachestalltime <= 0 and self.store is not None:
+            return self.store.get_frame(symbol, ts_list, data_item, actions)
+        return frame_window(self.get_history(symbol, data_item, actions), ts_list, data_item, actions)
 
     def getPathOfFile(self, symbol_name, bDelisted=False):
         '''
@@ -234,28 +427,15 @@ class DataAccess(object):
     def get_all_symbols (self):
         '''
         @summary: Returns a list of all the symbols located at any of the paths for this source. @see: {__init__}
-        @attention: This will discard all files that are not of type pkl. ie. Only the files with an extension pkl will be reported.
+        @attention: This will discard all files that are not of type csv. ie. Only the files with an extension csv will be reported.
+        The actions files are not symbols.
+        @note: It is a lookup in self.manifest.
         '''
 
-        listOfStocks = list()
-        #Path does not exist
-
         if (len(self.folderList) == 0):
             raise ValueError("DataAccess source not set")
 
-        for path in self.folderList:
-            stocksAtThisPath = list()
-            #print str(path)
-            stocksAtThisPath = os.listdir(str(path))
-            #Next, throw away everything that is not a .pkl And these are our stocks!
-            stocksAtThisPath = [x for x in stocksAtThisPath if (str(x).find(str(self.fileExtensionToRemove)) > -1)]
-            #Now, we remove the .pkl to get the name of the stock
-            stocksAtThisPath = [(x.partition(str(self.fileExtensionToRemove))[0]) for x in stocksAtThisPath]
-
-            listOfStocks.extend(stocksAtThisPath)
-            #for stock in stocksAtThisPath:
-                #listOfStocks.append(stock)
-        return listOfStocks
+        return self.manifest.symbols()
         #get_all_symbols ends
 
     def get_symbols_from_list(self, s_list):
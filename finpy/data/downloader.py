@@ -0,0 +1,221 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Concurrent, rate-limited download of the Yahoo daily prices.
+"""
+
+import os
+import time
+import asyncio
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import yfinance as yf
+from aiolimiter import AsyncLimiter
+from . import DataPull
+
+
+def fetch_yahoo_batch(symbols, start, end):
+    """
+    Download the daily prices of several Yahoo symbols in one request.
+    Return a dict of DataFrames by symbol. A symbol without data is left out.
+    """
+    if len(symbols) == 1:
+        return {symbols[0]: DataPull.fetch_yahoo(symbols[0], start, end)}
+    data = yf.download(symbols, start=start, end=end, actions=True, group_by='ticker')
+    frames = dict()
+    for symbol in symbols:
+        if symbol in data.columns.get_level_values(0):
+            frames[symbol] = data[symbol].dropna(how='all')
+    return frames
+
+
+class DownloadStat(object):
+    """
+    Metrics of the download of one symbol.
+        :var rows: The number of new rows written.
+        :var attempts: The number of requests made, including the retries.
+        :var latency: Seconds from the first request to the last file written.
+        :var full: True if the whole history was downloaded.
+        :var error: The exception if the symbol could not be downloaded, else None.
+    """
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.rows = 0
+        self.attempts = 0
+        self.latency = 0.0
+        self.full = False
+        self.error = None
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.latency if self.latency > 0 else 0.0
+
+    def to_dict(self):
+        return {'rows': self.rows, 'attempts': self.attempts, 'latency': self.latency,
+                'rows_per_sec': self.rows_per_sec, 'full': self.full,
+                'error': None if self.error is None else str(self.error)}
+
+
+class PriceDownloader(object):
+    """
+    Download the Yahoo daily prices of many symbols into data_path, the way
+    the edgar downloader does: an AsyncLimiter caps the request rate and a
+    semaphore caps the requests in flight. yfinance is blocking, so every
+    request runs on a thread of a pool of max_concurrency threads.
+
+    Symbols that need the same dates, the same start date for an incremental
+    update or the whole history for a new symbol, are requested batch_size
+    at a time. A failed request is retried up to retries times, waiting
+    backoff, 2 * backoff, 4 * backoff... seconds in between.
+    The files are written with DataPull.save_full and DataPull.save_delta,
+    so an update with a new dividend or split downloads the whole history
+    of that symbol again, as DataPull.pull_yahoo does.
+
+        :param fetch_batch: fetch_batch(symbols, start, end) returns a dict of DataFrames by symbol.
+        :param fetch_actions: fetch_actions(symbol) returns a DataFrame of all the dividends and splits.
+        :var metrics: Dict of DownloadStat by symbol, of the last download.
+    """
+    def __init__(self, data_path, max_concurrency=4, rate=2, period=1.0, batch_size=20,
+                 retries=3, backoff=1.0, incremental=True, fetch_batch=fetch_yahoo_batch,
+                 fetch_actions=DataPull.fetch_yahoo_actions, now=None):
+        self.data_path = data_path
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate = rate
+        self.period = period
+        self.batch_size = max(1, int(batch_size))
+        self.retries = retries
+        self.backoff = backoff
+        self.incremental = incremental
+        self.fetch_batch = fetch_batch
+        self.fetch_actions = fetch_actions
+        self.now = now
+        self.metrics = dict()
+        self.elapsed = 0.0
+
+    def download(self, symbols):
+        """
+        Download symbols and return self.metrics.
+        It can be called from a running event loop, like a Jupyter notebook,
+        in which case the download runs on its own thread.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.async_download(symbols))
+        result = dict()
+        def run():
+            try:
+                result['metrics'] = asyncio.run(self.async_download(symbols))
+            except Exception as e:
+                result['error'] = e
+        t = threading.Thread(target=run)
+        t.start()
+        t.join()
+        if 'error' in result:
+            raise result['error']
+        return result['metrics']
+
+    async def async_download(self, symbols):
+        """ The coroutine of download. """
+        s = time.perf_counter()
+        if not os.path.exists(self.data_path):
+            os.makedirs(self.data_path)
+        now = self.now if self.now is not None else datetime.datetime.now()
+        end = now.strftime("%Y-%m-%d")
+        self.metrics = dict()
+        groups = dict()
+        for symbol in dict.fromkeys(symbols):
+            self.metrics[symbol] = DownloadStat(symbol)
+            last = DataPull.local_last(self.data_path, symbol) if self.incremental else None
+            if last is None:
+                start = DataPull.FULL_START
+            else:
+                start = (last + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+                if start >= end:
+                    continue
+            groups.setdefault(start, []).append((symbol, last))
+        self._limiter = AsyncLimiter(self.rate, self.period)
+        self._semaphore = asyncio.Semaphore(value=self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as self._executor:
+            tasks = []
+            for start, group in groups.items():
+                for i in range(0, len(group), self.batch_size):
+                    tasks.append(self._download_batch(group[i:i + self.batch_size], start, end))
+            await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - s
+        return self.metrics
+
+    async def _request(self, stats, func, *args):
+        """
+        Run func(*args) on the pool, within the rate limit and the concurrency limit.
+        Retry with exponential backoff. Every DownloadStat in stats counts the attempts.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            for stat in stats:
+                stat.attempts += 1
+            try:
+                async with self._semaphore:
+                    async with self._limiter:
+                        return await loop.run_in_executor(self._executor, func, *args)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _write(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _download_full(self, symbol, stat, end, data=None):
+        """ Download the whole history and the actions of symbol, and replace its files. """
+        yahoo = DataPull.yahoo_symbol(symbol)
+        if data is None:
+            frames = await self._request([stat], self.fetch_batch, [yahoo], DataPull.FULL_START, end)
+            data = frames.get(yahoo)
+        if data is None or len(data) == 0:
+            raise ValueError("No data for " + symbol)
+        actions = await self._request([stat], self.fetch_actions, yahoo)
+        stat.full = True
+        return await self._write(DataPull.save_full, self.data_path, symbol, data, actions)
+
+    async def _download_batch(self, batch, start, end):
+        """ Download the symbols of batch, which all start at start, in one request. """
+        s = time.perf_counter()
+        stats = [self.metrics[symbol] for symbol, last in batch]
+        yahoo = [DataPull.yahoo_symbol(symbol) for symbol, last in batch]
+        try:
+            frames = await self._request(stats, self.fetch_batch, yahoo, start, end)
+        except Exception as e:
+            for stat in stats:
+                stat.error = e
+                stat.latency = time.perf_counter() - s
+            return
+        async def save(symbol, last, data, stat):
+            try:
+                if last is None:
+                    stat.rows = await self._download_full(symbol, stat, end, data)
+                    return
+                rows = 0
+                if data is not None:
+                    rows = await self._write(DataPull.save_delta, self.data_path, symbol, data, last)
+                if rows is None:
+                    # A new dividend or split: the adjusted history has changed.
+                    rows = await self._download_full(symbol, stat, end)
+                stat.rows = rows
+            except Exception as e:
+                stat.error = e
+            finally:
+                stat.latency = time.perf_counter() - s
+        await asyncio.gather(*[save(symbol, last, frames.get(y), stat)
+            for (symbol, last), y, stat in zip(batch, yahoo, stats)])
+
+    def summary(self):
+        """ Return the metrics of the last download as a DataFrame indexed by symbol. """
+        columns = ['rows', 'attempts', 'latency', 'rows_per_sec', 'full', 'error']
+        return pd.DataFrame([self.metrics[s].to_dict() for s in self.metrics],
+            index=list(self.metrics), columns=columns)
@@ -0,0 +1,206 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Manifest of the symbol files of a data folder.
+"""
+
+import os
+import re
+import sqlite3
+import datetime
+import threading
+from contextlib import closing
+
+DATE_RE = re.compile(rb"\d\d\d\d-\d\d-\d\d")
+# Bytes read from the end of a file for its last date.
+TAIL = 4096
+
+
+def _lines(data):
+    return [l for l in data.split(b"\n") if l.strip()]
+
+
+def _appended(tail, offset, previous):
+    """
+    True if the bytes of tail before offset end with the last row of previous,
+    so the file is the previous version with rows appended.
+    """
+    old = tail[:offset]
+    lines = _lines(old)
+    if len(lines) == 0 or not lines[-1].startswith(previous.last_date.strftime("%Y-%m-%d").encode("utf-8")):
+        return False
+    return old.endswith(b"\n") or tail[offset:offset + 1] in (b"\n", b"")
+
+
+def scan_csv(file_path, previous=None):
+    """
+    Return (first_date, last_date, rows) of a Yahoo CSV file.
+    A date is None if the file has no dated row.
+    The first date is read from the head of the file and the last date from its tail.
+    previous is the SymbolEntry of an earlier version of the file. If the file
+    is that version with rows appended, as DataPull.append_csv writes it, only
+    the appended rows are counted. Otherwise the whole file is read.
+    """
+    with open(file_path, "rb") as f:
+        f.readline()
+        body = f.tell()
+        first = f.readline()
+        size = f.seek(0, os.SEEK_END)
+        append = previous is not None and previous.last_date is not None and body < previous.size <= size
+        start = max(body, (previous.size if append else size) - TAIL)
+        f.seek(start)
+        tail = f.read()
+        # The first line of the tail is partial, unless the tail starts at the first row.
+        lines = _lines(tail if start == body else tail.split(b"\n", 1)[-1])
+        last = [l[:10] for l in lines if DATE_RE.match(l)][-1:]
+        if append and _appended(tail, previous.size - start, previous):
+            rows = previous.rows + len(_lines(tail[previous.size - start:]))
+        else:
+            f.seek(body)
+            rows = len(_lines(f.read()))
+    if not DATE_RE.match(first) or len(last) == 0:
+        return None, None, rows
+    return first[:10].decode("utf-8"), last[0].decode("utf-8"), rows
+
+
+class SymbolEntry(object):
+    """
+    What the manifest knows of one symbol.
+        :var first_date: datetime of the first row, or None.
+        :var last_date: datetime of the last row, or None.
+        :var rows: The number of rows.
+        :var mtime: mtime of the CSV file, in nanoseconds.
+        :var size: size of the CSV file.
+        :var actions: True if there is an actions file.
+    """
+    def __init__(self, symbol, first_date, last_date, rows, mtime, size, actions):
+        self.symbol = symbol
+        self.first_date = None if first_date is None else datetime.datetime.strptime(first_date, "%Y-%m-%d")
+        self.last_date = None if last_date is None else datetime.datetime.strptime(last_date, "%Y-%m-%d")
+        self.rows = rows
+        self.mtime = mtime
+        self.size = size
+        self.actions = bool(actions)
+
+    def matches(self, st, actions):
+        """ True if the os.stat st of the CSV file and actions are what the entry was made from. """
+        return self.mtime == st.st_mtime_ns and self.size == st.st_size and self.actions == actions
+
+
+class SymbolManifest(object):
+    """
+    A sqlite table of every symbol file in data_path: first date, last
+    date, number of rows, mtime, size and whether there is an actions file.
+
+    Creating, removing or renaming a file changes the mtime of data_path,
+    so the list of symbols is only read again when the mtime of data_path
+    has changed, and then only the files whose mtime or size has changed
+    are scanned. get() also compares the mtime and size of the files of
+    its symbol, so a file changed in place is seen as well. A lookup costs
+    an os.stat of data_path and of the files of the symbol.
+
+    The list of symbols can miss a file created or removed within the
+    mtime resolution of data_path after the last sync, until data_path
+    changes again; get() of that symbol sees it.
+    """
+    def __init__(self, data_path, db_path):
+        self.data_path = data_path
+        self.db_path = db_path
+        self._entries = None
+        self._dir_mtime = None
+        self._lock = threading.Lock()
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS SYMBOL (symbol TEXT PRIMARY KEY NOT NULL,
+                                                             first_date TEXT NULL,
+                                                             last_date TEXT NULL,
+                                                             rows INT NOT NULL,
+                                                             mtime INT NOT NULL,
+                                                             size INT NOT NULL,
+                                                             actions INT NOT NULL
+                                                             );''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS META (key TEXT PRIMARY KEY NOT NULL, value INT NOT NULL);''')
+            conn.commit()
+
+    def _load(self, conn):
+        self._entries = dict()
+        for row in conn.execute("SELECT symbol, first_date, last_date, rows, mtime, size, actions FROM SYMBOL"):
+            self._entries[row[0]] = SymbolEntry(*row)
+        row = conn.execute("SELECT value FROM META WHERE key = 'dir_mtime'").fetchone()
+        return None if row is None else row[0]
+
+    def _scan(self, conn, symbol, st, actions):
+        first_date, last_date, rows = scan_csv(os.path.join(self.data_path, symbol + ".csv"), self._entries.get(symbol))
+        conn.execute("INSERT OR REPLACE INTO SYMBOL (symbol, first_date, last_date, rows, mtime, size, actions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (symbol, first_date, last_date, rows, st.st_mtime_ns, st.st_size, int(actions)))
+        self._entries[symbol] = SymbolEntry(symbol, first_date, last_date, rows, st.st_mtime_ns, st.st_size, actions)
+
+    def sync(self):
+        """ Bring the manifest up to date with data_path, if data_path has changed. """
+        try:
+            dir_mtime = os.stat(self.data_path).st_mtime_ns
+        except OSError:
+            self._entries = dict()
+            return
+        if self._entries is not None and dir_mtime == self._dir_mtime:
+            return
+        with self._lock, closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            stored_mtime = self._load(conn)
+            if stored_mtime != dir_mtime:
+                names = set(os.listdir(self.data_path))
+                symbols = [n[:-4] for n in names if n.endswith(".csv") and not n.endswith("_actions.csv")]
+                for symbol in symbols:
+                    try:
+                        st = os.stat(os.path.join(self.data_path, symbol + ".csv"))
+                    except OSError:
+                        continue
+                    actions = (symbol + "_actions.csv") in names
+                    entry = self._entries.get(symbol)
+                    if entry is None or not entry.matches(st, actions):
+                        self._scan(conn, symbol, st, actions)
+                for symbol in set(self._entries) - set(symbols):
+                    conn.execute("DELETE FROM SYMBOL WHERE symbol = ?", (symbol,))
+                    del self._entries[symbol]
+                conn.execute("INSERT OR REPLACE INTO META (key, value) VALUES ('dir_mtime', ?)", (dir_mtime,))
+                conn.commit()
+            self._dir_mtime = dir_mtime
+
+    def refresh(self, symbols):
+        """ Look at the files of symbols again, whatever the mtime of data_path. """
+        self.sync()
+        with self._lock, closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            for symbol in symbols:
+                try:
+                    st = os.stat(os.path.join(self.data_path, symbol + ".csv"))
+                except OSError:
+                    conn.execute("DELETE FROM SYMBOL WHERE symbol = ?", (symbol,))
+                    self._entries.pop(symbol, None)
+                    continue
+                actions = os.path.isfile(os.path.join(self.data_path, symbol + "_actions.csv"))
+                self._scan(conn, symbol, st, actions)
+            conn.commit()
+
+    def get(self, symbol):
+        """
+        Return the SymbolEntry of symbol, or None if there is no file of symbol.
+        The file of symbol is scanned again if its mtime or size has changed.
+        """
+        self.sync()
+        entry = self._entries.get(symbol)
+        try:
+            st = os.stat(os.path.join(self.data_path, symbol + ".csv"))
+        except OSError:
+            st = None
+        if st is None and entry is None:
+            return None
+        actions = st is not None and os.path.isfile(os.path.join(self.data_path, symbol + "_actions.csv"))
+        if st is not None and entry is not None and entry.matches(st, actions):
+            return entry
+        self.refresh([symbol])
+        return self._entries.get(symbol)
+
+    def symbols(self):
+        """ Return the sorted list of all the symbols in data_path. """
+        self.sync()
+        return sorted(self._entries)
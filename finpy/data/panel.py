@@ -0,0 +1,112 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Dense price panel of many symbols.
+"""
+
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+
+def fill_panel(values, fill_value=1.0):
+    """
+    Forward fill, then backward fill values along the date axis (axis 0),
+    in place. Whatever is still NaN is set to fill_value. It is the same
+    filling get_tickdata applies to each DataFrame, done for every symbol
+    and field at once.
+    """
+    n = values.shape[0]
+    if n == 0:
+        return values
+    shape = (n,) + (1,) * (values.ndim - 1)
+    steps = np.arange(n).reshape(shape)
+    # Forward fill: index of the last valid row up to each row.
+    idx = np.where(np.isnan(values), 0, steps)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    values[...] = np.take_along_axis(values, idx, axis=0)
+    # Backward fill: index of the next valid row from each row.
+    idx = np.where(np.isnan(values), n - 1, steps)
+    idx = np.minimum.accumulate(idx[::-1], axis=0)[::-1]
+    values[...] = np.take_along_axis(values, idx, axis=0)
+    values[np.isnan(values)] = fill_value
+    return values
+
+
+class PricePanel(object):
+    """
+    Price data of many symbols in one contiguous ndarray, shaped
+    (dates x symbols x fields), with labelled axes.
+
+        :var values: The ndarray.
+        :var dates: DatetimeIndex of axis 0.
+        :var symbols: List of the symbols on axis 1.
+        :var fields: List of the fields on axis 2, like 'close' or 'volume'.
+    """
+    def __init__(self, values, dates, symbols, fields):
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = list(symbols)
+        self.fields = list(fields)
+        self._symbol_pos = dict((s, i) for i, s in enumerate(self.symbols))
+        self._field_pos = dict((f, i) for i, f in enumerate(self.fields))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __getitem__(self, field):
+        return self.field(field)
+
+    def field(self, field):
+        """ Return a (dates x symbols) view of field. """
+        return self.values[:, :, self._field_pos[field]]
+
+    def frame(self, field):
+        """ Return field as a DataFrame indexed by date, with a column per symbol. """
+        return pd.DataFrame(self.field(field), index=self.dates, columns=self.symbols)
+
+    def symbol(self, symbol):
+        """ Return a DataFrame of all the fields of symbol, like an item of get_tickdata. """
+        return pd.DataFrame(self.values[:, self._symbol_pos[symbol], :], index=self.dates, columns=self.fields)
+
+    def to_dict(self, symbols=None, start=0):
+        """
+        Return the dict of DataFrames that get_tickdata returns without panel,
+        including the 'shares' column, of symbols (default all) from the date at position start.
+        """
+        stocks = dict()
+        for s in (self.symbols if symbols is None else symbols):
+            stocks[s] = self.symbol(s).iloc[start:].copy()
+            stocks[s]['shares'] = np.nan
+            stocks[s].loc[self.dates[start], 'shares'] = 0
+        return stocks
+
+    def share(self):
+        """
+        Copy values into a new block of shared memory, so other processes can attach to it.
+        Return (shm, spec). spec is the small picklable description attach() needs:
+        the name of the block, the shape, the dtype and the labels of the axes.
+        The caller owns shm: it calls shm.close() and shm.unlink() when the workers are done.
+        """
+        shm = shared_memory.SharedMemory(create=True, size=max(self.values.nbytes, 1))
+        values = np.ndarray(self.values.shape, dtype=self.values.dtype, buffer=shm.buf)
+        values[...] = self.values
+        spec = {'name': shm.name, 'shape': self.values.shape, 'dtype': self.values.dtype.str,
+                'dates': self.dates.values, 'symbols': self.symbols, 'fields': self.fields}
+        return shm, spec
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Return the PricePanel of the shared memory described by spec, from share().
+        values is the shared block itself, nothing is copied. The panel keeps the block
+        open as long as it lives.
+        """
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        values = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=shm.buf)
+        panel = cls(values, spec['dates'], spec['symbols'], spec['fields'])
+        panel._shm = shm
+        return panel
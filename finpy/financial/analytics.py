@@ -0,0 +1,249 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Metrics of many price series at once, as column-wise array operations.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+
+
+def daily_returns(prices):
+    """
+    Return the daily returns of a (dates x series) array of prices,
+    the same as Portfolio.daily_return of each column: the first row is 0.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    rtn = np.zeros_like(prices)
+    rtn[1:] = prices[1:] / prices[:-1] - 1
+    return rtn
+
+
+def _nanmean(a):
+    " Column means without the NaN, like the mean of a Series. An all NaN column is NaN. "
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(a, axis=0)
+
+
+def _nanstd(a):
+    " Column standard deviations (ddof 0) without the NaN. "
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanstd(a, axis=0)
+
+
+def _div(a, b):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return a / b
+
+
+def beta(returns, bench):
+    """
+    Beta of every column of returns against the benchmark returns bench,
+    cov(bench, r) / var(bench), as in Portfolio.beta.
+    """
+    b = bench - bench.mean()
+    r = returns - returns.mean(axis=0)
+    return _div(b @ r, b @ b)
+
+
+def metrics_table(prices, benchmark=None, rf=None, k=252):
+    """
+    Compute the standard metrics of every column of prices in one pass.
+        :param prices: DataFrame of prices, indexed by date, a column per series.
+        :param benchmark: The column of prices that is the market, or None.
+        :param rf: The daily risk-free return on the dates of prices, or None.
+        :param k: The annualization factor of sortino.
+        :return: DataFrame indexed by the columns of prices, a column per metric.
+    The formulas are those of the Portfolio methods of the same names.
+    """
+    columns = list(prices.columns)
+    rtn = daily_returns(prices.values)
+    p = prices.values.astype(np.float64)
+    table = dict()
+    table['return_ratio'] = _div(p[-1], p[0])
+    table['avg_daily_return'] = rtn.mean(axis=0)
+    table['std'] = rtn.std(axis=0)
+    negative = np.where(rtn < 0, rtn, np.nan)
+    table['sortino'] = _div(table['avg_daily_return'], _nanstd(negative)) * np.sqrt(k)
+    if rf is not None:
+        excess = rtn - np.asarray(rf, dtype=np.float64).reshape(-1, 1)
+        table['mean_excess_return'] = _nanmean(excess)
+        table['excess_risk'] = _nanstd(excess)
+        table['sharpe_ratio'] = _div(table['mean_excess_return'], table['excess_risk'])
+    if benchmark is not None:
+        bench = rtn[:, columns.index(benchmark)]
+        active = rtn - bench.reshape(-1, 1)
+        table['beta'] = beta(rtn, bench)
+        table['mean_active_return'] = active.mean(axis=0)
+        table['active_risk'] = active.std(axis=0)
+        table['info_ratio'] = _div(table['mean_active_return'], table['active_risk'])
+        if rf is not None:
+            bench_excess = excess[:, columns.index(benchmark)]
+            residual = excess - table['beta'] * bench_excess.reshape(-1, 1)
+            table['mean_residual_return'] = _nanmean(residual)
+            table['residual_risk'] = _nanstd(residual)
+            table['appraisal_ratio'] = _div(table['mean_residual_return'], table['residual_risk'])
+    return pd.DataFrame(table, index=columns, columns=list(table))
+
+
+def rolling_sum(x, window):
+    """
+    Sums of the trailing windows of the columns of x, from a cumulative sum:
+    every window costs one subtraction. A window with a NaN is NaN, and so
+    are the first window - 1 rows, like the rolling sums of pandas.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    bad = np.isnan(x)
+    c = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(np.where(bad, 0.0, x), axis=0, out=c[1:])
+    n = np.zeros(c.shape)
+    np.cumsum(bad, axis=0, out=n[1:])
+    s = np.full(x.shape, np.nan)
+    if window <= x.shape[0]:
+        s[window - 1:] = c[window:] - c[:-window]
+        s[window - 1:][n[window:] - n[:-window] > 0] = np.nan
+    return s
+
+
+def _center(x):
+    " x less its column means, so the running sums of squares do not lose precision. "
+    return x - np.nan_to_num(_nanmean(x))
+
+
+def _rolling_mean_std(x, window):
+    " Rolling mean and standard deviation (ddof 0) of the columns of x. "
+    x = _center(x)
+    m = rolling_sum(x, window) / window
+    var = np.maximum(rolling_sum(x * x, window) / window - m * m, 0.0)
+    return m, np.sqrt(var)
+
+
+def _rolling_ratio(x, window):
+    " Rolling mean of x over its rolling standard deviation. "
+    x = np.asarray(x, dtype=np.float64)
+    shift = np.nan_to_num(_nanmean(x))
+    m, s = _rolling_mean_std(x, window)
+    return _div(m + shift, s)
+
+
+def rolling_sharpe(returns, rf, window):
+    """
+    Rolling Sharpe ratio, mean excess return over excess risk, of every column
+    of the (dates x series) array returns. rf is the daily risk-free return.
+    """
+    excess = np.asarray(returns, dtype=np.float64) - np.asarray(rf, dtype=np.float64).reshape(-1, 1)
+    return _rolling_ratio(excess, window)
+
+
+def rolling_info_ratio(returns, bench, window):
+    " Rolling information ratio, mean active return over active risk, of every column of returns. "
+    active = np.asarray(returns, dtype=np.float64) - np.asarray(bench, dtype=np.float64).reshape(-1, 1)
+    return _rolling_ratio(active, window)
+
+
+def rolling_sortino(returns, window, k=252):
+    """
+    Rolling Sortino ratio of every column of returns: the mean return over the
+    standard deviation of the negative returns of the window, times sqrt(k).
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    mean = rolling_sum(x, window) / window
+    neg = np.where(x < 0, x, 0.0)
+    neg[np.isnan(x)] = np.nan
+    n = rolling_sum(np.where(np.isnan(x), np.nan, x < 0), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m = rolling_sum(neg, window) / n
+        var = np.maximum(rolling_sum(neg * neg, window) / n - m * m, 0.0)
+    return _div(mean, np.sqrt(var)) * np.sqrt(k)
+
+
+def rolling_beta(returns, bench, window):
+    """
+    Rolling beta, cov(bench, r) / var(bench), of every column of returns
+    against the benchmark returns bench, from running sums of the co-moments.
+    """
+    x = _center(np.asarray(returns, dtype=np.float64))
+    b = _center(np.asarray(bench, dtype=np.float64).reshape(-1, 1))
+    sx = rolling_sum(x, window)
+    sb = rolling_sum(b, window)
+    cov = rolling_sum(x * b, window) - sx * sb / window
+    var = rolling_sum(b * b, window) - sb * sb / window
+    return _div(cov, var)
+
+
+def rolling_max(values, window):
+    """
+    The maximum of the trailing window of every row of the columns of values,
+    by the van Herk/Gil-Werman method: the rows are cut into blocks of window
+    rows, and the window ending at t is the max of the suffix max of a block
+    and the prefix max of the next one, three maxima per row whatever the
+    window. The first window - 1 rows take the max of the rows so far.
+    NaN are skipped.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    T = x.shape[0]
+    if T == 0:
+        return x.copy()
+    blocks = -(-T // window)
+    pad = np.full((blocks * window,) + x.shape[1:], np.nan)
+    pad[:T] = x
+    pad = pad.reshape((blocks, window) + x.shape[1:])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        g = np.fmax.accumulate(pad, axis=1).reshape((-1,) + x.shape[1:])[:T]
+        h = np.fmax.accumulate(pad[:, ::-1], axis=1)[:, ::-1].reshape((-1,) + x.shape[1:])[:T]
+        out = g.copy()
+        if window <= T:
+            out[window - 1:] = np.fmax(h[:T - window + 1], g[window - 1:])
+    return out
+
+
+def drawdown(values, window=None):
+    """
+    The drawdown of every row of the columns of values, (peak - value) / peak,
+    from the running peak, or from the peak of the trailing window rows if
+    window is given.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if window is None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            peak = np.fmax.accumulate(x, axis=0)
+    else:
+        peak = rolling_max(x, window)
+    return _div(peak - x, peak)
+
+
+def drawdown_stats(values):
+    """
+    The drawdown statistics of every column of values, as arrays of columns:
+        max_drawdown: The largest drawdown from the running peak.
+        peak: The row of the peak before the max drawdown.
+        trough: The row of the max drawdown.
+        recovery: Rows from the trough back to the peak, NaN if it has not recovered.
+        duration: The most rows in a row below the running peak.
+    A NaN value does not count as below the peak.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    x2 = x.reshape(x.shape[0], -1)
+    T, N = x2.shape
+    dd = drawdown(x2)
+    rows = np.arange(T).reshape(-1, 1)
+    under = dd > 0
+    last_top = np.maximum.accumulate(np.where(under, -1, rows), axis=0)
+    next_top = np.minimum.accumulate(np.where(under, T, rows)[::-1], axis=0)[::-1]
+    trough = np.argmax(np.nan_to_num(dd, nan=-1.0), axis=0)
+    cols = np.arange(N)
+    stats = dict()
+    stats['max_drawdown'] = dd[trough, cols]
+    stats['peak'] = last_top[trough, cols]
+    stats['trough'] = trough
+    recovered = next_top[trough, cols]
+    stats['recovery'] = np.where(recovered < T, recovered - trough, np.nan).astype(np.float64)
+    stats['duration'] = np.where(under, rows - last_top, 0).max(axis=0)
+    shape = x.shape[1:]
+    return dict((k, v.reshape(shape)) for k, v in stats.items())
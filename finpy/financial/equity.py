@@ -8,24 +8,32 @@ import pandas as pd
 import numpy as np
 import finpy.utils.fpdateutil as du
 import finpy.data.dataaccess as da
+from finpy.data.panel import fill_panel
 import finpy.utils.utils as ut
 from .fincommon import FinCommon
 from finpy.edgar.company import company
 import os
 import sqlite3
 
-def get_tickdata(ls_symbols, ldt_timestamps, csv_col = [], fill=True, df=pd.DataFrame, actions=True, concepts=[]):
+def get_tickdata(ls_symbols, ldt_timestamps, csv_col = [], fill=True, df=pd.DataFrame, actions=True, concepts=[], workers=1, panel=False):
     """
         To get all price data of all tickers in ls_symbols within the list of ldt_timestamps
         :param ls_symbols: A list with all tickers
         :param ldt_timestamps: A list with all trading days within the time frame.
         :param fill: Whether to fill invalid data. Default is True.
+        :param workers: The number of threads loading the symbols.
+        :param panel: If True, return a PricePanel, one (dates x symbols x fields) ndarray, instead of a dict of DataFrames.
     """
-    c_dataobj = da.DataAccess("Yahoo", cachestalltime=0)
+    c_dataobj = da.DataAccess("Yahoo", workers=workers)
     if csv_col:
         ls_keys = csv_col
     else:    
         ls_keys = ['open', 'high', 'low', 'actual_close', 'close', 'volume']
+    if panel:
+        pp = c_dataobj.get_panel(ldt_timestamps, ls_symbols, ls_keys, actions=actions)
+        if fill == True:
+            fill_panel(pp.values)
+        return pp
     ldf_data = c_dataobj.get_data(ldt_timestamps, ls_symbols, ls_keys, actions)
     d_data = dict(list(zip(ls_symbols, ldf_data)))
     if fill == True:
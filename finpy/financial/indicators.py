@@ -0,0 +1,160 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Technical indicators of many tickers at once, over a (dates x tickers) close matrix.
+"""
+import numpy as np
+from . import analytics
+
+
+def wilder_rsi(close, period=14):
+    """
+    Relative Strength Index of every column of close, with Wilder smoothing.
+    http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:relative_strength_index_rsi
+    The average gain and loss start as the means of the first period changes
+    of a column, then avg = (avg * (period - 1) + change) / period.
+    The recursion steps through the dates, every step over all the columns.
+    A NaN close, like a ticker not listed yet, is skipped: the averages carry over.
+        :param close: (dates x tickers) array of close prices, or a 1-d array.
+        :param period: The smoothing period.
+        :return: Array of RSI shaped like close, NaN until a column has period changes.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    c = close.reshape(close.shape[0], -1)
+    T, N = c.shape
+    rsi = np.full((T, N), np.nan)
+    avg_gain = np.zeros(N)
+    avg_loss = np.zeros(N)
+    count = np.zeros(N, dtype=int)
+    last = np.full(N, np.nan)
+    for i in range(T):
+        delta = c[i] - last
+        valid = ~np.isnan(delta)
+        last = np.where(np.isnan(c[i]), last, c[i])
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        count += valid
+        seed = valid & (count <= period)
+        smooth = valid & (count > period)
+        avg_gain[seed] += gain[seed] / period
+        avg_loss[seed] += loss[seed] / period
+        avg_gain[smooth] = (avg_gain[smooth] * (period - 1) + gain[smooth]) / period
+        avg_loss[smooth] = (avg_loss[smooth] * (period - 1) + loss[smooth]) / period
+        ready = valid & (count >= period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi[i, ready] = np.where(avg_loss[ready] == 0, 100.0,
+                                     100 - 100 / (1 + avg_gain[ready] / avg_loss[ready]))
+    return rsi.reshape(close.shape)
+
+
+class IndicatorEngine(object):
+    """
+    Rolling statistics of a (dates x tickers) close matrix, for every date and
+    ticker at once. The rolling sum, sum of squares, min and max of a window
+    length are computed once, from running sums and block maxima, and shared
+    by every indicator of that window: bollinger uses the sum and the sum of
+    squares, max_rise the min, max_fall the min and the max, up_ratio and
+    dn_ratio the running sum of the up days.
+    The daily returns have an engine of their own, returns.
+
+    A window with a NaN has a NaN sum, like pandas rolling. The min and the max
+    skip the NaN. The first window - 1 rows have no full window; the close
+    matrix should start with enough history, like the warm-up prefix of a Portfolio.
+        :param close: (dates x tickers) array.
+    """
+    def __init__(self, close):
+        self.close = np.asarray(close, dtype=np.float64)
+        # Sums of squares of the values less their column means keep their precision.
+        self._offset = np.nan_to_num(analytics._nanmean(self.close))
+        self._centered = self.close - self._offset
+        self._cache = dict()
+        self._returns = None
+
+    def _get(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def sum(self, window):
+        " Rolling sum of the centered values. "
+        return self._get(('sum', window), lambda: analytics.rolling_sum(self._centered, window))
+
+    def sumsq(self, window):
+        " Rolling sum of squares of the centered values. "
+        return self._get(('sumsq', window), lambda: analytics.rolling_sum(self._centered * self._centered, window))
+
+    def min(self, window):
+        return self._get(('min', window), lambda: -analytics.rolling_max(-self.close, window))
+
+    def max(self, window):
+        return self._get(('max', window), lambda: analytics.rolling_max(self.close, window))
+
+    def mean(self, window):
+        return self._get(('mean', window), lambda: self.sum(window) / window + self._offset)
+
+    def std(self, window, ddof=1):
+        " Rolling standard deviation, with ddof 1 like pandas rolling std. "
+        def std():
+            s = self.sum(window)
+            var = (self.sumsq(window) - s * s / window) / (window - ddof)
+            return np.sqrt(np.maximum(var, 0.0))
+        return self._get(('std', window, ddof), std)
+
+    @property
+    def returns(self):
+        " The IndicatorEngine of the daily returns. The first row is NaN. "
+        if self._returns is None:
+            rtn = np.full(self.close.shape, np.nan)
+            rtn[1:] = self.close[1:] / self.close[:-1] - 1
+            self._returns = IndicatorEngine(rtn)
+        return self._returns
+
+    def bollinger(self, window=20, k=2):
+        """
+        Return the Bollinger Band of every date and ticker, a dict of arrays:
+        'mi' is the moving average, 'hi' and 'lo' the bands k standard
+        deviations above and below, 'ba' the position of the close in the band.
+        """
+        mi = self.mean(window)
+        sigma = self.std(window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ba = (self.close - mi) / (k * sigma)
+        return {'mi': mi, 'hi': mi + k * sigma, 'lo': mi - k * sigma, 'ba': ba}
+
+    def normalized_stdev(self, window=50):
+        " Rolling standard deviation of the daily returns. "
+        return self.returns.std(window)
+
+    def _previous(self, values):
+        " values of the previous row, NaN for the first row. "
+        prev = np.full(values.shape, np.nan)
+        prev[1:] = values[:-1]
+        return prev
+
+    def max_rise(self, window=20):
+        " (close - the min of the window dates before) / close. "
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.close - self._previous(self.min(window))) / self.close
+
+    def max_fall(self, window=20):
+        " (the max - the min of the window dates before) / close. "
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self._previous(self.max(window)) - self._previous(self.min(window))) / self.close
+
+    def up_ratio(self, days=10):
+        """
+        The ratio of the up days, a close not below the previous close, of the
+        current date and the days dates before it. A running sum of the up days
+        makes every step O(1).
+        """
+        def up_ratio():
+            prev = self._previous(self.close)
+            up = np.where(np.isnan(self.close) | np.isnan(prev), np.nan, self.close >= prev)
+            return analytics.rolling_sum(up, days + 1) / (days + 1)
+        return self._get(('up_ratio', days), up_ratio)
+
+    def dn_ratio(self, days=10):
+        " The ratio of the down days, 1 - up_ratio. "
+        return self._get(('dn_ratio', days), lambda: 1.0 - self.up_ratio(days))
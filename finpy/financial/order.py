@@ -4,6 +4,8 @@ This source code is released under the Apache license.
 blacksburg98@yahoo.com
 Created on April 1, 2013
 """
+import numpy as np
+import pandas as pd
 
 class Order():
     def __init__(self, action, shares, tick, date, price=None):
@@ -25,3 +27,128 @@ class Order():
             'date': self.date
         }
 
+
+class OrderLog():
+    """
+    An append-only log of orders, kept as one typed numpy array per column.
+    tick and date are positions in ticks and dates, action is a position in
+    actions, shares and price are floats. The arrays double when they are full,
+    so append is amortized O(1).
+    Iterating the log yields Order objects. frame is a DataFrame of the log,
+    built when it is read.
+    """
+    _columns = [('_tick', np.int32), ('_date', np.int32), ('_action', np.int16),
+                ('_shares', np.float64), ('_price', np.float64)]
+
+    def __init__(self, ticks, dates, capacity=64):
+        self.ticks = list(ticks)
+        self.dates = pd.DatetimeIndex(dates)
+        self.actions = []
+        self._tick_pos = dict((t, n) for n, t in enumerate(self.ticks))
+        self._action_pos = dict()
+        self._n = 0
+        for name, dtype in self._columns:
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+        self._frame = None
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield Order(action=self.actions[self._action[i]], shares=self._shares[i],
+                tick=self.ticks[self._tick[i]], date=self.dates[self._date[i]], price=self._price[i])
+
+    def _reserve(self, k):
+        " Make room for k more orders. "
+        if self._n + k <= len(self._tick):
+            return
+        capacity = max(2 * len(self._tick), self._n + k)
+        for name, dtype in self._columns:
+            a = np.empty(capacity, dtype=dtype)
+            a[:self._n] = getattr(self, name)[:self._n]
+            setattr(self, name, a)
+
+    def _action_code(self, action):
+        code = self._action_pos.get(action)
+        if code is None:
+            code = len(self.actions)
+            self.actions.append(action)
+            self._action_pos[action] = code
+        return code
+
+    def append_pos(self, t, n, action, shares, price):
+        " Append an order of the tick at position n on the date at position t. "
+        self._reserve(1)
+        i = self._n
+        self._tick[i] = n
+        self._date[i] = t
+        self._action[i] = self._action_code(action)
+        self._shares[i] = shares
+        self._price[i] = price
+        self._n += 1
+        self._frame = None
+
+    def append(self, tick, date, action, shares, price=np.nan):
+        " Append an order. "
+        self.append_pos(self.dates.get_loc(date), self._tick_pos[tick], action, shares, price)
+
+    def extend_pos(self, t, n, action, shares, price):
+        " Append many orders at once. All the arguments are arrays of the same length. "
+        k = len(t)
+        self._reserve(k)
+        s = slice(self._n, self._n + k)
+        uniq, inverse = np.unique(np.asarray(action, dtype=str), return_inverse=True)
+        self._tick[s] = n
+        self._date[s] = t
+        self._action[s] = np.array([self._action_code(a) for a in uniq], dtype=np.int16)[inverse]
+        self._shares[s] = shares
+        self._price[s] = price
+        self._n += k
+        self._frame = None
+
+    @property
+    def tick_pos(self):
+        return self._tick[:self._n]
+
+    @property
+    def date_pos(self):
+        return self._date[:self._n]
+
+    @property
+    def shares(self):
+        return self._shares[:self._n]
+
+    @property
+    def price(self):
+        return self._price[:self._n]
+
+    def signed_shares(self):
+        " The shares of each order, positive for a buy and negative for a sell. 0 for any other action. "
+        side = np.array([{'buy': 1.0, 'sell': -1.0}.get(str(a).lower(), 0.0) for a in self.actions] + [0.0])
+        return side[self._action[:self._n]] * self._shares[:self._n]
+
+    @property
+    def frame(self):
+        " The log as a DataFrame indexed by (tick, date), with the columns action, shares and price. "
+        if self._frame is None:
+            n = self._n
+            index = pd.MultiIndex.from_arrays([np.array(self.ticks, dtype=object)[self._tick[:n]],
+                self.dates[self._date[:n]]], names=["tick", "date"])
+            self._frame = pd.DataFrame({'action': np.array(self.actions + [None], dtype=object)[self._action[:n]],
+                'shares': self._shares[:n].copy(), 'price': self._price[:n].copy()}, index=index)
+        return self._frame
+
+    def write_csv(self, csv_file, d=',', chunk=65536):
+        """
+        Write date, tick, action and shares of each order to csv_file, chunk orders at a time,
+        straight from the arrays. The dates and the shares are written as DataFrame.to_csv writes
+        them: dates without a time of day if none has one, shares as the repr of a float.
+        """
+        date_str = self.dates.astype(str).tolist()
+        with open(csv_file, 'w') as fp:
+            for start in range(0, self._n, chunk):
+                end = min(start + chunk, self._n)
+                fp.write(''.join("%s%s%s%s%s%s%r\n" % (date_str[t], d, self.ticks[n], d, self.actions[a], d, s)
+                    for t, n, a, s in zip(self._date[start:end].tolist(), self._tick[start:end].tolist(),
+                        self._action[start:end].tolist(), self._shares[start:end].tolist())))
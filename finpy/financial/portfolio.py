@@ -8,13 +8,51 @@ import datetime as dt
 import pandas as pd
 import numpy as np
 import random 
-import csv
-from .order import Order
+import os
+import inspect
+import functools
+from .order import Order, OrderLog
 from .fincommon import FinCommon
+from . import analytics
+from . import indicators
 import finpy.utils.fpdateutil as du
 from finpy.utils import utils as ut
 from finpy.financial.equity import get_tickdata
 
+def memoized(method):
+    """
+    Cache the result of a Portfolio metric, keyed by the metric and its arguments,
+    like (metric, tick, benchmark, rf_tick). The cache is dropped when buy, sell,
+    put_orders or cal_total change the portfolio. A cached ndarray, DataFrame or
+    Series is returned as a copy, so a caller can change the result but not the
+    cache. A call with an argument that cannot be a key, like a list, is not cached.
+    """
+    name = method.__name__
+    signature = inspect.signature(method)
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (name,) + tuple(list(bound.arguments.items())[1:])
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        if self._metric_version != self._version:
+            self._metric_cache.clear()
+            self._metric_version = self._version
+        try:
+            value = self._metric_cache[key]
+            self.metric_hits += 1
+        except KeyError:
+            self.metric_misses += 1
+            value = method(self, *args, **kwargs)
+            self._metric_cache[key] = value
+        if isinstance(value, (np.ndarray, pd.DataFrame, pd.Series)):
+            return value.copy()
+        return value
+    return wrapper
+
 class Portfolio():
     """
     Portfolio has three items.
@@ -22,117 +60,311 @@ class Portfolio():
     Reference by ticker. self.equities['AAPL']
     cash is a pandas series with daily cash balance.
     total is the daily balance.
-    order_list is a list of Order
+    order_list is a list of Order, or a DataFrame with the columns tick, date, action, shares and price.
+    order is an OrderLog of order_list and of the buy and sell with update_ol.
+    The dates are fixed when the portfolio is made: an order, a buy or a sell on
+    another date, like a day the market is closed, raises KeyError.
+    The metrics, like sharpe_ratio or beta, are memoized until the portfolio changes.
+    metric_hits and metric_misses count the lookups of the metric cache.
+    The shares of equities, cash and total are views of a ledger of numpy arrays,
+    see _build_ledger. buy and sell only record changes; the balances are
+    computed the next time one of the views is read.
+    warmup is the number of trading days before dates[0] the rolling indicators need.
+    The close prices of those days are loaded once, for every ticker, and kept
+    apart from equities. An indicator that needs more days extends them.
+    warmup_close, a DataFrame indexed by date with a column per ticker, are
+    those close prices when they are already loaded, like from a shared panel.
     """
-    def __init__(self, equities, cash, dates, order_list=None):
-        self.equities = pd.concat(equities, names=["tick", "date"])
-        self.equities.sort_index(inplace=True)
+    def __init__(self, equities, cash, dates, order_list=None, warmup=0, warmup_close=None):
+        self._equities = pd.concat(equities, names=["tick", "date"])
+        self._equities.sort_index(inplace=True)
 #        self.equities = self.equities.reorder_levels(order=["date", "tick"])
         """
             :var equities: is a Panel of equities.
         """ 
-        if order_list == None:
-            self.order = pd.DataFrame(columns=['tick', 'date', 'action', 'shares', 'price'])
-            self.order = self.order.set_index(["tick","date"])
-        else:
+        self.dates = dates
+        self._version = 0
+        self._metric_version = 0
+        self._metric_cache = dict()
+        self._riskfree = dict()
+        self.metric_hits = 0
+        self.metric_misses = 0
+        self._build_ledger(cash)
+        if isinstance(order_list, pd.DataFrame):
+            ol = order_list.sort_values('date', kind='stable')
+        elif order_list:
             ol = order_list
             ol.sort(key=lambda x: x.date)
-            self.order = pd.DataFrame.from_records([s.to_dict() for s in ol])
-            self.order = self.order.set_index(["tick","date"])
-            xi = self.order[self.order["price"].isnull()].index
-            self.order.loc[xi, "price"] = self.equities.loc[xi, "close"]
-        self.cash = pd.Series(index=dates)
-        self.cash[0] = cash
-        self.total = pd.Series(index=dates)
-        self.total[0] = self.dailysum(dates[0])
-        self.dates = dates
+            ol = pd.DataFrame.from_records([s.to_dict() for s in ol])
+        else:
+            ol = pd.DataFrame(columns=['tick', 'date', 'action', 'shares', 'price'])
+        if 'price' not in ol:
+            ol = ol.assign(price=np.nan)
+        ol = ol.set_index(["tick","date"])
+        self.order = OrderLog(self._ticks, self._ldt_index, capacity=max(64, 2*len(ol)))
+        if len(ol) > 0:
+            # An order without price is at the close of its date.
+            t, n = self._order_pos(ol)
+            price = pd.to_numeric(ol['price'], errors='coerce').values.astype(float)
+            missing = np.isnan(price)
+            price[missing] = self._equities['close'].values[self._close_row[t[missing], n[missing]]]
+            self.order.extend_pos(t, n, ol['action'].values, pd.to_numeric(ol['shares']).values, price)
+        self.warmup = 0
+        self._warmup_close = pd.DataFrame(index=pd.DatetimeIndex([]))
+        self._engine = None
+        self._engine_history = 0
+        if warmup_close is not None:
+            self._warmup_close = warmup_close
+            self.warmup = len(warmup_close)
+        if warmup > self.warmup:
+            self._load_warmup(warmup - self.warmup)
+
+    def _load_warmup(self, days):
+        """
+        Load the close prices of days more trading days before the warm-up prefix,
+        for every ticker, with a single get_tickdata.
+        """
+        if len(self._warmup_close) > 0:
+            first = self._warmup_close.index[0]
+        else:
+            first = self.dates[0]
+        pre_timestamps = du.getPrevNNYSEdays(first, days)
+        if len(pre_timestamps) == 0:
+            return
+        ticks = self._ticks
+        ldf_data = get_tickdata(ticks, pre_timestamps, csv_col=['close'], actions=False)
+        pre_close = pd.DataFrame(dict((t, ldf_data[t]['close']) for t in ticks), columns=ticks)
+        self._warmup_close = pd.concat([pre_close, self._warmup_close])
+        self.warmup = len(self._warmup_close)
+
+    def close_history(self, window):
+        """
+        Return the close prices of every ticker, with the window trading days
+        before the first date of the portfolio in front, as a DataFrame.
+        """
+        if window > self.warmup:
+            self._load_warmup(window - self.warmup)
+        return pd.concat([self._warmup_close.iloc[max(self.warmup - window, 0):], self.close_frame()])
+
+    def _returns_history(self, window):
+        """
+        Return the daily returns of every ticker, with the window - 1 trading days
+        before the first date of the portfolio in front, as a DataFrame.
+        A rolling window of the first date is then full.
+        """
+        close = self.close_history(window)
+        return pd.DataFrame(analytics.daily_returns(close.values), index=close.index, columns=close.columns).iloc[1:]
+
+    def _rolling_frame(self, values):
+        " The last rows of values, on the dates of the portfolio, as a DataFrame of the ticks. "
+        return pd.DataFrame(values[-len(self._ldt_index):], index=self._ldt_index, columns=self._ticks)
+
+    def _build_ledger(self, cash):
+        """
+        The ledger has the daily changes of shares, a (dates x ticks) array, and
+        the daily changes of cash, an array of dates. Ticks and dates are integer
+        positions: self._tick_pos[tick] and self._ldt_index.get_loc(date).
+        The shares already in equities become the changes of the first dates.
+        _row_t and _row_n map each row of equities to its date and tick positions.
+        """
+        index = self._equities.index
+        self._ticks = index.unique(0).tolist()
+        self._tick_pos = dict((t, n) for n, t in enumerate(self._ticks))
+        self._ldt_index = pd.DatetimeIndex(self.dates)
+        row_n = pd.Index(self._ticks).get_indexer(index.get_level_values(0))
+        row_t = self._ldt_index.get_indexer(index.get_level_values(1))
+        self._rows = np.nonzero(row_t >= 0)[0]
+        self._row_t = row_t[self._rows]
+        self._row_n = row_n[self._rows]
+        shape = (len(self._ldt_index), len(self._ticks))
+        self._close_row = np.full(shape, -1)
+        self._close_row[self._row_t, self._row_n] = self._rows
+        self._close = np.zeros(shape)
+        self._close[self._row_t, self._row_n] = np.nan_to_num(self._equities['close'].values[self._rows])
+        shares = np.full(shape, np.nan)
+        shares[self._row_t, self._row_n] = self._equities['shares'].values[self._rows]
+        shares = pd.DataFrame(shares).ffill().fillna(0).values
+        self._dshares = np.diff(shares, axis=0, prepend=0)
+        self._dcash = np.zeros(shape[0])
+        self._dcash[0] = cash
+        self._shares = np.zeros(shape)
+        self._cash_bal = np.zeros(shape[0])
+        self._total_bal = np.zeros(shape[0])
+        # The first date whose balances are out of date. len(dates) means none is.
+        # Cash is cheap to bring up to date, so it has its own mark.
+        self._cash_dirty = 0
+        self._dirty = 0
+        self._shares_dirty = 0
+
+    def _date_pos(self, date):
+        """
+        The position of date in the dates of the portfolio.
+        Raise KeyError if date is not one of them.
+        """
+        try:
+            return self._ldt_index.get_loc(date)
+        except KeyError:
+            raise KeyError("Not a date of the portfolio: " + str(date))
+
+    def _order_pos(self, order):
+        """
+        Return the date and tick positions of the orders in the DataFrame order, indexed by (tick, date).
+        Raise KeyError if a tick or a date is not in the portfolio.
+        """
+        n = pd.Index(self._ticks).get_indexer(order.index.get_level_values(0))
+        t = self._ldt_index.get_indexer(order.index.get_level_values(1))
+        if (n < 0).any() or (t < 0).any():
+            bad = order.index[(n < 0) | (t < 0)]
+            raise KeyError("Orders not in the portfolio: " + str(list(bad[:5])))
+        return t, n
+
+    def _touch(self, t):
+        " The ledger has changed on the date at position t. "
+        self._version += 1
+        self._cash_dirty = min(self._cash_dirty, t)
+        self._dirty = min(self._dirty, t)
+
+    def _value_cash(self):
+        " Bring cash up to date: the cumulative sum of the cash changes, from the first changed date. "
+        d = self._cash_dirty
+        if d >= len(self._dcash):
+            return
+        np.cumsum(self._dcash[d:], out=self._cash_bal[d:])
+        if d > 0:
+            self._cash_bal[d:] += self._cash_bal[d-1]
+        self._cash = pd.Series(self._cash_bal.copy(), index=self._ldt_index)
+        self._cash_dirty = len(self._dcash)
+
+    def _value(self):
+        """
+        Bring the balances up to date, only from the first date changed since the last time:
+        shares and cash are the cumulative sums of their changes, and total
+        is cash plus the rowwise product of shares and close.
+        """
+        self._value_cash()
+        d = self._dirty
+        if d >= len(self._dcash):
+            return
+        np.cumsum(self._dshares[d:], axis=0, out=self._shares[d:])
+        if d > 0:
+            self._shares[d:] += self._shares[d-1]
+        self._total_bal[d:] = self._cash_bal[d:] + np.einsum('ij,ij->i', self._shares[d:], self._close[d:])
+        self._total = pd.Series(self._total_bal.copy(), index=self._ldt_index)
+        self._shares_dirty = min(self._shares_dirty, d)
+        self._dirty = len(self._dcash)
+
+    @property
+    def equities(self):
+        " The DataFrame of equities, indexed by (tick, date). The shares column is the ledger's. "
+        self._value()
+        d = self._shares_dirty
+        if d < len(self._dcash):
+            sel = np.nonzero(self._row_t >= d)[0]
+            self._equities.iloc[self._rows[sel], self._equities.columns.get_loc('shares')] = self._shares[self._row_t[sel], self._row_n[sel]]
+            self._shares_dirty = len(self._dcash)
+        return self._equities
+
+    @property
+    def cash(self):
+        " The daily cash balance, a Series indexed by date. "
+        self._value_cash()
+        return self._cash
+
+    @property
+    def total(self):
+        " The daily total balance, a Series indexed by date. "
+        self._value()
+        return self._total
+
+    def shares(self, tick, date):
+        " The number of shares of tick held on date. It does not bring the other balances up to date. "
+        t = self._date_pos(date)
+        n = self._tick_pos[tick]
+        d = self._dirty
+        if t < d:
+            return self._shares[t, n]
+        held = self._shares[d-1, n] if d > 0 else 0.0
+        return held + self._dshares[d:t+1, n].sum()
+
+    def close(self, tick, date):
+        " The close price of tick on date. It does not bring the balances up to date. "
+        return self._equities.loc[(tick, date), 'close']
 
     def dailysum(self, date):
         " Calculate the total balance of the date."
-        equities_total = np.nansum(self.equities.xs(key=date, level=1)['shares'] * self.equities.xs(key=date, level=1)['close'])
-        total = equities_total + self.cash[date]
-        return total
+        return self.total.iloc[self._date_pos(date)]
+
+    def _log_order(self, t, tick, action, shares):
+        " Append an order at the close of the date at position t to the order log. "
+        n = self._tick_pos[tick]
+        self.order.append_pos(t, n, action, shares, self._equities['close'].values[self._close_row[t, n]])
 
     def buy(self, shares, tick, price, date, update_ol=False):
         """
         Portfolio Buy 
-        Calculate total, shares and cash upto the date.
-        Before we buy, we need to update share numbers. "
-        """
-        self.cal_total(date)
-        last_valid = self.equities.loc[(tick,slice(None)),'shares'].last_valid_index()[1]
-        self.equities.loc[(tick, slice(last_valid, date)), 'shares'] = self.equities.loc[(tick, last_valid), 'shares']
-        self.equities.loc[(tick, date), 'shares'] += shares
-        self.cash[date] -= price*shares
-        self.total[date] = self.dailysum(date)
+        Add shares of tick on date, and take price*shares from the cash of date.
+        The shares, cash and total of date and after are updated when they are read.
+        """
+        t = self._date_pos(date)
+        self._dshares[t, self._tick_pos[tick]] += shares
+        self._dcash[t] -= price*shares
+        self._touch(t)
         if update_ol:
-            self.order = self.order.append(pd.DataFrame({"action": "buy", "shares" : shares, "price": self.equities.loc[(tick, date), 'close']}, [(tick, date)]))
+            self._log_order(t, tick, "buy", shares)
 
     def sell(self, shares, tick, price, date, update_ol=False):
         """
         Portfolio sell 
-        Calculate shares and cash upto the date.
-        """
-        self.cal_total(date)
-        last_valid = self.equities.loc[(tick,slice(None)),'shares'].last_valid_index()[1]
-        self.equities.loc[(tick, slice(last_valid, date)), 'shares'] = self.equities.loc[(tick, last_valid), 'shares']
-        self.equities.loc[(tick, date), 'shares'] -= shares
-        self.cash[date] += price*shares
-        self.total[date] = self.dailysum(date)
+        Take shares of tick on date, and add price*shares to the cash of date.
+        """
+        t = self._date_pos(date)
+        self._dshares[t, self._tick_pos[tick]] -= shares
+        self._dcash[t] += price*shares
+        self._touch(t)
         if update_ol:
-            self.order = self.order.append(pd.DataFrame({"action": "sell", "shares" : shares, "price": self.equities.loc[(tick, date), 'close']}, [(tick, date)]))
+            self._log_order(t, tick, "sell", shares)
 
     def fillna_cash(self, date):
-        " fillna on cash up to date "
-        update_start = self.cash.last_valid_index()
-        update_end = date
-        self.cash[update_start:update_end] = self.cash[update_start]
-        return update_start, update_end 
+        " Cash is computed for every date from the ledger. Return the dates up to date. "
+        self._value_cash()
+        return self._ldt_index[0], date
 
     def fillna(self, date):
         """
-        fillna cash and all equities.
+        Shares and cash are computed for every date from the ledger.
         return update_start and update_end.
         """
-        update_start, update_end = self.fillna_cash(date)
-        for tick in self.equities.index.unique(0).tolist():
-            self.equities.loc[(tick, slice(update_start, update_end)),'shares'] = self.equities.loc[(tick, update_start), 'shares']
-        return update_start, update_end
+        return self.fillna_cash(date)
 
     def cal_total(self, date=None):
         """
         Calculate total up to "date".
+        The work is deferred: the balances are brought up to date, from the
+        first changed date only, when total, cash, equities or a metric is read.
         """
-        if date == None:
-            equities_sum = pd.Series(index=self.ldt_timestamps())
-            each_total = self.equities.loc[(slice(None),slice(None)),'close'] * self.equities.loc[(slice(None),slice(None)),'shares']
-            equities_sum = each_total.groupby(level=1).sum()
-            self.total = self.cash + equities_sum       
-        else:
-            start, end = self.fillna(date)
-            equities_total_df = self.equities.loc[(slice(None),slice(start,end)),'shares'] * self.equities.loc[(slice(None),slice(start,end)),'close']
-            equities_total = equities_total_df.groupby(level=1).sum()
-            self.total[start:end ] = equities_total + self.cash[start:end]
+        self._version += 1
 
     def put_orders(self):
         """
-        Put the order list to the DataFrame.
-        Update shares, cash columns of each Equity
+        Put the order list to the ledger, all the orders at once.
+        A buy adds shares and a sell takes shares; the signed shares of all the
+        orders are added to the share changes of their (date, tick) with np.add.at,
+        and the signed notional is taken from the cash changes of their dates.
+        An order with another action is ignored.
         """
-        for o in self.order:
-            if o.action.lower() == "buy":
-                self.buy(date=o.date, shares=np.float(o.shares), price=np.float(o.price), tick=o.tick)
-            elif o.action.lower() == "sell":
-                self.sell(shares=np.float(o.shares), tick=o.tick, price=np.float(o.price), date=o.date)
+        if len(self.order) == 0:
+            return
+        t = self.order.date_pos
+        shares = self.order.signed_shares()
+        np.add.at(self._dshares, (t, self.order.tick_pos), shares)
+        np.add.at(self._dcash, t, -shares * self.order.price)
+        self._touch(t.min())
 
     def sim(self, ldt_timestamps=None):
         """
-        Go through each day and calculate total and cash.
+        Put all the orders, then calculate total and cash of each day.
         """
         self.put_orders()
-        if ldt_timestamps == None:
-            ldt_timestamps = self.ldt_timestamps()
-        dt_end = ldt_timestamps[-1]
         self.cal_total()
 
     def csvwriter(self, equity_col=None, csv_file="pf.csv", total=True, cash=True, d=','):
@@ -143,39 +375,36 @@ class Portfolio():
         equity_col specify which columns to print for an equity.
         The specified columns of each equity will be printed.
         """
-        lines = []
-        l = []
-        l.append("Date")
-        if total:
-            l.append("Total")
-        if cash:
-            l.append("Cash")
-        if equity_col != None:
-            for e in self.equities:
-                for col in equity_col:
-                    label = e + col
-                    l.append(label)
-        lines.append(l)
-        for i in self.ldt_timestamps():
-            l = []
-            l.append(i.strftime("%Y-%m-%d"))
-            if total:
-                l.append(round(self.total[i], 2))
-            if cash:
-                l.append(round(self.cash[i], 2))
-            if equity_col != None:
-                for e in self.equities.index.droplevel(1).drop_duplicates():
-                    for col in equity_col:
-                        l.append(round(self.equities.loc[(e, i), col], 2))
-            lines.append(l)
-        with open(csv_file, 'w') as fp:
-            cw = csv.writer(fp, lineterminator='\n', delimiter=d)
-            for line in lines:
-                cw.writerow(line)
+        frame = self.to_frame(equity_col, total, cash).round(2)
+        with open(csv_file, 'w', newline='') as fp:
+            frame.to_csv(fp, sep=d, date_format="%Y-%m-%d", na_rep="nan")
+
+    def export(self, path, fmt=None, equity_col=None, total=True, cash=True):
+        """
+        Write the content of the Portfolio, to_frame, to path, unrounded, so a report
+        can load it without parsing CSV. fmt is "csv", "parquet", "feather" or "npz",
+        by default the extension of path. Parquet and Feather need pyarrow.
+        The npz file has the arrays dates (datetime64), columns and values (dates x columns).
+        """
+        if fmt is None:
+            fmt = os.path.splitext(path)[1].lstrip('.').lower()
+        frame = self.to_frame(equity_col, total, cash)
+        if fmt == "csv":
+            frame.to_csv(path, date_format="%Y-%m-%d")
+        elif fmt == "parquet":
+            frame.to_parquet(path)
+        elif fmt == "feather":
+            frame.reset_index().to_feather(path)
+        elif fmt == "npz":
+            np.savez(path, dates=frame.index.values, columns=np.array(frame.columns, dtype=str), values=frame.values)
+        else:
+            raise ValueError("Unknown export format " + str(fmt))
 
     def write_order_csv(self, csv_file="pf_order.csv", d=','):
-        self.order.reorder_levels(["date", "tick"]).to_csv(path_or_buf = csv_file, sep = d, header = False, columns = ["action", "shares"])
+        " Write date, tick, action and shares of each order, streamed from the order log. "
+        self.order.write_csv(csv_file, d)
 
+    @memoized
     def daily_return(self,tick=None):
         """
         Return the return rate of each day, a list.
@@ -190,10 +419,12 @@ class Portfolio():
         daily_rtn[0] = 0
         return np.array(daily_rtn)
 
+    @memoized
     def avg_daily_return(self, tick=None):
         " Average of the daily_return list "
         return np.average(self.daily_return(tick))
 
+    @memoized
     def std(self, tick=None):
         " Standard Deviation of the daily_return "
         return np.std(self.daily_return(tick))
@@ -209,6 +440,7 @@ class Portfolio():
         self.equities.loc[(tick, slice(None)),'high'] = self.equities.loc[(tick, slice(None)),'high'] * self.equities.loc[(tick, slice(None)),'close']/self.equities.loc[(tick, slice(None)),'actual_close']
         self.equities.loc[(tick, slice(None)),'low'] = self.equities.loc[(tick, slice(None)),'low'] * self.equities.loc[(tick, slice(None)),'close']/self.equities.loc[(tick, slice(None)),'actual_close']
 
+    @memoized
     def sortino(self, k=252, tick=None):
         """
         Return Sortino Ratio. 
@@ -221,6 +453,7 @@ class Portfolio():
         sortino = (self.avg_daily_return(tick) / sortino_dev) * np.sqrt(k)
         return sortino
 
+    @memoized
     def return_ratio(self, tick=None):
         " Return the return ratio of the period "
         if tick == None:
@@ -228,40 +461,47 @@ class Portfolio():
         else:
             return self.equities.loc[(tick, self.ldt_timestamps()[-1]), 'close']/self.equities.loc[(tick, self.ldt_timestamps()[0]), 'close']
 
-    def moving_average(self, window=20, tick=None):
+    def drawdown(self, window=10):
         """
-        Return an array of moving average. Window specified how many days in
-        a window.
+        Find the peak of the total within the retrospective window,
+        the current date and the window dates before it.
+        Drawdown is the difference between the peak and the current value, over the peak.
+        The portfolio has no total before its first date, so the first windows are shorter.
         """
-        if tick == None:
-            ma = pd.stats.moments.rolling_mean(self.total, window=window)
-        else:
-            ma = self.equities[tick].stats.moments.rolling_mean(window=window)
-        ma[0:window] = ma[window]
-        return ma
+        return pd.Series(analytics.drawdown(self.total.values, window + 1), index=self._ldt_index)
 
-    def drawdown(self, window=10):
+    def _value_frame(self):
+        " The close prices of every ticker and the total, column 'total', as a DataFrame. "
+        values = self.close_frame()
+        values['total'] = self.total.values
+        return values
+
+    @memoized
+    def drawdowns(self, window=None):
+        """
+        Return the drawdowns of every ticker and of the total, column 'total',
+        as a DataFrame indexed by date. The peak is the running peak, or with window
+        the peak of the current date and the window dates before it, like drawdown.
+        """
+        values = self._value_frame()
+        dd = analytics.drawdown(values.values, None if window is None else window + 1)
+        return pd.DataFrame(dd, index=values.index, columns=values.columns)
+
+    @memoized
+    def drawdown_stats(self):
         """
-        Find the peak within the retrospective window.
-        Drawdown is the difference between the peak and the current value.
-        """
-        ldt_timestamps = self.ldt_timestamps()
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, window)
-        # ldf_data has the data prior to our current interest.
-        # This is used to calculate moving average for the first window.
-        merged_data = self.total[pd.Index(pre_timestamps[0]), ldt_timestamps[-1]]
-        total_timestamps = merged_data.index
-        dd = pd.Series(index=ldt_timestamps)
-        j = 0
-        for i in range(len(pre_timestamps), len(total_timestamps)):
-            win_start = total_timestamps[i - window]
-            win_end = total_timestamps[i]
-            ts_value = merged_data[win_start:win_end]
-            current = merged_data[win_end]
-            peak = np.amax(ts_value)
-            dd[j] = (peak-current)/peak
-            j += 1
-        return dd
+        Return a DataFrame indexed by ticker, and 'total' for the portfolio, of
+        max_drawdown, the peak and trough dates of the max drawdown, recovery, the
+        trading days from the trough back to the peak value (NaN if not recovered),
+        and duration, the most trading days in a row below the running peak.
+        """
+        values = self._value_frame()
+        stats = analytics.drawdown_stats(values.values)
+        return pd.DataFrame({'max_drawdown': stats['max_drawdown'],
+                             'peak': self._ldt_index[stats['peak']],
+                             'trough': self._ldt_index[stats['trough']],
+                             'recovery': stats['recovery'],
+                             'duration': stats['duration']}, index=values.columns)
 
     def random_choose_tick(self, exclude=[]):
         """
@@ -278,28 +518,90 @@ class Portfolio():
         Return the list of long equities on the date.
         "Long equities" means the number of shares of the equity is greater than 0.
         """
-        return [x for x in self.equities if self.equities[x].shares[date] > 0]
+        self._value()
+        held = self._shares[self._date_pos(date)] > 0
+        return [t for t, h in zip(self._ticks, held) if h]
 
     def ldt_timestamps(self):
         """
         Return an array of datetime objects.
         """
-        ldt_index = self.total.index
-        dt_start = ldt_index[0] 
-        dt_end = ldt_index[-1] 
+        dt_start = self._ldt_index[0]
+        dt_end = self._ldt_index[-1]
         dt_timeofday = dt.timedelta(hours=16)
         ldt_timestamps = du.getNYSEdays(dt_start, dt_end, dt_timeofday)
         return ldt_timestamps
 
+    def _pivot(self, col):
+        " The column col of equities as a (dates x ticks) array, NaN where a tick has no row. "
+        if col == 'shares':
+            self._value()
+            return self._shares.astype(np.float64)
+        values = np.full(self._close_row.shape, np.nan)
+        held = self._close_row >= 0
+        values[held] = self._equities[col].values[self._close_row[held]]
+        return values
+
+    def close_frame(self):
+        " The close prices as a DataFrame indexed by date, a column per ticker. "
+        return pd.DataFrame(self._pivot('close'), index=self._ldt_index, columns=self._ticks)
+
+    def to_frame(self, equity_col=None, total=True, cash=True):
+        """
+        Return the content of the Portfolio as a DataFrame indexed by date, with the
+        columns Total and Cash, and the tick + col columns of equity_col of each equity.
+        Each column of equities is pivoted once, without a lookup per date and tick.
+        """
+        columns = dict()
+        if total:
+            columns["Total"] = self.total.values
+        if cash:
+            columns["Cash"] = self.cash.values
+        if equity_col != None:
+            pivots = dict((col, self._pivot(col)) for col in equity_col)
+            for n, e in enumerate(self._ticks):
+                for col in equity_col:
+                    columns[e + col] = pivots[col][:, n]
+        frame = pd.DataFrame(columns, index=self._ldt_index)
+        frame.index.name = "Date"
+        return frame
+
+    @memoized
+    def batch_metrics(self, benchmark=None, rf_tick="$TNX", k=252):
+        """
+        Return a DataFrame of the metrics of every ticker and of the total of the
+        portfolio, row "total", computed at once by analytics.metrics_table:
+        return_ratio, avg_daily_return, std, sortino, and with rf_tick
+        sharpe_ratio, mean_excess_return and excess_risk, and with benchmark
+        beta, info_ratio, active and residual returns and risks, appraisal_ratio.
+            :param benchmark: The ticker of the market, or None.
+            :param rf_tick: The risk-free rate ticker, or None.
+        """
+        prices = self._value_frame()
+        rf = None if rf_tick is None else self.riskfree_return(rf_tick).values
+        return analytics.metrics_table(prices, benchmark=benchmark, rf=rf, k=k)
+
+    def riskfree_return(self, rf_tick="$TNX"):
+        """
+        The daily risk-free return of the dates of the portfolio.
+        It does not change with the portfolio, so it is read once per rf_tick.
+        """
+        if rf_tick not in self._riskfree:
+            self._riskfree[rf_tick] = ut.riskfree_return(self.ldt_timestamps(), rf_tick=rf_tick)
+        return self._riskfree[rf_tick]
+
+    @memoized
     def excess_return(self, rf_tick="$TNX", tick=None):
         """
         An excess return is the difference between an asset's return and the riskless rate. 
         """
-        return self.daily_return(tick=tick) - ut.riskfree_return(self.ldt_timestamps(), rf_tick=rf_tick)
+        return self.daily_return(tick=tick) - self.riskfree_return(rf_tick)
 
+    @memoized
     def mean_excess_return(self, rf_tick="$TNX", tick=None):
         return np.mean(self.excess_return(rf_tick=rf_tick, tick=tick))
 
+    @memoized
     def residual_return(self, benchmark, rf_tick="$TNX", tick=None):
         """
         A residual return is the excess return minus beta times the benchmark excess return.
@@ -307,24 +609,29 @@ class Portfolio():
         beta = self.beta(benchmark, tick)
         return  self.excess_return(rf_tick=rf_tick, tick=tick) - beta * self.excess_return(rf_tick=rf_tick, tick=benchmark)
 
+    @memoized
     def mean_residual_return(self, benchmark, rf_tick="$TNX", tick=None):
         return np.mean(self.residual_return(benchmark=benchmark, rf_tick=rf_tick, tick=tick))
 
+    @memoized
     def residual_risk(self, benchmark, rf_tick="$TNX", tick=None):
         """
         Residual Risk is the standard deviation of the residual return.
         """
         return np.std(self.residual_return(benchmark=benchmark, rf_tick=rf_tick, tick=tick))
 
+    @memoized
     def active_return(self, benchmark, tick=None):
         """
         An active return is the difference between the benchmark and the actual return.
         """
         return self.daily_return(tick=tick) - self.daily_return(tick=benchmark)
 
+    @memoized
     def mean_active_return(self, benchmark, tick=None):
         return np.mean(self.active_return(benchmark, tick))
 
+    @memoized
     def beta_alpha(self, benchmark):
         """
         benchmark is an Equity representing the market. 
@@ -334,6 +641,7 @@ class Portfolio():
         beta, alpha = np.polyfit(self.daily_return(tick=benchmark), self.daily_return(), 1)
         return beta, alpha
 
+    @memoized
     def beta(self, benchmark, tick=None):
         """
         benchmark is an Equity representing the market. 
@@ -344,6 +652,7 @@ class Portfolio():
         beta = C[0][1]/C[0][0]
         return beta
 
+    @memoized
     def excess_risk(self, rf_tick="$TNX", tick=None):
         """
         $FVX is another option. Five-Year treasury rate.
@@ -351,12 +660,14 @@ class Portfolio():
         """
         return np.std(self.excess_return(rf_tick=rf_tick, tick=tick))
 
+    @memoized
     def active_risk(self, benchmark, tick=None):
         """
         An active risk is the standard deviation of the active return.
         """
         return np.std(self.active_return(benchmark, tick))
 
+    @memoized
     def info_ratio(self, benchmark, rf_tick="$TNX", tick=None):
         """
         Information Ratio
@@ -368,6 +679,7 @@ class Portfolio():
         """
         return self.mean_active_return(benchmark=benchmark, tick=tick)/self.active_risk(benchmark=benchmark, tick=tick)
 
+    @memoized
     def appraisal_ratio(self, benchmark, rf_tick="$TNX", tick=None):
         """
         Appraisal Ratio
@@ -379,6 +691,7 @@ class Portfolio():
         """
         return self.mean_residual_return(benchmark, rf_tick, tick)/self.residual_risk(benchmark, rf_tick, tick)
 
+    @memoized
     def sharpe_ratio(self, rf_tick="$TNX", tick=None):
         """
         Return the Original Sharpe Ratio.
@@ -388,137 +701,135 @@ class Portfolio():
         """
         return self.mean_excess_return(rf_tick=rf_tick, tick=tick)/self.excess_risk(rf_tick=rf_tick, tick=tick)
 
-    def up_ratio(self, date, tick, days=10):
+    @memoized
+    def rolling_sharpe(self, window=50, rf_tick="$TNX"):
+        """
+        Return the Sharpe ratio of the trailing window of every date, for every
+        ticker, as a DataFrame indexed by date with a column per ticker.
+        The windows of the first dates use the warm-up history.
+        """
+        rtn = self._returns_history(window)
+        rf = ut.riskfree_return(rtn.index, rf_tick=rf_tick).values
+        return self._rolling_frame(analytics.rolling_sharpe(rtn.values, rf, window))
+
+    @memoized
+    def rolling_sortino(self, window=50, k=252):
+        " Return the Sortino ratio of the trailing window, like rolling_sharpe. "
+        rtn = self._returns_history(window)
+        return self._rolling_frame(analytics.rolling_sortino(rtn.values, window, k))
+
+    @memoized
+    def rolling_beta(self, benchmark, window=50):
+        " Return the beta against benchmark of the trailing window, like rolling_sharpe. "
+        rtn = self._returns_history(window)
+        return self._rolling_frame(analytics.rolling_beta(rtn.values, rtn[benchmark].values, window))
+
+    @memoized
+    def rolling_info_ratio(self, benchmark, window=50):
+        " Return the information ratio against benchmark of the trailing window, like rolling_sharpe. "
+        rtn = self._returns_history(window)
+        return self._rolling_frame(analytics.rolling_info_ratio(rtn.values, rtn[benchmark].values, window))
+
+    def up_ratio(self, date=None, tick=None, days=10):
         """
-        Return the ratio of the past up days.
+        Return the ratio of the past up days, the current date and the days dates
+        before it, where an up day closes no lower than the day before.
         This function only applies to equities.
+        The whole dates x tickers matrix is computed once per days, from the warm-up
+        history, and cached in the indicator engine.
+            :param date: date, or its position, or None for every date.
+            :param tick: ticker, or None for every ticker.
         """
-        ldt_index = self.ldt_timestamps()
-        last = date
-        first = date-days
-        up = 0.0
-        dn = 0.0
-        for i in range(first, last+1):
-            if self.equities.loc[(tick, ldt_index[i]), 'close'] < self.equities.loc[(tick, ldt_index[i-1]), 'close']:
-                dn += 1
-            else:
-                up += 1
-        ratio = up / (dn + up)
-        return ratio
-
-    def dn_ratio(self, date,tick , days=10):
-        """
-        Return the ratio of the past down days. 
+        return self._indicator(self.indicator_engine(days + 1).up_ratio(days), tick, date)
+
+    def dn_ratio(self, date=None, tick=None, days=10):
+        """
+        Return the ratio of the past down days, 1 - up_ratio.
         This function only applies to equities.
         """
-        ratio = 1.0 - self.up_ratio(date=date, tick=tick, days=days)
-        return ratio
+        return self._indicator(self.indicator_engine(days + 1).dn_ratio(days), tick, date)
+
+    def indicator_engine(self, window):
+        """
+        Return the IndicatorEngine of the close prices of every ticker, with at
+        least window trading days of the warm-up prefix in front. The engine, and
+        so its rolling sums, mins and maxes, is shared by all the indicators
+        until a longer window needs more history.
+        """
+        if self._engine is None or window > self._engine_history:
+            history = max(window, self.warmup)
+            self._engine = indicators.IndicatorEngine(self.close_history(history).values)
+            self._engine_history = history
+        return self._engine
 
-    def rolling_normalized_stdev(self, tick, window=50):
+    def _indicator(self, values, tick, date=None):
+        """
+        The rows of the dates of the portfolio of an engine array: a DataFrame of every
+        ticker if tick is None, else the Series of tick, or its value on date.
+        """
+        frame = self._rolling_frame(values)
+        if tick is None:
+            return frame
+        series = frame[tick]
+        if date is None:
+            return series
+        return series.iloc[date] if isinstance(date, (int, np.integer)) else series[date]
+
+    def rolling_normalized_stdev(self, tick=None, window=50):
         """
         Return the rolling standard deviation of normalized price.
         This function only applies to equities.
+        The warm-up prefix has the data prior to our current interest.
+        This is used to calculate the standard deviation for the first window.
+            :param tick: ticker, or None for a DataFrame of every ticker.
         """
-        ldt_timestamps = self.ldt_timestamps()
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, window)
-        # ldf_data has the data prior to our current interest.
-        # This is used to calculate moving average for the first window.
-        ldf_data = get_tickdata([tick], pre_timestamps)
-        pre_data = pd.concat(ldf_data, names=["tick", "date"])
-        merged_data = pd.concat([pre_data.loc[(tick, slice(None)), 'close'], self.equities.loc[(tick,slice(None)),'close']])
-        all_timestamps = pre_timestamps.append(ldt_timestamps)
-        merged_daily_rtn = (self.equities.loc[(tick,slice(None)),'close']/self.equities.loc[(tick,slice(None)),'close'].shift(1)-1)
-        merged_daily_rtn[0] = 0
-        sigma = merged_daily_rtn.rolling(window).std()
-        return sigma.droplevel(0)[self.ldt_timestamps()]
-
-    def max_rise(self, tick, date, window=20):
+        return self._indicator(self.indicator_engine(window).normalized_stdev(window), tick)
+
+    def max_rise(self, tick=None, date=None, window=20):
         """
         Find the maximum change percentage between the current date and the bottom of the retrospective window.
 
-            :param tick: ticker
+            :param tick: ticker, or None for every ticker.
             :type tick: string
-            :param date: date to calculate max_rise
+            :param date: date to calculate max_rise, or None for every date.
             :type date: datetime
             :param window: The days of window to calculate max_rise.
             :type window: int
         """
-        ldt_timestamps = self.ldt_timestamps() 
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, window)
-        first = pre_timestamps[0]
-        # ldf_data has the data prior to our current interest.
-        # This is used to calculate moving average for the first window.
-        try:
-            self.equities.loc[(tick, first), 'close']
-            merged_data = self.equties.loc[(tick, slice(None)), 'close']
-        except:
-            ldf_data = get_tickdata([tick], pre_timestamps)
-            pre_data = pd.concat(ldf_data, names=["tick", "date"])
-            merged_data = pd.concat([pre_data.loc[(tick, slice(None)), 'close'], self.equities.loc[(tick,slice(None)),'close']])
-        if(isinstance(date , int)):
-            int_date = ldt_timestamps[date]
-        else:
-            int_date = date
-        merged_data = merged_data.droplevel(0)   
-        c = merged_data.index.get_loc(int_date)
-        m = merged_data[c-window:c].min()
-        r = (merged_data[c]-m)/merged_data[c]
-        return r
+        return self._indicator(self.indicator_engine(window).max_rise(window), tick, date)
 
-    def max_fall(self, tick, date, window=20):
+    def max_fall(self, tick=None, date=None, window=20):
         """
         Find the change percentage between the top and the bottom of the retrospective window.
 
-            :param tick: ticker
+            :param tick: ticker, or None for every ticker.
             :type tick: string
-            :param date: date to calculate max_rise
+            :param date: date to calculate max_fall, or None for every date.
             :type date: datetime
-            :param window: The days of window to calculate max_rise.
+            :param window: The days of window to calculate max_fall.
             :type window: int
         """
-        ldt_timestamps = self.ldt_timestamps() 
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, window)
-        first = pre_timestamps[0]
-        # ldf_data has the data prior to our current interest.
-        # This is used to calculate moving average for the first window.
-        try:
-            self.equities.loc[(tick, first), 'close']
-            merged_data = self.equties.loc[(tick, slice(None)), 'close']
-        except:
-            ldf_data = get_tickdata([tick], pre_timestamps)
-            pre_data = pd.concat(ldf_data, names=["tick", "date"])
-            merged_data = pd.concat([pre_data.loc[(tick, slice(None)), 'close'], self.equities.loc[(tick,slice(None)),'close']])
-        if(isinstance(date , int)):
-            int_date = ldt_timestamps[date]
-        else:
-            int_date = date
-        merged_data = merged_data.droplevel(0)   
-        c = merged_data.index.get_loc(int_date)
-        mx = merged_data[c-window:c].max()
-        mn = merged_data[c-window:c].min()
-        r = (mx-mn)/merged_data[c]
-        return r
+        return self._indicator(self.indicator_engine(window).max_fall(window), tick, date)
 
-    def moving_average(self, tick, window=20):
+    def moving_average(self, tick=None, window=20):
         """
         Return an array of moving average. Window specified how many days in
         a window.
 
-            :param tick: ticker
+            :param tick: ticker, or None for a DataFrame of every ticker.
             :type tick: string
             :param window: The days of window to calculate moving average.
             :type window: int
         """
-        mi = self.bollinger_band(tick=tick, window=window, mi_only=True)
-        return mi
+        return self._indicator(self.indicator_engine(window).mean(window), tick)
 
-    def bollinger_band(self, tick, window=20, k=2, mi_only=False):
+    def bollinger_band(self, tick=None, window=20, k=2, mi_only=False):
         """
         Return four arrays for Bollinger Band. The upper band at k times an N-period
         standard deviation above the moving average. The lower band at k times an N-period
         below the moving average.
 
-            :param tick: ticker
+            :param tick: ticker, or None for DataFrames of every ticker.
             :type tick: string
             :param window: The days of window to calculate Bollinger Band.
             :type window: int
@@ -528,52 +839,27 @@ class Portfolio():
                price relative to the bollinger band.
             :type bo: A dictionary of series.
         """
-        ldt_timestamps = self.ldt_timestamps()
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, window)
-        # ldf_data has the data prior to our current interest.
-        # This is used to calculate moving average for the first window.
-        ldf_data = get_tickdata([tick], pre_timestamps)
-        pre_data = pd.concat(ldf_data, names=["tick", "date"])
-        merged_data = pd.concat([pre_data.loc[(tick, slice(None)), 'close'], self.equities.loc[(tick,slice(None)),'close']]).droplevel(0)
-        bo = dict()
-        bo['mi'] = merged_data.rolling(window).mean()[ldt_timestamps] 
         if mi_only:
-            return bo['mi']
-        else:
-            sigma = merged_data.rolling(window).std()
-            bo['hi'] = bo['mi'] + k * sigma[ldt_timestamps] 
-            bo['lo'] = bo['mi'] - k * sigma[ldt_timestamps] 
-            bo['ba'] = (merged_data[ldt_timestamps] - bo['mi']) / (k * sigma[ldt_timestamps])
-            return bo
+            return self.moving_average(tick, window)
+        bo = self.indicator_engine(window).bollinger(window, k)
+        return dict((key, self._indicator(values, tick)) for key, values in bo.items())
 
-    def RSI(self, tick):
+    def RSI(self, tick=None, period=14, history=250):
         """
         Relative Strength Index
         http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:relative_strength_index_rsi
-        This function uses roughly 250 prior points to calculate RS.
+        This function uses history prior points, from the warm-up prefix, to calculate RS.
 
-            :param tick: The ticker to calculate RSI
+            :param tick: The ticker to calculate RSI, or None for every ticker.
             :type tick: string
-            :return rsi[ldt_timestamps]: RSI series
-        """
-        ldt_timestamps = self.ldt_timestamps()
-        pre_timestamps = ut.pre_timestamps(ldt_timestamps, 250)
-        ldf_data = get_tickdata([tick], pre_timestamps)
-        merged_data = pd.concat([ldf_data[tick]['close'], self.equities[tick]['close']])
-        delta = merged_data.diff()
-        gain = pd.Series(delta[delta > 0], index=delta.index).fillna(0)
-        loss = pd.Series(delta[delta < 0], index=delta.index).fillna(0).abs()
-        avg_gain = pd.Series(index=delta.index)
-        avg_loss = pd.Series(index=delta.index)
-        rsi = pd.Series(index=delta.index)
-        avg_gain[14] = gain[1:15].mean()
-        avg_loss[14] = loss[1:15].mean()
-        for i in range(15, len(delta.index)):
-            avg_gain[i] = (avg_gain[i-1]*13+gain[i])/14
-            avg_loss[i] = (avg_loss[i-1]*13+loss[i])/14
-            if avg_loss[i] == 0:
-                rsi[i] = 100
-            else:
-                rs = avg_gain[i]/avg_loss[i]
-                rsi[i] = 100 - 100/(1+rs)
-        return(rsi[ldt_timestamps])
+            :param period: The period of the Wilder smoothing.
+            :return: RSI series of tick, or a DataFrame with a column per ticker.
+        """
+        rsi = self._rsi(period, history)
+        return rsi if tick is None else rsi[tick]
+
+    @memoized
+    def _rsi(self, period, history):
+        close = self.close_history(history)
+        rsi = indicators.wilder_rsi(close.values, period)
+        return pd.DataFrame(rsi[-len(self._ldt_index):], index=self._ldt_index, columns=self._ticks)
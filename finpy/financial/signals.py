@@ -0,0 +1,91 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+Compile entry and exit signal matrices of a strategy into orders.
+"""
+import numpy as np
+import pandas as pd
+
+
+def positions(entry, exit):
+    """
+    Resolve the buy/sell state machine of every column at once: a column goes
+    long on an entry signal while it is flat, and flat on an exit signal while
+    it is long. The last signal is forward filled, so the state of a date is
+    the state of the last date with a signal. A date with both signals keeps the state.
+        :param entry: (dates x tickers) boolean array.
+        :param exit: (dates x tickers) boolean array.
+        :return: (dates x tickers) boolean array, True where the column is long.
+    """
+    entry = np.asarray(entry, dtype=bool)
+    exit = np.asarray(exit, dtype=bool)
+    T = entry.shape[0]
+    signal = np.where(entry & ~exit, 1, np.where(exit & ~entry, 0, -1))
+    rows = np.arange(T).reshape((-1,) + (1,) * (entry.ndim - 1))
+    # The row of the last signal up to each row, -1 before the first one.
+    last = np.maximum.accumulate(np.where(signal >= 0, rows, -1), axis=0)
+    state = np.take_along_axis(signal, np.maximum(last, 0), axis=0)
+    return (last >= 0) & (state == 1)
+
+
+def compile_orders(entry, exit, close, cash, ticks, dates):
+    """
+    Compile entry and exit signals into the orders of a long-only strategy.
+    Each ticker trades with its own cash: a buy takes as many whole shares as
+    the cash of the ticker buys at the close, a sell sells them all at the close.
+    The trades come from the changes of positions(entry, exit). The sizing steps
+    through the round trips, each step over all the tickers, so its cost is the
+    most round trips of a ticker, not the dates.
+        :param entry: (dates x tickers) boolean array of the buy signals.
+        :param exit: (dates x tickers) boolean array of the sell signals.
+        :param close: (dates x tickers) array of close prices. A NaN close has no signal.
+        :param cash: The cash of each ticker, a number or an array of tickers.
+        :param ticks: The tickers of the columns.
+        :param dates: The dates of the rows.
+        :return orders: DataFrame of tick, date, action, shares and price, sorted by date,
+            which Portfolio takes as order_list.
+        :return trips: DataFrame of the round trips, tick, buy_date and sell_date (row
+            positions, sell_date -1 if still open), buy_price, sell_price and shares.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    valid = ~np.isnan(close)
+    pos = positions(np.asarray(entry, dtype=bool) & valid, np.asarray(exit, dtype=bool) & valid)
+    prev = np.zeros_like(pos)
+    prev[1:] = pos[:-1]
+    # Transposed, np.nonzero lists the trades of a ticker together, in date order.
+    bn, bt = np.nonzero((pos & ~prev).T)
+    sn, st = np.nonzero((~pos & prev).T)
+    N = close.shape[1]
+    # k is the round trip of each trade within its ticker.
+    first = np.searchsorted(bn, np.arange(N))
+    bk = np.arange(len(bn)) - first[bn]
+    sk = np.arange(len(sn)) - np.searchsorted(sn, np.arange(N))[sn]
+    K = int(bk.max()) + 1 if len(bk) > 0 else 0
+    buy_price = np.full((N, K), np.nan)
+    buy_price[bn, bk] = close[bt, bn]
+    sell_price = np.full((N, K), np.nan)
+    sell_price[sn, sk] = close[st, sn]
+    shares = np.zeros((N, K))
+    money = np.broadcast_to(np.asarray(cash, dtype=np.float64), (N,)).copy()
+    for k in range(K):
+        bought = ~np.isnan(buy_price[:, k])
+        shares[bought, k] = np.floor(money[bought] / buy_price[bought, k])
+        money[bought] -= shares[bought, k] * buy_price[bought, k]
+        sold = ~np.isnan(sell_price[:, k])
+        money[sold] += shares[sold, k] * sell_price[sold, k]
+    ticks = np.asarray(ticks, dtype=object)
+    dates = pd.DatetimeIndex(dates)
+    sell_t = np.full((N, K), -1)
+    sell_t[sn, sk] = st
+    trips = pd.DataFrame({'tick': ticks[bn], 'buy_date': bt, 'sell_date': sell_t[bn, bk],
+                          'buy_price': buy_price[bn, bk], 'sell_price': sell_price[bn, bk],
+                          'shares': shares[bn, bk]})
+    orders = pd.DataFrame({'tick': np.concatenate([ticks[bn], ticks[sn]]),
+                           'date': dates[np.concatenate([bt, st])],
+                           'action': np.array(['buy'] * len(bn) + ['sell'] * len(sn), dtype=object),
+                           'shares': np.concatenate([shares[bn, bk], shares[sn, sk]]),
+                           'price': np.concatenate([buy_price[bn, bk], sell_price[sn, sk]])})
+    orders = orders.sort_values('date', kind='stable').reset_index(drop=True)
+    return orders, trips
@@ -0,0 +1,98 @@
+"""
+(c) 2013 Tsung-Han Yang
+This source code is released under the Apache license.
+blacksburg98@yahoo.com
+Created on April 1, 2013
+The results store of a Sim run.
+"""
+import os
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from finpy.financial.order import Order
+from finpy.financial.transaction import Transaction
+
+
+class ResultStore(object):
+    """
+    A folder of the heavy results of each ticker of a run of Sim.run_algo:
+    the orders and the transactions as npz files, and the HTML fragments of
+    the ticker page. A worker writes them there, so only a small summary
+    record goes back to the parent, which reads them again when it needs them.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def _file(self, tick, kind):
+        return os.path.join(self.path, tick + "." + kind)
+
+    def put_html(self, tick, kind, html):
+        " Save the HTML fragment kind, like 'div' or 'pie', of tick. "
+        with open(self._file(tick, kind + ".html"), 'w') as f:
+            f.write(html)
+
+    def get_html(self, tick, kind):
+        with open(self._file(tick, kind + ".html"), 'r') as f:
+            return f.read()
+
+    def put_orders(self, tick, orders):
+        " Save the OrderLog orders of tick. "
+        frame = orders.frame
+        np.savez(self._file(tick, "orders.npz"), tick=np.array(frame.index.get_level_values('tick'), dtype=str),
+            date=frame.index.get_level_values('date').values, action=np.array(frame['action'], dtype=str),
+            shares=frame['shares'].values, price=frame['price'].values)
+
+    def get_orders(self, tick):
+        " Return the list of Order of tick. "
+        with np.load(self._file(tick, "orders.npz")) as z:
+            return [Order(action=a, shares=s, tick=t, date=pd.Timestamp(d), price=p)
+                for t, d, a, s, p in zip(z['tick'].tolist(), z['date'], z['action'].tolist(),
+                    z['shares'].tolist(), z['price'].tolist())]
+
+    def put_transactions(self, tick, stat):
+        " Save the list of Transaction of tick. A missing sell is -1 and NaN. "
+        np.savez(self._file(tick, "stat.npz"),
+            buy_date=np.array([x.buy_date for x in stat], dtype=np.int64),
+            buy_price=np.array([x.buy_price for x in stat], dtype=np.float64),
+            sell_date=np.array([-1 if x.sell_date is None else x.sell_date for x in stat], dtype=np.int64),
+            sell_price=np.array([np.nan if x.sell_price is None else x.sell_price for x in stat], dtype=np.float64))
+
+    def get_transactions(self, tick):
+        " Return the list of Transaction of tick. "
+        with np.load(self._file(tick, "stat.npz")) as z:
+            return [Transaction(buy_date=bd, buy_price=bp,
+                sell_date=None if sd < 0 else sd, sell_price=None if sd < 0 else sp)
+                for bd, bp, sd, sp in zip(z['buy_date'].tolist(), z['buy_price'].tolist(),
+                    z['sell_date'].tolist(), z['sell_price'].tolist())]
+
+    def html(self, ticks, kind):
+        " A read-only dict of the HTML fragments kind of ticks, read when they are looked up. "
+        return LazyResults(ticks, lambda tick: self.get_html(tick, kind))
+
+    def transactions(self, ticks):
+        " A read-only dict of the transactions of ticks, read when they are looked up. "
+        return LazyResults(ticks, self.get_transactions)
+
+
+class LazyResults(Mapping):
+    """
+    A read-only dict of ticks, whose values are read by load(tick) on every lookup,
+    so only the values in use are in memory.
+    """
+    def __init__(self, ticks, load):
+        self._ticks = list(ticks)
+        self._set = set(self._ticks)
+        self._load = load
+
+    def __getitem__(self, tick):
+        if tick not in self._set:
+            raise KeyError(tick)
+        return self._load(tick)
+
+    def __iter__(self):
+        return iter(self._ticks)
+
+    def __len__(self):
+        return len(self._ticks)
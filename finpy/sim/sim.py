@@ -11,20 +11,40 @@ import csv
 from finpy.financial.equity import get_tickdata
 from finpy.financial.portfolio import Portfolio
 from finpy.financial.transaction import Transaction
+from finpy.financial.indicators import IndicatorEngine
+from finpy.financial import signals
 import finpy.utils.fpdateutil as du
 from dyplot.dygraphs import Dygraphs
 from dyplot.pie import Pie
 from dyplot.hist import Hist
 import urllib.parse as urlparse
 import os.path
+from finpy.data.panel import PricePanel
+from finpy.sim.results import ResultStore
+
+# The Sim, the shared price panel and the compiled orders of a worker process of run_algo,
+# set by _init_worker.
+_worker = dict()
+
+def _init_worker(sim, spec, compiled):
+    """ Pool initializer: keep the Sim and the compiled orders, and attach to the shared price panel once per worker. """
+    _worker['sim'] = sim
+    _worker['panel'] = PricePanel.attach(spec)
+    _worker['compiled'] = compiled
+
+def _run_worker(i):
+    """ Run algo_wrapper on the ith symbol of the shared panel. """
+    return _worker['sim']._run_tick(_worker['panel'], i, _worker['compiled'])
 
 class Sim():
     """ Sim class allows easily setup for backtesting algorithm.
     """
-    def __init__(self, benchmark_tick="$RUA"):
+    def __init__(self, benchmark_tick="$RUA", warmup=50):
         """ 
         :param banchmark_tick: The ticker for the benchmark. 
             $RUA is Russel 3000.
+        :param warmup: The trading days before the start date the indicators of algo() need.
+            The default covers bollinger_band and rolling_normalized_stdev with their default windows.
         Instance Variable
         :var args: Command Line Arguement. Use argparse.
         :var symbols: All stock tickers in the simulation.
@@ -33,6 +53,8 @@ class Sim():
         :var ldt_timestamps: The list contains all transaction dates.
         :var pf: Portfolio from finpy.financial.portfolio.
         :var all_order: The list contains all orders. 
+        :var warmup: The warm-up days of the Portfolio of algo().
+        :var results: The ResultStore of the orders, transactions and HTML fragments of each ticker.
         """
         parser = argparse.ArgumentParser( description='My main algorithm.')
         self._default_args(parser)
@@ -53,6 +75,9 @@ class Sim():
         self.benchmark_tick = benchmark_tick
         self.pf = None
         self.all_order = []
+        self.warmup = warmup
+        self._panel_start = 0
+        self.results = ResultStore(os.path.join(self.args.dir, 'results', self.args.subdir))
     def _benchmark(self, ticker):
         bm = get_tickdata(ls_symbols=[ticker], ldt_timestamps=self.ldt_timestamps)
         return(Portfolio(bm, 0, self.ldt_timestamps, []))
@@ -76,6 +101,51 @@ class Sim():
                 help="Maximum holding days")
         """
         pass
+    def _load_panel(self):
+        """
+        Load the prices of every symbol, on the warmup trading days before the start
+        date and on ldt_timestamps, into one PricePanel, reading each CSV file once.
+        self._panel_start is the position of the start date in the panel.
+        """
+        pre_timestamps = du.getPrevNNYSEdays(self.ldt_timestamps[0], self.warmup)
+        self._panel_start = len(pre_timestamps)
+        return get_tickdata(ls_symbols=self.symbols, ldt_timestamps=list(pre_timestamps) + list(self.ldt_timestamps), panel=True)
+    def signals(self, close):
+        """
+        The user can overload the method to define his own strategy, for all the
+        tickers at once, instead of algo().
+            :param close: DataFrame of the close prices, indexed by date with a column per
+                ticker. The first rows are the warm-up days before the start date.
+            :return entry, exit: Boolean arrays shaped like close, the buy and the sell signals.
+        The default strategy is the Bollinger band of algo(): buy when the close is not
+        above the lower band, sell when it is above the upper band.
+        """
+        bo = IndicatorEngine(close.values).bollinger(window=20, k=2)
+        with np.errstate(invalid='ignore'):
+            return close.values <= bo['lo'], close.values > bo['hi']
+    def _compile(self, close, start):
+        """
+        Compile the signals of close, whose first start rows are warm-up days, into
+        orders and round trips, each ticker with self.args.cash, in one pass.
+            :return: Dicts by ticker of the DataFrames of orders and of round trips.
+        """
+        entry, exit = self.signals(close)
+        orders, trips = signals.compile_orders(np.asarray(entry)[start:], np.asarray(exit)[start:],
+            close.values[start:], self.args.cash, list(close.columns), close.index[start:])
+        return dict(tuple(orders.groupby('tick'))), dict(tuple(trips.groupby('tick')))
+    def _default_algo(self):
+        " True if algo() is not overloaded, so the strategy is signals(). "
+        return type(self).algo is Sim.algo
+    def _run_tick(self, panel, i, compiled=None):
+        """
+        Run algo_wrapper on the ith symbol of panel, with its warm-up close prices from panel.
+            :param compiled: The orders and round trips of _compile for every symbol, or None.
+        """
+        tick = panel.symbols[i]
+        start = self._panel_start
+        equities = panel.to_dict([tick], start)
+        warmup_close = pd.DataFrame(panel.field('close')[:start, i:i + 1], index=panel.dates[:start], columns=[tick])
+        return self.algo_wrapper(tick, equities=equities, warmup_close=warmup_close, compiled=compiled)
     def run_algo(self):
         """
         run_algo has two steps.
@@ -83,31 +153,42 @@ class Sim():
         If thread is greater than 1, then multiple threads are fire.
         Each thread runs the algorithm defined in algo() on one stock.
         Then call organize_algo() to post process the results for backtesting.
-            :return self.organize_algo(all_res):
+        The prices of all the symbols are loaded once into a PricePanel. With more than
+        one thread, the panel is put in shared memory; each worker attaches to it
+        by name when it starts, and a task only sends the position of its symbol.
+        A worker saves the orders, transactions and HTML fragments of its symbol in
+        self.results and sends back the summary record of algo_wrapper, which the
+        parent collects as they come.
+        Unless algo() is overloaded, the signals of all the symbols are compiled into
+        orders once, before the symbols are run, and handed to each run.
+            :return self.organize_algo(all_res, panel):
         """
         all_res = []
-        # all_res is a list of all returned objects of algo_wrapper.
-        # The returned object is a set.
-        # return (tick, return_ratio, stock_return, pf.order, equities[tick], stat, last)
+        # all_res is a list of the summary records of algo_wrapper.
+        panel = self._load_panel()
+        compiled = None
+        if self._default_algo():
+            compiled = self._compile(panel.frame('close'), self._panel_start)
 # Single-Process Code
         if self.args.thread == 1:
-            for tick in self.symbols:
-                all_res.append(self.algo_wrapper(tick))
+            for i in range(len(panel.symbols)):
+                all_res.append(self._run_tick(panel, i, compiled))
 # End Single-Process Code
 # Multi-Process Code
         else:
-            def append_result(x):
-                all_res.append(x)
-            # Setting up the number of pool equal to the number of CPU counts
-            thread_num = self.args.thread
-            pool = multiprocessing.Pool(thread_num)
-            for tick in self.symbols:
-                pool.apply_async(self.algo_wrapper, args=(tick, ), callback=append_result)
-            pool.close()
-            pool.join()
+            shm, spec = panel.share()
+            try:
+                # Setting up the number of pool equal to the number of CPU counts
+                thread_num = self.args.thread
+                with multiprocessing.Pool(thread_num, initializer=_init_worker, initargs=(self, spec, compiled)) as pool:
+                    for record in pool.imap_unordered(_run_worker, range(len(spec['symbols']))):
+                        all_res.append(record)
+            finally:
+                shm.close()
+                shm.unlink()
 # End Multi-Process Code
-        all_res.sort(key=lambda x: x[1], reverse=True)
-        return(self.organize_algo(all_res))
+        all_res.sort(key=lambda x: x['return_ratio'], reverse=True)
+        return(self.organize_algo(all_res, panel))
     def algo(self, equities, tick):
         """
         The user can overload the method to define his own algorithm. 
@@ -116,57 +197,62 @@ class Sim():
             :param tick: The stock ticker.
             :return pf: pf has all the price information by usring the algorithm.
             :return stat: stat is a list of Transaction items.
-        The default algorithm is just looking at Bollinger band.
+        The default algorithm replays the orders compiled from signals(), see _replay.
+        The default signals() is just looking at Bollinger band.
         If the closing price is lower than the lower band, then buy the stock.
         If the closing price is higher than the higher band, then sell the stock.
+        Called by itself, it compiles the signals of tick alone.
+        """
+        return self._replay(equities, tick)
+    def _replay(self, equities, tick, warmup_close=None, compiled=None):
+        """
+        The default algorithm: replay the orders of tick compiled from signals().
+            :param warmup_close: The warm-up close prices of tick, or None to load them.
+            :param compiled: The orders and round trips of _compile for every symbol, as
+                run_algo compiles them for the whole universe at once. If None, the signals
+                of tick alone are compiled.
+            :return pf, stat: As algo().
         """
         ldt_timestamps = self.ldt_timestamps
         cash = self.args.cash
-        pf = Portfolio(equities, cash, ldt_timestamps, [])
-        mode = "buy"
-        last_buy = {}
-        last_buy_close = 0
+        if compiled is None:
+            pf = Portfolio(equities, cash, ldt_timestamps, [], warmup=self.warmup, warmup_close=warmup_close)
+            close = pf.close_history(self.warmup)
+            start = len(close) - len(ldt_timestamps)
+            compiled = self._compile(close, start)
+            warmup_close = close.iloc[:start]
+        orders, trips = compiled
+        pf = Portfolio(equities, cash, ldt_timestamps, orders.get(tick), warmup=self.warmup, warmup_close=warmup_close)
+        pf.sim()
         stat = []
-        i = 0
-        close = pf.equities[tick]['close']
-        ba = pf.bollinger_band(tick=tick)
-        while i < len(ldt_timestamps):
-            if mode == "buy":
-                if close[i] <= ba['lo'][i]:
-                    pf.cal_total(ldt_timestamps[i])
-                    shares = np.floor(pf.cash[i]/close[i])
-                    print("Buy", shares, " of ", tick, " at ", close[i], " on ", ldt_timestamps[i])
-                    s = Transaction(buy_date=i, buy_price=close[i])
-                    stat.append(s)
-                    pf.buy(date=ldt_timestamps[i], shares=shares,
-                        tick=tick, price=close[i], update_ol=True)
-                    last_buy_close = close[i]
-                    mode = "sell"
-            else:
-                if close[i] > ba['hi'][i]:
-                    update_to = ldt_timestamps[i]
-                    pf.cal_total(update_to)
-                    shares = pf.equities[tick]['shares'][update_to]
-                    print("Sell", shares, " of ", tick, " at ", close[i], " on ", ldt_timestamps[i])
-                    stat[-1].sell_date = i
-                    stat[-1].sell_price = close[i]
-                    pf.sell(date=ldt_timestamps[i], tick=tick, shares=shares, price=close[i], update_ol=True)
-                    mode = "buy"
-            i += 1
-        last_date = ldt_timestamps[-1]
-        pf.cal_total(last_date)
+        if tick in trips:
+            for r in trips[tick].itertuples():
+                sold = r.sell_date >= 0
+                stat.append(Transaction(buy_date=r.buy_date, buy_price=r.buy_price,
+                    sell_date=r.sell_date if sold else None, sell_price=r.sell_price if sold else None))
         return pf, stat
-    def algo_wrapper(self, tick):
+    def algo_wrapper(self, tick, equities=None, warmup_close=None, compiled=None):
         """ The wrapper for algo(). Generate various data for backtesting and viewing.
+        The orders, the transactions and the HTML fragments div, divstd and pie
+        of tick are saved in self.results.
             :param tick: The ticker of the security.
-            :return tick: The ticker of the security.
-            :return return_ratio: The return ratio of the algorithm.
-            :return stock_return: The return ratio of the security in the same preriod.
-            :return pf.order: The order of t
+            :param equities: The prices of tick, like get_tickdata. If None, they are read with get_tickdata.
+            :param warmup_close, compiled: For the default algo(), the warm-up close prices of tick
+                and the compiled orders of every symbol, see _replay. An overloaded algo() does not get them.
+            :return: The summary record, a dict of
+                tick: The ticker of the security.
+                return_ratio: The return ratio of the algorithm.
+                stock_return: The return ratio of the security in the same preriod.
+                orders: The number of orders.
+                succ, fail: The number of the sold transactions with a gain and without.
         """
         dt_timeofday = dt.timedelta(hours=16)
-        equities = get_tickdata(ls_symbols=[tick], ldt_timestamps=self.ldt_timestamps)
-        pf, stat = self.algo(equities=equities, tick=tick)
+        if equities is None:
+            equities = get_tickdata(ls_symbols=[tick], ldt_timestamps=self.ldt_timestamps)
+        if self._default_algo():
+            pf, stat = self._replay(equities, tick, warmup_close, compiled)
+        else:
+            pf, stat = self.algo(equities=equities, tick=tick)
         # Prepare Data for vaiour charts and diagrams
         csvfile = os.path.join(self.args.dir, 'static', 'csv', self.args.subdir,tick + '.csv')
         pf.csvwriter(equity_col=["shares", "close"], csv_file=csvfile, total=True, cash=True, d=',')
@@ -179,8 +265,9 @@ class Sim():
         total_nml = pf.total/pf.total[0]
         algo = tick + ' ALGO'
         ba = pf.bollinger_band(tick)
-        ba_hi_nml = ba['hi']/pf.equities[tick]['close'][0]
-        ba_lo_nml = ba['lo']/pf.equities[tick]['close'][0]
+        close = pf.equities.loc[tick, 'close']
+        ba_hi_nml = ba['hi']/close[0]
+        ba_lo_nml = ba['lo']/close[0]
         col = ['b', 'r', 'g', 'c', 'y', 'm']
         buy_list = [x.date for x in pf.order if x.action == "buy"]
         buy_price = pf.normalized(tick)[buy_list]
@@ -191,7 +278,7 @@ class Sim():
         dg.plot(series=algo, mseries = total_nml)
         dg.plot(series=self.benchmark_tick, mseries = market_nml)
         for o in pf.order:
-            text = tick + '@' + str(pf.equities[tick]['close'][o.date]) + ' on ' \
+            text = tick + '@' + str(pf.close(tick, o.date)) + ' on ' \
                 + o.date.strftime("%Y-%m-%d")
             dg.annotate(tick, o.date.strftime("%Y-%m-%d"), o.action[0].upper(), text)
         csv_file = os.path.join(self.args.dir, 'static', 'csv', self.args.subdir, tick + "_dygraph.csv")
@@ -227,37 +314,40 @@ class Sim():
             js_vid = 'pie' + tick
             pie = gpie.savefig(div_id=div_id, js_vid=js_vid)
         return_ratio = pf.return_ratio()
-        stock_return = pf.equities[tick]['close'][-1]/pf.equities[tick]['close'][0]
-        return (tick, return_ratio, stock_return, pf.order, equities[tick], stat, div, divstd, pie)
-    def organize_algo(self, all_res):
+        stock_return = close[-1]/close[0]
+        self.results.put_orders(tick, pf.order)
+        self.results.put_transactions(tick, stat)
+        self.results.put_html(tick, 'div', div)
+        self.results.put_html(tick, 'divstd', divstd)
+        self.results.put_html(tick, 'pie', pie)
+        return {'tick': tick, 'return_ratio': return_ratio, 'stock_return': stock_return,
+                'orders': len(pf.order), 'succ': succ, 'fail': fail}
+    def organize_algo(self, all_res, panel):
         """ Post Process algo data.
-                :param all_res: all_res is a list contains results from algo.
+                :param all_res: all_res is a list of the summary records of algo_wrapper.
                     Each item is the result of the simulation on a security.
+                :param panel: The PricePanel of the symbols, from _load_panel.
+                :return: stat, div, divstd and pie are read-only dicts by ticker,
+                    read from self.results when an item is looked up, and the summary table.
         """
-        equities = {}
-        stat = {}
-        div = {}
-        divstd = {}
-        pie = {}
+        ticks = [y['tick'] for y in all_res]
         summary = '<table class="table table-bordered">\n'
         summary += "<th>Ticker</th><th>Algo Return</th><th>Stock Return</th>"
         for y in all_res:
             summary += "<tr>\n" 
-            summary += "<td><a href=\"%s.html\">%s</a></td><td>%f</td><td>%f</td>\n" %(y[0], y[0],y[1],y[2])
+            summary += "<td><a href=\"%s.html\">%s</a></td><td>%f</td><td>%f</td>\n" %(y['tick'], y['tick'], y['return_ratio'], y['stock_return'])
             summary += "</tr>\n"
-            self.all_order.extend(y[3])
-            equities[y[0]] = y[4]
-            stat[y[0]] = y[5]
-            div[y[0]] = y[6]
-            divstd[y[0]] = y[7]
-            pie[y[0]] = y[8]
+            if y['orders'] > 0:
+                self.all_order.extend(self.results.get_orders(y['tick']))
         summary += '</table>'
         self.all_order.sort(key=lambda x: x.date)
-        for x in equities:
-            equities[x]['shares'] = np.NaN
-            equities[x]['shares'][0] = 0
-        equities[self.benchmark_tick] = self.benchmark.equities[self.benchmark_tick]
+        equities = panel.to_dict(ticks, self._panel_start)
+        equities[self.benchmark_tick] = self.benchmark.equities.loc[self.benchmark_tick].copy()
         self.pf = Portfolio(equities, self.args.cash, self.ldt_timestamps)
+        stat = self.results.transactions(ticks)
+        div = self.results.html(ticks, 'div')
+        divstd = self.results.html(ticks, 'divstd')
+        pie = self.results.html(ticks, 'pie')
         return (stat, div, divstd, pie, summary)
     def backtesting(self):
         market = self.benchmark
@@ -293,8 +383,8 @@ class Sim():
                     output += "<td>%s</td><td>skip buy</td><td>%s</td><td>%d</td><td>%f</td>\n" %(sdate,ticka,shares,o.price)
                     output += "<td></td><td></td><td></td>\n"
             else:
-                shares = self.pf.equities[o.tick]['shares'][o.date]
-                price = self.pf.equities[o.tick]['close'][o.date]
+                shares = self.pf.shares(o.tick, o.date)
+                price = self.pf.close(o.tick, o.date)
                 if shares > 0:
                     print("sell", shares, " of", o.tick, " at", o.price, o.date, ". A gain of", o.price/buy_price[o.tick])
                     gain = o.price/buy_price[o.tick]
@@ -151,6 +151,17 @@ def getNYSEdays(startday = dt.datetime(1964,7,5), endday = dt.datetime(2020,12,3
     dates = GTS_DATES[startday:endday]
     return(dates)
 
+def getPrevNNYSEdays(startday, days):
+    """
+    @summary: Return the days NYSE trading days before startday (exclusive),
+    in the same form as getNYSEdays. Fewer days are returned if the calendar
+    starts less than days trading days before startday.
+    @param startday: The day after the last returned day.
+    @param days: Number of trading days to return.
+    """
+    i = GTS_DATES.index.searchsorted(startday.replace(hour=0, minute=0, second=0, microsecond=0), side='left')
+    return GTS_DATES.iloc[max(i - days, 0):i]
+
 def getNextNNYSEdays(startday, days, timeofday):
     """
     @summary: Create a list of timestamps from startday that is days days long
@@ -5,21 +5,50 @@ blacksburg98@yahoo.com
 Created on November 24, 2014
 """
 import datetime as dt
+import threading
 from . import fpdateutil as du
 import numpy as np
 import pandas as pd
 import finpy.data.dataaccess as da
 
+# The daily risk-free return history of each rate ticker, and the last date it was checked up to.
+_riskfree = dict()
+_riskfree_lock = threading.Lock()
+
+def riskfree_history(rf_tick="$TNX", dt_end=None):
+    """
+    Return the whole daily risk-free return history of rf_tick, a Series indexed by date.
+    It is read once per process, from the column store in the scratch directory,
+    so other processes do not parse the CSV file again.
+    If dt_end is after the last date checked, the ticker is downloaded if it is stale and read again.
+    """
+    with _riskfree_lock:
+        rf, checked = _riskfree.get(rf_tick, (None, None))
+        if rf is not None and (dt_end is None or dt_end <= checked):
+            return rf
+        c_dataobj = da.DataAccess('Yahoo')
+        if dt_end is not None:
+            c_dataobj.update_symbols([rf_tick], dt_end)
+        close = c_dataobj.get_history(rf_tick, ['close'], actions=False)['close']
+        rf = (close.astype(np.float64)/100)/365
+        if len(rf) > 0:
+            checked = max(rf.index[-1], dt_end) if dt_end is not None else rf.index[-1]
+        else:
+            checked = dt_end
+        _riskfree[rf_tick] = (rf, checked)
+        return rf
+
 def riskfree_return(ldt_timestamps, rf_tick="$TNX"):
     """
     Default is $TNX. Ten-year treasury rate
     $FVX is another option. Five-Year treasury rate.
+    Return the daily risk-free return on ldt_timestamps, looked up in riskfree_history.
+    The rate of a timestamp is the last rate up to it, so a timestamp with a time of day,
+    or a date without a rate, takes the rate before it. A timestamp before the history is NaN.
     """
-    c_dataobj = da.DataAccess('Yahoo', cachestalltime=0)
-    ls_keys = ['open', 'high', 'low', 'close', 'volume', 'actual_close']
-    ldf_data = c_dataobj.get_data(ldt_timestamps, [rf_tick], ls_keys)
-    rf = (ldf_data[0]['close']/100)/365
-    return rf
+    index = pd.DatetimeIndex(ldt_timestamps)
+    rf = riskfree_history(rf_tick, index[-1] if len(index) > 0 else None)
+    return rf.ffill().reindex(index, method='ffill')
 
 def pre_timestamps(ldt_timestamps, window):
     """
@@ -38,17 +67,12 @@ def get_max_draw_down(ts_vals):
     """
     @summary Returns the max draw down of the returns.
     @param ts_vals: 1d numpy array or fund list
-    @return Max draw down
+    @return Max draw down. NaN values are skipped.
 
     """
-    MDD = 0
-    DD = 0
-    peak = -99999
-    for value in ts_vals:
-        if (value > peak):
-            peak = value
-        else:
-            DD = (peak - value) / peak
-        if (DD > MDD):
-            MDD = DD
-    return MDD
+    values = np.asarray(ts_vals, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return 0
+    peak = np.maximum.accumulate(values)
+    return max(0, np.max((peak - values) / peak))
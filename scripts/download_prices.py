@@ -0,0 +1,29 @@
+from finpy.data.downloader import PriceDownloader
+from finpy.data.DataPull import read_symbols
+from finpy.utils.components import sp500
+import argparse
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Download the Yahoo daily prices concurrently.')
+    parser.add_argument('-tick', help='ticker file list')
+    parser.add_argument('-sp500', action="store_true", default=False, help="include all tickers in s&p 500")
+    parser.add_argument('-dir', default=None, help="data directory. The default is $FINPYDATA/Yahoo")
+    parser.add_argument('-concurrency', type=int, default=4, help="the maximum number of requests in flight")
+    parser.add_argument('-rate', type=float, default=2, help="the maximum number of requests per second")
+    parser.add_argument('-batch', type=int, default=20, help="the maximum number of tickers per request")
+    parser.add_argument('-retries', type=int, default=3, help="the number of retries of a failed request")
+    parser.add_argument('-full', action="store_true", default=False, help="download the whole history of every symbol")
+    args = parser.parse_args()
+    tickers = read_symbols(args.tick) if args.tick else []
+    if args.sp500:
+        tickers += sp500()
+    data_path = args.dir if args.dir else os.path.join(os.environ['FINPYDATA'], "Yahoo")
+    downloader = PriceDownloader(data_path, max_concurrency=args.concurrency, rate=args.rate,
+        batch_size=args.batch, retries=args.retries, incremental=not args.full)
+    downloader.download(list(dict.fromkeys(tickers)))
+    summary = downloader.summary()
+    print(summary.to_string())
+    failed = summary[summary['error'].notna()]
+    print("Got {0} stocks. Could not get {1}".format(len(summary) - len(failed), len(failed)))
+    print(f"Execution time: {downloader.elapsed:0.2f} seconds.")
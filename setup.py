@@ -11,7 +11,7 @@ setup(
     packages=find_packages(),
     package_data={'finpy': ['data/Yahoo/*.csv', 'utils/*.txt',
         'data/Yahoo/*.txt', 'data/Yahoo/Lists/*']},
-    scripts=['scripts/marketsim.py'],
+    scripts=['scripts/marketsim.py', 'scripts/download_prices.py'],
     url='http://pypi.python.org/pypi/FinPy/',
     license='LICENSE.txt',
     description='Financial Python. Using python to do stock analysis.',
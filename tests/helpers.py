@@ -0,0 +1,52 @@
+"""
+Stand-ins shared by the tests of finpy.data.
+"""
+import os
+import pandas as pd
+
+
+def stand_in_prices(start="2006-01-02", end="2006-01-20"):
+    """
+    Daily prices of a stand-in of yfinance, one row per business day.
+    Every price column counts the days, and there are no dividends or splits.
+    """
+    dates = pd.bdate_range(start, end, name="Date")
+    return pd.DataFrame({
+        "Open": range(len(dates)),
+        "High": range(len(dates)),
+        "Low": range(len(dates)),
+        "Close": range(len(dates)),
+        "Adj Close": range(len(dates)),
+        "Volume": range(len(dates)),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0}, index=dates)
+
+
+class StandInActions(object):
+    """
+    Mixin of a test case whose self.prices is a stand_in_prices frame.
+    fetch_actions returns the dividends and splits of its nonzero rows, as yfinance does.
+    """
+    def fetch_actions(self, symbol):
+        a = self.prices[["Dividends", "Stock Splits"]]
+        return a[(a != 0).any(axis=1)]
+
+
+def write_yahoo(data_path, symbol, prices, actions=True):
+    """
+    Write prices as the Yahoo CSV file of symbol in data_path, like DataPull does,
+    and its nonzero dividends and splits as the actions file if actions is true.
+    """
+    prices[["Open", "High", "Low", "Close", "Adj Close", "Volume"]].to_csv(
+        os.path.join(data_path, symbol + ".csv"), date_format="%Y-%m-%d")
+    if actions:
+        a = prices[["Dividends", "Stock Splits"]]
+        a[(a != 0).any(axis=1)].to_csv(os.path.join(data_path, symbol + "_actions.csv"), date_format="%Y-%m-%d")
+
+
+def data_access(root, scratch, **kwargs):
+    """ A DataAccess of the Yahoo folder in root, whatever FINPYDATA and FINPYSCRATCH are. """
+    from unittest import mock
+    from finpy.data.dataaccess import DataAccess
+    with mock.patch.dict(os.environ, {"FINPYDATA": root, "FINPYSCRATCH": scratch}):
+        return DataAccess("Yahoo", **kwargs)
@@ -0,0 +1,130 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial import analytics
+from finpy.utils import utils as ut
+
+class TestMetricsTable(unittest.TestCase):
+    """
+    analytics.metrics_table against the formulas of the per ticker Portfolio methods.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        dates = pd.bdate_range("2010-01-04", periods=300)
+        steps = 1 + rng.normal(0.0005, 0.01, size=(300, 4))
+        self.prices = pd.DataFrame(100 * np.cumprod(steps, axis=0), index=dates, columns=["A", "B", "C", "M"])
+        self.rf = pd.Series(0.03/365, index=dates)
+        self.rf.iloc[5] = np.nan
+
+    def daily_return(self, col):
+        p = self.prices[col]
+        r = p/p.shift(1)-1
+        r[0] = 0
+        return np.array(r)
+
+    def test_single(self):
+        print("test metrics without benchmark...")
+        t = analytics.metrics_table(self.prices)
+        r = self.daily_return("B")
+        self.assertAlmostEqual(t.loc["B", "std"], np.std(r))
+        self.assertAlmostEqual(t.loc["B", "avg_daily_return"], np.average(r))
+        self.assertAlmostEqual(t.loc["B", "sortino"], np.average(r)/np.std(r[r < 0])*np.sqrt(252))
+        self.assertAlmostEqual(t.loc["B", "return_ratio"], self.prices["B"][-1]/self.prices["B"][0])
+        self.assertNotIn("beta", t.columns)
+
+    def test_benchmark(self):
+        print("test metrics with benchmark and risk-free rate...")
+        t = analytics.metrics_table(self.prices, benchmark="M", rf=self.rf.values)
+        r = self.daily_return("A")
+        m = self.daily_return("M")
+        C = np.cov(m, r)/np.var(m)
+        beta = C[0][1]/C[0][0]
+        self.assertAlmostEqual(t.loc["A", "beta"], beta)
+        self.assertAlmostEqual(t.loc["M", "beta"], 1.0)
+        excess = r - self.rf
+        self.assertAlmostEqual(t.loc["A", "sharpe_ratio"], np.mean(excess)/np.std(excess))
+        active = r - m
+        self.assertAlmostEqual(t.loc["A", "info_ratio"], np.mean(active)/np.std(active))
+        residual = excess - beta * (m - self.rf)
+        self.assertAlmostEqual(t.loc["A", "appraisal_ratio"], np.mean(residual)/np.std(residual))
+
+class TestRolling(unittest.TestCase):
+    """
+    The running-sum kernels of analytics against pandas rolling windows.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.rtn = pd.DataFrame(rng.normal(0.0005, 0.01, size=(400, 3)), columns=["A", "B", "M"])
+        self.rtn.iloc[100, 1] = np.nan
+        self.rf = pd.Series(0.03/365, index=self.rtn.index)
+        self.window = 30
+
+    def test_sharpe(self):
+        print("test rolling sharpe...")
+        excess = self.rtn.sub(self.rf, axis=0)
+        r = excess.rolling(self.window)
+        expected = r.mean()/r.std(ddof=0)
+        got = analytics.rolling_sharpe(self.rtn.values, self.rf.values, self.window)
+        np.testing.assert_allclose(got, expected.values, rtol=1e-7, atol=1e-9)
+        self.assertTrue(np.isnan(got[:self.window-1]).all())
+        self.assertTrue(np.isnan(got[100:100+self.window, 1]).all())
+
+    def test_beta_info(self):
+        print("test rolling beta and info ratio...")
+        m = self.rtn["M"]
+        beta = analytics.rolling_beta(self.rtn.values, m.values, self.window)
+        expected = self.rtn.rolling(self.window).cov(m).div(m.rolling(self.window).var(), axis=0)
+        np.testing.assert_allclose(beta, expected.values, rtol=1e-7, atol=1e-9)
+        active = self.rtn.sub(m, axis=0)
+        info = analytics.rolling_info_ratio(self.rtn.values, m.values, self.window)
+        r = active.rolling(self.window)
+        np.testing.assert_allclose(info[:, :2], (r.mean()/r.std(ddof=0)).values[:, :2], rtol=1e-7, atol=1e-9)
+
+    def test_sortino(self):
+        print("test rolling sortino...")
+        got = analytics.rolling_sortino(self.rtn.values, self.window)
+        a = self.rtn["A"].values
+        for t in [self.window - 1, 200, 399]:
+            w = a[t - self.window + 1:t + 1]
+            self.assertAlmostEqual(got[t, 0], np.average(w)/np.std(w[w < 0])*np.sqrt(252))
+
+class TestDrawdown(unittest.TestCase):
+    """
+    The drawdown analytics against the loops they replace.
+    """
+    def test_rolling_max(self):
+        print("test rolling max...")
+        rng = np.random.default_rng(3)
+        x = pd.DataFrame(rng.normal(size=(103, 4)))
+        x.iloc[10:13, 2] = np.nan
+        for window in [1, 5, 11, 103, 200]:
+            expected = x.rolling(window, min_periods=1).max()
+            np.testing.assert_array_equal(analytics.rolling_max(x.values, window), expected.values)
+
+    def test_stats(self):
+        print("test drawdown stats...")
+        v = np.array([[10, 5], [12, 5], [9, 6], [6, 7], [12, 8], [13, 4], [12, 5]], dtype=float)
+        stats = analytics.drawdown_stats(v)
+        np.testing.assert_allclose(stats['max_drawdown'], [0.5, 0.5])
+        np.testing.assert_array_equal(stats['peak'], [1, 4])
+        np.testing.assert_array_equal(stats['trough'], [3, 5])
+        np.testing.assert_array_equal(stats['recovery'], [1, np.nan])
+        np.testing.assert_array_equal(stats['duration'], [2, 2])
+        dd = analytics.drawdown(v[:, 0], window=2)
+        np.testing.assert_allclose(dd, [0, 0, 0.25, 1/3, 0, 0, 1/13])
+
+    def test_max_draw_down(self):
+        print("test get_max_draw_down...")
+        v = 100 * np.cumprod(1 + np.random.default_rng(5).normal(0, 0.02, 500))
+        mdd = 0
+        peak = v[0]
+        for value in v:
+            peak = max(peak, value)
+            mdd = max(mdd, (peak - value)/peak)
+        self.assertAlmostEqual(ut.get_max_draw_down(v), mdd)
+        self.assertEqual(ut.get_max_draw_down([1, 2, 3]), 0)
+        self.assertAlmostEqual(ut.get_max_draw_down([1, 2, np.nan, 1, 3]), 0.5)
+        self.assertEqual(ut.get_max_draw_down([np.nan, np.nan]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finpy.data.cache import FrameCache
+from helpers import stand_in_prices, write_yahoo, data_access
+
+class TestFrameCache(unittest.TestCase):
+    def frame(self, n=100):
+        return pd.DataFrame({"close": np.zeros(n, dtype=np.float32)}, index=pd.bdate_range("2006-01-02", periods=n))
+
+    def test_lru_bytes(self):
+        print("test byte-bound LRU eviction...")
+        nbytes = int(self.frame().memory_usage(index=True).sum())
+        cache = FrameCache(max_bytes=2 * nbytes)
+        cache.put("a", self.frame())
+        cache.put("b", self.frame())
+        self.assertIsNotNone(cache.get("a", 1))
+        cache.put("c", self.frame())
+        # b is the least recently used entry.
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertIsNotNone(cache.get("c", 1))
+        self.assertEqual(cache.nbytes, 2 * nbytes)
+        # A frame larger than the cache is not kept, and evicts nothing.
+        cache.put("d", self.frame(1000))
+        self.assertIsNone(cache.get("d", 1))
+        self.assertEqual(cache.nbytes, 2 * nbytes)
+
+    def test_expiry(self):
+        print("test cachestalltime expiry...")
+        cache = FrameCache()
+        with mock.patch("time.time", return_value=1000.0):
+            cache.put("a", self.frame())
+        with mock.patch("time.time", return_value=1000.0 + 3599):
+            self.assertIsNotNone(cache.get("a", 1))
+        with mock.patch("time.time", return_value=1000.0 + 3601):
+            self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(cache.nbytes, 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_source(self):
+        print("test entry of another source...")
+        cache = FrameCache()
+        cache.put("a", self.frame(), "1-1")
+        self.assertIsNotNone(cache.get("a", 1, "1-1"))
+        self.assertIsNone(cache.get("a", 1, "2-1"))
+        self.assertIsNone(cache.get("a", 1, "1-1"))
+
+
+class TestHistoryCache(unittest.TestCase):
+    """
+    DataAccess.get_history and get_window through a FrameCache, with and without the column store.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scratch = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.root, "Yahoo")
+        os.mkdir(self.data_path)
+        self.prices = stand_in_prices()
+        write_yahoo(self.data_path, "A", self.prices)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.scratch)
+
+    def data_access(self, **kwargs):
+        da = data_access(self.root, self.scratch, **kwargs)
+        da.cache = FrameCache()
+        return da
+
+    def test_file_change(self):
+        print("test cached history follows the CSV file...")
+        da = self.data_access()
+        self.assertEqual(da.get_history("A", ["open"])["open"].iloc[-1], 14)
+        da.get_history("A", ["open"])
+        self.assertEqual((da.cache.hits, da.cache.misses), (1, 1))
+        self.prices["Open"] += 100
+        write_yahoo(self.data_path, "A", self.prices)
+        path = os.path.join(self.data_path, "A.csv")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(da.get_history("A", ["open"])["open"].iloc[-1], 114)
+        self.assertEqual(da.cache.misses, 2)
+        # A size change alone is enough.
+        self.prices.loc["2006-01-23"] = self.prices.iloc[-1]
+        write_yahoo(self.data_path, "A", self.prices)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(len(da.get_history("A", ["open"])), len(self.prices))
+
+    def test_without_store(self):
+        print("test history and window without the column store...")
+        ts = self.prices.index[[1, 2, 5]]
+        expected = self.data_access().get_window("A", ts, ["open", "close"])
+        for cachestalltime in (0, 12):
+            da = self.data_access(colstore=False, cachestalltime=cachestalltime)
+            self.assertIsNone(da.store)
+            pd.testing.assert_frame_equal(da.get_window("A", ts, ["open", "close"]), expected, check_dtype=False)
+            self.assertEqual(len(da.get_history("A", ["open"])), len(self.prices))
+            panel = da.get_panel(ts, ["A"], ["open", "close"])
+            np.testing.assert_array_equal(panel.values[:, 0, :], expected.values)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from helpers import stand_in_prices, write_yahoo, data_access
+
+ITEMS = ["open", "high", "low", "actual_close", "close", "volume"]
+
+class TestColumnStore(unittest.TestCase):
+    """
+    ColumnStore.get_frame and get_history against DataAccess.get_data_hardread.
+    A has a dividend on 2006-01-05 and a 2:1 split on 2006-01-10, and volumes past 2**24.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scratch = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.root, "Yahoo")
+        os.mkdir(self.data_path)
+        self.prices = self.stand_in(0)
+        write_yahoo(self.data_path, "A", self.prices)
+        self.da = data_access(self.root, self.scratch, cachestalltime=0)
+        self.dates = self.prices.index
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.scratch)
+
+    def stand_in(self, offset):
+        p = stand_in_prices()
+        n = np.arange(len(p), dtype=np.float64) + offset
+        p["Open"], p["High"], p["Low"] = n, n + 0.5, n - 0.5
+        p["Close"], p["Adj Close"] = n + 0.25, n + 0.125
+        p["Volume"] = 10 ** 9 + np.arange(len(p))
+        p.loc["2006-01-05", "Dividends"] = 0.5
+        p.loc["2006-01-10", "Stock Splits"] = 2.0
+        return p
+
+    def assert_same(self, ts):
+        frame = self.da.store.get_frame("A", ts, ITEMS)
+        hard = self.da.get_data_hardread(ts, ["A"], ITEMS)[0].loc[ts]
+        # get_data_hardread reads the volume as float32, so it is only compared approximately.
+        pd.testing.assert_frame_equal(frame, hard, check_dtype=False, check_names=False, check_freq=False)
+        return frame
+
+    def test_contiguous(self):
+        print("test contiguous window...")
+        frame = self.assert_same(self.dates[3:9])
+        np.testing.assert_array_equal(frame["volume"].values, 10 ** 9 + np.arange(3, 9))
+
+    def test_non_contiguous(self):
+        print("test non-contiguous window...")
+        frame = self.assert_same(self.dates[::2])
+        np.testing.assert_array_equal(frame["volume"].values, 10 ** 9 + np.arange(0, len(self.dates), 2))
+
+    def test_history(self):
+        print("test whole history...")
+        frame = self.da.store.get_history("A", ITEMS)
+        hard = self.da.get_data_hardread(self.dates, ["A"], ITEMS)[0]
+        pd.testing.assert_frame_equal(frame, hard, check_dtype=False, check_names=False, check_freq=False)
+        self.assertEqual(frame["volume"].dtype, np.float64)
+
+    def test_split_factor(self):
+        print("test split and dividend columns...")
+        frame = self.da.store.get_history("A", ["close"])
+        split = self.dates <= "2006-01-10"
+        np.testing.assert_array_equal(frame["Stock Splits"].values, np.where(split, 2, 1))
+        np.testing.assert_array_equal(frame["Dividends"].values, np.where(self.dates == "2006-01-05", 0.5, 0))
+        # A window ending before the split still carries it, and a date past the file has no split.
+        ts = pd.DatetimeIndex(["2006-01-04", "2006-01-07", "2006-01-23"])
+        frame = self.da.store.get_frame("A", ts, ["close"])
+        np.testing.assert_array_equal(frame["Stock Splits"].values, [2, 2, 1])
+        self.assertTrue(np.isnan(frame["close"].values[1:]).all())
+
+    def test_missing_actions(self):
+        print("test symbol without actions file...")
+        write_yahoo(self.data_path, "B", self.prices, actions=False)
+        frame = self.da.store.get_frame("B", self.dates[2:6], ITEMS)
+        np.testing.assert_array_equal(frame["Dividends"].values, 0)
+        np.testing.assert_array_equal(frame["Stock Splits"].values, 1)
+        np.testing.assert_array_equal(frame["open"].values, np.arange(2, 6))
+
+    def test_rebuild(self):
+        print("test rebuild after the CSV changes...")
+        ts = self.dates[2:6]
+        self.assertEqual(list(self.da.store.get_frame("A", ts, ["open"])["open"]), [2, 3, 4, 5])
+        write_yahoo(self.data_path, "A", self.stand_in(100))
+        # Make sure the mtime moves even on a coarse clock.
+        st = os.stat(os.path.join(self.data_path, "A.csv"))
+        os.utime(os.path.join(self.data_path, "A.csv"), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(list(self.da.store.get_frame("A", ts, ["open"])["open"]), [102, 103, 104, 105])
+        # The entry of the old file is pruned.
+        self.assertEqual(len(os.listdir(self.da.store._symbol_dir("A"))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
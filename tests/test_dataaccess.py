@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from finpy.data.cache import FrameCache
+from finpy.data.downloader import PriceDownloader
+from helpers import stand_in_prices, write_yahoo, data_access, StandInActions
+
+class TestDataAccess(StandInActions, unittest.TestCase):
+    """
+    DataAccess over a Yahoo folder of A, B and C, where the open of B is the day count plus 100
+    and the open of C the day count plus 200. NONE has no file and cannot be downloaded.
+    """
+    symbols = ["C", "A", "NONE", "B"]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scratch = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.root, "Yahoo")
+        os.mkdir(self.data_path)
+        self.prices = stand_in_prices()
+        for i, symbol in enumerate("ABC"):
+            p = self.prices.copy()
+            p["Open"] += 100 * i
+            # Above 2**24, a float32 volume is rounded.
+            p["Volume"] += 2**24 + 1
+            write_yahoo(self.data_path, symbol, p)
+        self.ts = self.prices.index[2:8]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.scratch)
+
+    def data_access(self, **kwargs):
+        da = data_access(self.root, self.scratch, **kwargs)
+        da.cache = FrameCache()
+        da.downloader = PriceDownloader(self.data_path, retries=0, backoff=0,
+            fetch_batch=lambda symbols, start, end: dict(), fetch_actions=self.fetch_actions)
+        return da
+
+    def check(self, da, frames):
+        self.assertEqual(len(frames), len(self.symbols))
+        for symbol, frame in zip(self.symbols, frames):
+            if symbol == "NONE":
+                self.assertTrue(np.isnan(frame["open"].values).all())
+            else:
+                offset = 100 * "ABC".index(symbol)
+                np.testing.assert_array_equal(frame["open"].values, np.arange(2, 8) + offset)
+        self.assertEqual(list(da.failed_symbols), ["NONE"])
+
+    def test_get_data_order(self):
+        print("test get_data keeps symbol_list order...")
+        for pool in ("thread", "process"):
+            for colstore in (True, False):
+                da = self.data_access(workers=3, pool=pool, colstore=colstore)
+                # Without the store, get_data is get_data_hardread, which also returns the other dates of the file.
+                frames = da.get_data(self.ts, self.symbols, ["open", "close"])
+                self.check(da, [f.loc[self.ts] for f in frames])
+
+    def test_hardread_order(self):
+        print("test get_data_hardread keeps symbol_list order...")
+        for pool in ("thread", "process"):
+            da = self.data_access(workers=3, pool=pool)
+            frames = da.get_data_hardread(self.ts, self.symbols, ["open", "close"])
+            self.check(da, [f.loc[self.ts] for f in frames])
+
+    def test_get_panel(self):
+        print("test get_panel against get_data...")
+        items = ["open", "close", "volume"]
+        for pool in ("thread", "process"):
+            for colstore in (True, False):
+                da = self.data_access(workers=2, pool=pool, colstore=colstore)
+                frames = [f.loc[self.ts] for f in da.get_data(self.ts, self.symbols, items)]
+                panel = da.get_panel(self.ts, self.symbols, items)
+                self.assertEqual(list(panel.symbols), self.symbols)
+                self.assertEqual(list(panel.fields), items + ["Dividends", "Stock Splits"])
+                self.assertTrue(panel.dates.equals(self.ts))
+                self.assertEqual(list(da.failed_symbols), ["NONE"])
+                self.assertEqual(panel.values.dtype, np.float64)
+                for j, symbol in enumerate(self.symbols):
+                    if symbol == "NONE":
+                        self.assertTrue(np.isnan(panel.values[:, j, :]).all())
+                    else:
+                        np.testing.assert_array_equal(panel.values[:, j, :], frames[j].values)
+                        if colstore:
+                            # The CSV files are read as float32 without the store, as get_data_hardread always did.
+                            np.testing.assert_array_equal(panel.values[:, j, 2], np.arange(2, 8) + 2**24 + 1)
+        panel = da.get_panel(self.ts, self.symbols, ["open", "close"])
+        self.assertEqual(panel.values.dtype, np.float32)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import pandas as pd
+import finpy.data.DataPull as DataPull
+from helpers import stand_in_prices, StandInActions
+
+class TestIncrementalPull(StandInActions, unittest.TestCase):
+    """
+    DataPull.pull_yahoo against a local stand-in of yfinance.
+    The stand-in has daily prices of FAKE from 2006-01-02 to 2006-01-20.
+    """
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.prices = stand_in_prices()
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.data_path)
+
+    def fetch(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        return self.prices[(self.prices.index >= start) & (self.prices.index < end)]
+
+    def pull(self, day, incremental=True):
+        return DataPull.pull_yahoo(self.data_path, "FAKE", incremental, self.fetch,
+            self.fetch_actions, now=dt.datetime(2006, 1, day))
+
+    def read(self):
+        return pd.read_csv(os.path.join(self.data_path, "FAKE.csv"), index_col="Date", parse_dates=True)
+
+    def test_full_then_delta(self):
+        print("test incremental append...")
+        self.assertEqual(self.pull(10), 6)
+        self.assertEqual(self.pull(14), 4)
+        self.assertEqual(self.calls[-1][1], "2006-01-10")
+        full = self.prices[self.prices.index < "2006-01-14"]
+        self.assertEqual(list(self.read().index), list(full.index))
+        self.assertEqual(list(self.read().columns), ["Open", "High", "Low", "Close", "Adj Close", "Volume"])
+
+    def test_up_to_date(self):
+        print("test no download when up to date...")
+        self.pull(10)
+        ncalls = len(self.calls)
+        self.assertEqual(self.pull(10), 0)
+        self.assertEqual(len(self.calls), ncalls)
+
+    def test_new_action_rewrites(self):
+        print("test rewrite on a new split...")
+        self.pull(10)
+        self.prices.loc["2006-01-11", "Stock Splits"] = 2.0
+        self.pull(14)
+        self.assertEqual(self.calls[-1][1], "2006-01-01")
+        actions = pd.read_csv(os.path.join(self.data_path, "FAKE_actions.csv"), index_col="Date")
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(len(self.read()), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import datetime as dt
+import pandas as pd
+from finpy.data.downloader import PriceDownloader
+from helpers import stand_in_prices, StandInActions
+
+class TestPriceDownloader(StandInActions, unittest.TestCase):
+    """
+    PriceDownloader against a local stand-in of yfinance.
+    The stand-in has daily prices of every symbol from 2006-01-02 to 2006-01-20.
+    """
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.prices = stand_in_prices()
+        self.calls = []
+        self.failures = dict()
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_path)
+
+    def fetch_batch(self, symbols, start, end):
+        with self.lock:
+            self.calls.append((tuple(symbols), start, end))
+            for s in symbols:
+                if self.failures.get(s, 0) > 0:
+                    self.failures[s] -= 1
+                    raise IOError("stand-in failure")
+        p = self.prices[(self.prices.index >= start) & (self.prices.index < end)]
+        return dict((s, p) for s in symbols if s != "NONE")
+
+    def downloader(self, day, **kwargs):
+        return PriceDownloader(self.data_path, max_concurrency=2, rate=100, batch_size=2,
+            backoff=0, fetch_batch=self.fetch_batch, fetch_actions=self.fetch_actions,
+            now=dt.datetime(2006, 1, day), **kwargs)
+
+    def test_batches_and_delta(self):
+        print("test batched full download, then delta...")
+        metrics = self.downloader(10).download(["A", "B", "C"])
+        self.assertEqual(sorted(len(c[0]) for c in self.calls), [1, 2])
+        self.assertEqual([metrics[s].rows for s in "ABC"], [6, 6, 6])
+        self.assertTrue(all(metrics[s].full for s in "ABC"))
+        self.calls = []
+        metrics = self.downloader(14).download(["A", "B", "C"])
+        self.assertEqual(set(c[1] for c in self.calls), set(["2006-01-10"]))
+        self.assertEqual([metrics[s].rows for s in "ABC"], [4, 4, 4])
+        self.assertFalse(any(metrics[s].full for s in "ABC"))
+        frame = pd.read_csv(os.path.join(self.data_path, "B.csv"), index_col="Date")
+        self.assertEqual(len(frame), 10)
+
+    def test_retry(self):
+        print("test retry after a failed request...")
+        self.failures["A"] = 2
+        metrics = self.downloader(10).download(["A"])
+        self.assertIsNone(metrics["A"].error)
+        self.assertEqual(metrics["A"].attempts, 4)
+        self.assertEqual(metrics["A"].rows, 6)
+
+    def test_errors(self):
+        print("test a symbol that cannot be downloaded...")
+        self.failures["A"] = 10
+        d = self.downloader(10, retries=1)
+        metrics = d.download(["A", "NONE"])
+        self.assertIsInstance(metrics["A"].error, IOError)
+        self.assertEqual(metrics["A"].attempts, 2)
+        self.assertIsNotNone(metrics["NONE"].error)
+        self.assertFalse(os.path.exists(os.path.join(self.data_path, "NONE.csv")))
+        self.assertEqual(len(d.summary()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
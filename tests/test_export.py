@@ -0,0 +1,118 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial.portfolio import Portfolio
+from finpy.financial.order import Order
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+class TestExport(unittest.TestCase):
+    """
+    csvwriter against the writer it replaced, and the round trip of export in every format.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.dates = pd.bdate_range("2020-01-01", periods=15)
+        equities = dict((t, pd.DataFrame({'close': (10 + rng.random(15) * 90).astype(np.float32), 'shares': 0.0},
+            index=self.dates)) for t in ["A", "B"])
+        orders = [Order(action="buy", shares=10, tick="A", date=self.dates[2]),
+                  Order(action="buy", shares=5, tick="B", date=self.dates[4]),
+                  Order(action="sell", shares=4, tick="A", date=self.dates[9])]
+        self.pf = Portfolio(equities, 10000, self.dates, orders)
+        self.pf.sim()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def old_csvwriter(self, equity_col, csv_file, total, cash, d):
+        """ The loop of csvwriter before to_frame, with the header naming the ticks. """
+        pf = self.pf
+        lines = []
+        l = ["Date"]
+        if total:
+            l.append("Total")
+        if cash:
+            l.append("Cash")
+        ticks = pf.equities.index.droplevel(1).drop_duplicates()
+        if equity_col != None:
+            for e in ticks:
+                for col in equity_col:
+                    l.append(e + col)
+        lines.append(l)
+        for i in self.dates:
+            l = [i.strftime("%Y-%m-%d")]
+            if total:
+                l.append(round(pf.total[i], 2))
+            if cash:
+                l.append(round(pf.cash[i], 2))
+            if equity_col != None:
+                for e in ticks:
+                    for col in equity_col:
+                        l.append(round(pf.equities.loc[(e, i), col], 2))
+            lines.append(l)
+        with open(csv_file, 'w') as fp:
+            cw = csv.writer(fp, lineterminator='\n', delimiter=d)
+            for line in lines:
+                cw.writerow(line)
+
+    def read_rows(self, path, d):
+        with open(path) as f:
+            return list(csv.reader(f, delimiter=d))
+
+    def test_csvwriter(self):
+        print("test csvwriter against the old writer...")
+        for equity_col, total, cash, d in [(["shares", "close"], True, True, ','), (None, True, False, ';'),
+                                           (["close"], False, True, '\t')]:
+            new, old = os.path.join(self.dir, "new.csv"), os.path.join(self.dir, "old.csv")
+            self.pf.csvwriter(equity_col=equity_col, csv_file=new, total=total, cash=cash, d=d)
+            self.old_csvwriter(equity_col, old, total, cash, d)
+            new_rows, old_rows = self.read_rows(new, d), self.read_rows(old, d)
+            self.assertEqual(new_rows[0], old_rows[0])
+            self.assertEqual(len(new_rows), len(old_rows))
+            for a, b in zip(new_rows[1:], old_rows[1:]):
+                self.assertEqual(a[0], b[0])
+                # The old writer rounded np.float32 values, which can print as 12.350000381.
+                np.testing.assert_allclose(np.array(a[1:], dtype=float), np.array(b[1:], dtype=float), atol=1e-5)
+
+    def check(self, frame):
+        expected = self.pf.to_frame(["shares", "close"])
+        pd.testing.assert_frame_equal(frame, expected, check_freq=False, check_names=False)
+
+    def test_csv(self):
+        print("test csv export round trip...")
+        path = os.path.join(self.dir, "pf.csv")
+        self.pf.export(path, equity_col=["shares", "close"])
+        self.check(pd.read_csv(path, index_col=0, parse_dates=True))
+
+    def test_npz(self):
+        print("test npz export round trip...")
+        path = os.path.join(self.dir, "pf.npz")
+        self.pf.export(path, equity_col=["shares", "close"])
+        with np.load(path) as z:
+            frame = pd.DataFrame(z['values'], index=pd.DatetimeIndex(z['dates']), columns=z['columns'].tolist())
+        self.check(frame)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow(self):
+        print("test parquet and feather export round trip...")
+        path = os.path.join(self.dir, "pf.parquet")
+        self.pf.export(path, equity_col=["shares", "close"])
+        self.check(pd.read_parquet(path))
+        path = os.path.join(self.dir, "pf.data")
+        self.pf.export(path, fmt="feather", equity_col=["shares", "close"])
+        self.check(pd.read_feather(path).set_index("Date"))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            self.pf.export(os.path.join(self.dir, "pf.xls"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial import indicators
+
+class TestRSI(unittest.TestCase):
+    """
+    indicators.wilder_rsi against the loop of one ticker.
+    """
+    def rsi_loop(self, close, period):
+        delta = np.diff(close)
+        gain = np.where(delta > 0, delta, 0)
+        loss = np.where(delta < 0, -delta, 0)
+        avg_gain = gain[:period].mean()
+        avg_loss = loss[:period].mean()
+        rsi = [100 - 100/(1 + avg_gain/avg_loss)]
+        for i in range(period, len(delta)):
+            avg_gain = (avg_gain*(period-1) + gain[i])/period
+            avg_loss = (avg_loss*(period-1) + loss[i])/period
+            rsi.append(100 if avg_loss == 0 else 100 - 100/(1 + avg_gain/avg_loss))
+        return np.array(rsi)
+
+    def test_rsi(self):
+        print("test wilder rsi...")
+        rng = np.random.default_rng(2)
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.02, size=(300, 5)), axis=0)
+        for period in [14, 9]:
+            rsi = indicators.wilder_rsi(close, period)
+            self.assertTrue(np.isnan(rsi[:period]).all())
+            for n in range(5):
+                np.testing.assert_allclose(rsi[period:, n], self.rsi_loop(close[:, n], period))
+
+    def test_late_listing(self):
+        print("test wilder rsi of a ticker listed later...")
+        rng = np.random.default_rng(4)
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.02, size=(100, 2)), axis=0)
+        close[:30, 1] = np.nan
+        rsi = indicators.wilder_rsi(close, 14)
+        self.assertTrue(np.isnan(rsi[:44, 1]).all())
+        np.testing.assert_allclose(rsi[44:, 1], self.rsi_loop(close[30:, 1], 14))
+        np.testing.assert_allclose(indicators.wilder_rsi(close[:, 0], 14)[14:], self.rsi_loop(close[:, 0], 14))
+
+class TestIndicatorEngine(unittest.TestCase):
+    """
+    IndicatorEngine against pandas rolling windows.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(8)
+        self.close = pd.DataFrame(1000 * np.cumprod(1 + rng.normal(0, 0.02, size=(250, 4)), axis=0))
+        self.engine = indicators.IndicatorEngine(self.close.values)
+
+    def test_bollinger(self):
+        print("test engine bollinger...")
+        bo = self.engine.bollinger(20, 2)
+        r = self.close.rolling(20)
+        np.testing.assert_allclose(bo['mi'], r.mean().values, rtol=1e-9)
+        np.testing.assert_allclose(bo['hi'], (r.mean() + 2*r.std()).values, rtol=1e-9)
+        np.testing.assert_allclose(bo['ba'], ((self.close - r.mean())/(2*r.std())).values, rtol=1e-6, atol=1e-9)
+        self.assertIs(self.engine.sum(20), self.engine.sum(20))
+
+    def test_stdev(self):
+        print("test engine normalized stdev...")
+        rtn = self.close/self.close.shift(1) - 1
+        np.testing.assert_allclose(self.engine.normalized_stdev(50), rtn.rolling(50).std().values, rtol=1e-9)
+
+    def test_rise_fall(self):
+        print("test engine max rise and max fall...")
+        rise = self.engine.max_rise(20)
+        fall = self.engine.max_fall(20)
+        c = self.close.values
+        for t in [20, 100, 249]:
+            w = c[t-20:t]
+            np.testing.assert_allclose(rise[t], (c[t] - w.min(axis=0))/c[t])
+            np.testing.assert_allclose(fall[t], (w.max(axis=0) - w.min(axis=0))/c[t])
+
+    def test_up_ratio(self):
+        print("test engine up and down ratio...")
+        up = self.engine.up_ratio(10)
+        dn = self.engine.dn_ratio(10)
+        c = self.close.values
+        self.assertTrue(np.isnan(up[:11]).all())
+        for t in [11, 120, 249]:
+            ups = sum(c[i] >= c[i-1] for i in range(t-10, t+1))
+            np.testing.assert_allclose(up[t], ups/11)
+            np.testing.assert_allclose(dn[t], 1 - ups/11)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial.portfolio import Portfolio
+from finpy.financial.order import Order
+
+def make_equities(dates, ticks, rng):
+    """ Random close prices of ticks on dates, and no shares. B has no close on its fourth date. """
+    equities = dict()
+    for tick in ticks:
+        close = 10 + rng.random(len(dates)) * 90
+        if tick == "B":
+            close[3] = np.nan
+        equities[tick] = pd.DataFrame({'close': close, 'shares': 0.0}, index=dates)
+    return equities
+
+class TestLedger(unittest.TestCase):
+    """
+    Random buy and sell sequences, in random date order, against a brute-force
+    reference that updates every later day of shares and cash for each order.
+    """
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+        self.dates = pd.bdate_range("2020-01-01", periods=30)
+        self.ticks = ["A", "B", "C"]
+        self.equities = make_equities(self.dates, self.ticks, self.rng)
+        self.close = np.nan_to_num(np.column_stack([self.equities[t]['close'].values for t in self.ticks]))
+
+    def check(self, pf, shares, cash):
+        np.testing.assert_allclose(pf.cash.values, cash)
+        np.testing.assert_allclose(pf.total.values, cash + (shares * self.close).sum(axis=1))
+        for n, tick in enumerate(self.ticks):
+            np.testing.assert_allclose(pf.equities.loc[tick, 'shares'].values, shares[:, n])
+            t = self.rng.integers(len(self.dates))
+            self.assertAlmostEqual(pf.shares(tick, self.dates[t]), shares[t, n])
+
+    def test_replay(self):
+        print("test ledger against a per-day replay...")
+        for trial in range(20):
+            pf = Portfolio(self.equities, 10000, self.dates)
+            shares = np.zeros(self.close.shape)
+            cash = np.full(len(self.dates), 10000.0)
+            for k in range(40):
+                t = self.rng.integers(len(self.dates))
+                n = self.rng.integers(len(self.ticks))
+                s = float(self.rng.integers(1, 50))
+                price = self.close[t, n]
+                if self.rng.random() < 0.5:
+                    pf.buy(s, self.ticks[n], price, self.dates[t])
+                    shares[t:, n] += s
+                    cash[t:] -= s * price
+                else:
+                    pf.sell(s, self.ticks[n], price, self.dates[t])
+                    shares[t:, n] -= s
+                    cash[t:] += s * price
+                # Read the balances now and then, so they are brought up to date in pieces.
+                if self.rng.random() < 0.2:
+                    self.check(pf, shares, cash)
+            self.check(pf, shares, cash)
+
+    def test_initial_shares(self):
+        print("test shares already in equities...")
+        equities = make_equities(self.dates, self.ticks, self.rng)
+        equities["A"].loc[self.dates[5]:, 'shares'] = 7.0
+        equities["C"]['shares'] = np.nan
+        equities["C"].loc[self.dates[2], 'shares'] = 3.0
+        pf = Portfolio(equities, 100, self.dates)
+        pf.buy(1, "A", 0, self.dates[10])
+        self.assertEqual(list(pf.equities.loc["A", 'shares'].values[[4, 5, 10]]), [0, 7, 8])
+        # A missing number of shares is the last number before it.
+        self.assertEqual(list(pf.equities.loc["C", 'shares'].values[[1, 2, 29]]), [0, 3, 3])
+
+    def test_not_a_date(self):
+        print("test order on a day the market is closed...")
+        pf = Portfolio(self.equities, 10000, self.dates)
+        saturday = pd.Timestamp("2020-01-04")
+        with self.assertRaises(KeyError):
+            pf.buy(1, "A", 10, saturday)
+        with self.assertRaises(KeyError):
+            pf.sell(1, "A", 10, saturday)
+        with self.assertRaises(KeyError):
+            Portfolio(self.equities, 10000, self.dates, [Order(action="buy", shares=1, tick="A", date=saturday)])
+        # The failed orders left the ledger alone.
+        self.assertEqual(pf.total.iloc[-1], 10000)
+
+class TestPutOrders(unittest.TestCase):
+    """
+    put_orders, all the orders at once, against buy and sell one order at a time.
+    """
+    def setUp(self):
+        self.rng = np.random.default_rng(5)
+        self.dates = pd.bdate_range("2020-01-01", periods=20)
+        self.ticks = ["A", "B", "C"]
+        self.equities = make_equities(self.dates, self.ticks, self.rng)
+
+    def random_orders(self, k):
+        orders = []
+        for i in range(k):
+            price = None if self.rng.random() < 0.3 else float(self.rng.integers(10, 100))
+            orders.append(Order(action=["buy", "sell", "Buy", "hold"][self.rng.integers(4)],
+                shares=float(self.rng.integers(1, 20)), tick=self.ticks[self.rng.integers(3)],
+                date=self.dates[self.rng.integers(len(self.dates))], price=price))
+        # The same date and tick, several times, in both directions.
+        for action in ["buy", "buy", "sell"]:
+            orders.append(Order(action=action, shares=5, tick="A", date=self.dates[7], price=20.0))
+        return orders
+
+    def sequential(self, orders):
+        pf = Portfolio(self.equities, 10000, self.dates)
+        for o in orders:
+            price = o.price if o.price is not None else self.equities[o.tick].loc[o.date, 'close']
+            if o.action.lower() == "buy":
+                pf.buy(o.shares, o.tick, price, o.date)
+            elif o.action.lower() == "sell":
+                pf.sell(o.shares, o.tick, price, o.date)
+        return pf
+
+    def assert_same(self, pf, expected):
+        np.testing.assert_allclose(pf.cash.values, expected.cash.values)
+        np.testing.assert_allclose(pf.total.values, expected.total.values)
+        np.testing.assert_allclose(pf.equities['shares'].values, expected.equities['shares'].values)
+
+    def test_bulk(self):
+        print("test put_orders against buy and sell...")
+        for trial in range(10):
+            orders = self.random_orders(50)
+            expected = self.sequential(orders)
+            pf = Portfolio(self.equities, 10000, self.dates, list(orders))
+            pf.sim()
+            self.assert_same(pf, expected)
+            self.assertEqual(len(pf.order), len(orders))
+            frame = pd.DataFrame.from_records([o.to_dict() for o in orders])
+            pf = Portfolio(self.equities, 10000, self.dates, frame)
+            pf.sim()
+            self.assert_same(pf, expected)
+
+    def test_same_date_tick(self):
+        print("test orders on the same date and tick...")
+        d = self.dates[4]
+        close = self.equities["B"].loc[d, 'close']
+        orders = [Order(action="buy", shares=10, tick="B", date=d),
+                  Order(action="buy", shares=4, tick="B", date=d, price=50.0),
+                  Order(action="sell", shares=6, tick="B", date=d, price=60.0)]
+        pf = Portfolio(self.equities, 1000, self.dates, orders)
+        pf.put_orders()
+        self.assertEqual(pf.shares("B", d), 8)
+        self.assertEqual(pf.shares("B", self.dates[3]), 0)
+        self.assertAlmostEqual(pf.cash.iloc[4], 1000 - 10 * close - 4 * 50 + 6 * 60)
+        self.assertAlmostEqual(pf.total.iloc[-1], pf.cash.iloc[-1] + 8 * self.equities["B"]['close'].iloc[-1])
+
+class TestDirtyRange(unittest.TestCase):
+    """
+    The balances are revalued from the first changed date on, and match a full recompute.
+    """
+    def setUp(self):
+        self.rng = np.random.default_rng(9)
+        self.dates = pd.bdate_range("2020-01-01", periods=30)
+        self.equities = make_equities(self.dates, ["A", "B"], self.rng)
+
+    def test_suffix(self):
+        print("test revaluation of the changed suffix only...")
+        pf = Portfolio(self.equities, 10000, self.dates)
+        pf.buy(10, "A", 30, self.dates[20])
+        pf.total
+        self.assertEqual(pf._dirty, len(self.dates))
+        # An order before the last one, out of date order.
+        pf.sell(3, "B", 40, self.dates[12])
+        self.assertEqual((pf._dirty, pf._cash_dirty), (12, 12))
+        # Mark the rows before the day before the order, which the revaluation starts from:
+        # a revaluation from the start would overwrite them.
+        pf._total_bal[:11] = -1
+        pf._cash_bal[:11] = -1
+        pf._shares[:11] = -1
+        total, cash = pf.total.values, pf.cash.values
+        self.assertTrue((total[:11] == -1).all() and (cash[:11] == -1).all())
+        full = Portfolio(self.equities, 10000, self.dates)
+        full.sell(3, "B", 40, self.dates[12])
+        full.buy(10, "A", 30, self.dates[20])
+        np.testing.assert_allclose(total[12:], full.total.values[12:])
+        np.testing.assert_allclose(cash[12:], full.cash.values[12:])
+        np.testing.assert_allclose(pf._shares[12:], full._shares[12:])
+        self.assertEqual(pf._dirty, len(self.dates))
+
+    def test_random(self):
+        print("test revaluations in pieces against a full recompute...")
+        pf = Portfolio(self.equities, 10000, self.dates)
+        orders = []
+        for k in range(60):
+            o = (float(self.rng.integers(1, 9)), ["A", "B"][self.rng.integers(2)], 25.0,
+                 self.dates[self.rng.integers(len(self.dates))])
+            orders.append(o)
+            pf.buy(*o)
+            if k % 7 == 0:
+                pf.total
+                pf.equities
+        full = Portfolio(self.equities, 10000, self.dates)
+        for o in orders:
+            full.buy(*o)
+        np.testing.assert_allclose(pf.total.values, full.total.values)
+        np.testing.assert_allclose(pf.equities['shares'].values, full.equities['shares'].values)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import pandas as pd
+from finpy.data.manifest import SymbolManifest, SymbolEntry, scan_csv
+
+class TestSymbolManifest(unittest.TestCase):
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.db = os.path.join(tempfile.mkdtemp(), "manifest.db")
+        self.write("A", ["2006-01-03", "2006-01-04", "2006-01-05"])
+        self.write("B", [])
+        with open(os.path.join(self.data_path, "A_actions.csv"), "w") as f:
+            f.write("Date,Dividends,Stock Splits\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_path)
+        shutil.rmtree(os.path.dirname(self.db))
+
+    def write(self, symbol, dates):
+        tmp = os.path.join(self.data_path, symbol + ".tmp")
+        with open(tmp, "w") as f:
+            f.write("Date,Open,High,Low,Close,Adj Close,Volume\n")
+            for d in dates:
+                f.write(d + ",1,1,1,1,1,1\n")
+        os.replace(tmp, os.path.join(self.data_path, symbol + ".csv"))
+
+    def append(self, symbol, dates):
+        """ Append rows in place, which leaves the mtime of the folder alone. """
+        with open(os.path.join(self.data_path, symbol + ".csv"), "a") as f:
+            for d in dates:
+                f.write(d + ",1,1,1,1,1,1\n")
+
+    def test_entries(self):
+        print("test manifest entries...")
+        m = SymbolManifest(self.data_path, self.db)
+        self.assertEqual(m.symbols(), ["A", "B"])
+        a = m.get("A")
+        self.assertEqual((a.first_date, a.last_date, a.rows, a.actions),
+                         (dt.datetime(2006, 1, 3), dt.datetime(2006, 1, 5), 3, True))
+        b = m.get("B")
+        self.assertEqual((b.last_date, b.rows, b.actions), (None, 0, False))
+        self.assertIsNone(m.get("C"))
+
+    def test_changes(self):
+        print("test manifest follows the files...")
+        m = SymbolManifest(self.data_path, self.db)
+        m.symbols()
+        self.write("A", ["2006-01-03", "2006-01-04", "2006-01-05", "2006-01-06"])
+        self.write("C", ["2006-01-03"])
+        os.remove(os.path.join(self.data_path, "B.csv"))
+        self.assertEqual(m.symbols(), ["A", "C"])
+        self.assertEqual(m.get("A").rows, 4)
+        # A new manifest on the same database starts from what is stored.
+        self.assertEqual(SymbolManifest(self.data_path, self.db).get("A").last_date, dt.datetime(2006, 1, 6))
+
+    def test_in_place(self):
+        print("test manifest follows a file changed in place...")
+        m = SymbolManifest(self.data_path, self.db)
+        self.assertEqual(m.get("A").rows, 3)
+        dir_mtime = os.stat(self.data_path).st_mtime_ns
+        self.append("A", ["2006-01-06"])
+        self.assertEqual(os.stat(self.data_path).st_mtime_ns, dir_mtime)
+        a = m.get("A")
+        self.assertEqual((a.last_date, a.rows), (dt.datetime(2006, 1, 6), 4))
+        self.assertEqual(m.symbols(), ["A", "B"])
+
+    def test_tail(self):
+        print("test scan of the appended rows only...")
+        dates = [d.strftime("%Y-%m-%d") for d in pd.bdate_range("2006-01-02", periods=1000)]
+        self.write("A", dates)
+        path = os.path.join(self.data_path, "A.csv")
+        self.assertEqual(scan_csv(path), (dates[0], dates[-1], 1000))
+        st = os.stat(path)
+        # A made-up previous version with 5 rows: the rows before its end are not read again.
+        previous = SymbolEntry("A", dates[0], dates[-1], 5, st.st_mtime_ns, st.st_size, True)
+        self.append("A", ["2010-01-01", "2010-01-04"])
+        self.assertEqual(scan_csv(path, previous), (dates[0], "2010-01-04", 7))
+        # A previous version that does not end where the file did is read in full.
+        previous = SymbolEntry("A", dates[0], dates[-2], 5, st.st_mtime_ns, st.st_size, True)
+        self.assertEqual(scan_csv(path, previous), (dates[0], "2010-01-04", 1002))
+        self.write("A", dates[:10])
+        self.assertEqual(scan_csv(path, previous), (dates[0], dates[9], 10))
+
+if __name__ == '__main__':
+    unittest.main()
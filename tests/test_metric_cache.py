@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial.portfolio import Portfolio, memoized
+from finpy.financial.order import Order
+
+class WeightedPortfolio(Portfolio):
+    @memoized
+    def weighted(self, weights):
+        " The close of every tick times its weight, a list, summed by date. "
+        return (self.close_frame() * weights).sum(axis=1)
+
+class TestMetricCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.dates = pd.bdate_range("2020-01-01", periods=30)
+        self.equities = dict((t, pd.DataFrame({'close': 10 + rng.random(30) * 90, 'shares': 0.0}, index=self.dates))
+            for t in ["A", "B"])
+        self.pf = WeightedPortfolio(self.equities, 10000, self.dates,
+            [Order(action="buy", shares=10, tick="A", date=self.dates[3])])
+        self.pf.sim()
+
+    def test_hits(self):
+        print("test metric cache hits and misses...")
+        pf = self.pf
+        std = pf.std()
+        self.assertEqual(pf.std(), std)
+        # The first std missed itself and daily_return inside it.
+        self.assertEqual((pf.metric_hits, pf.metric_misses), (1, 2))
+        pf.std(tick="A")
+        self.assertEqual(pf.metric_misses, 4)
+        pf.std("A")
+        self.assertEqual(pf.metric_hits, 2)
+
+    def test_invalidation(self):
+        print("test metric cache invalidation...")
+        pf = self.pf
+        changes = [lambda: pf.buy(5, "B", 50, self.dates[10]),
+                   lambda: pf.sell(5, "A", 50, self.dates[20]),
+                   lambda: pf.put_orders(),
+                   lambda: pf.cal_total()]
+        for change in changes:
+            before = pf.return_ratio()
+            misses = pf.metric_misses
+            change()
+            after = pf.return_ratio()
+            self.assertEqual(pf.metric_misses, misses + 1)
+            self.assertEqual(after, pf.total.iloc[-1] / pf.total.iloc[0])
+        # put_orders applied the order list once more: 20 shares of A from the fourth date.
+        self.assertEqual(pf.shares("A", self.dates[-1]), 15)
+
+    def test_copies(self):
+        print("test cached values cannot be changed...")
+        pf = self.pf
+        dd = pf.drawdowns()
+        expected = dd.copy()
+        dd[:] = 0
+        pd.testing.assert_frame_equal(pf.drawdowns(), expected)
+        weighted = pf.weighted((1, 2))
+        weighted[:] = 0
+        self.assertNotEqual(pf.weighted((1, 2)).iloc[0], 0)
+        rtn = pf.daily_return()
+        expected = rtn.copy()
+        rtn[1] = 0
+        np.testing.assert_array_equal(pf.daily_return(), expected)
+
+    def test_unhashable(self):
+        print("test call with a list argument...")
+        pf = self.pf
+        hits, misses = pf.metric_hits, pf.metric_misses
+        expected = pf.weighted((1, 2))
+        pd.testing.assert_series_equal(pf.weighted([1, 2]), expected)
+        pd.testing.assert_series_equal(pf.weighted([1, 2]), expected)
+        self.assertEqual((pf.metric_hits, pf.metric_misses), (hits, misses + 1))
+
+    def test_ldt_timestamps(self):
+        print("test ldt_timestamps leaves the balances alone...")
+        pf = self.pf
+        pf.total
+        pf.buy(1, "B", 10, self.dates[5])
+        stamps = pf.ldt_timestamps()
+        self.assertEqual(stamps[0].date(), self.dates[1].date())  # 2020-01-01 is a holiday.
+        self.assertEqual(pf._dirty, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial.order import Order, OrderLog
+
+class TestOrderLog(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+        self.ticks = ["A", "B", "C"]
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def fill(self, dates, k=100):
+        """ An OrderLog of capacity 2 with k orders, half appended one by one and half at once. """
+        log = OrderLog(self.ticks, dates, capacity=2)
+        t = self.rng.integers(len(dates), size=k)
+        n = self.rng.integers(len(self.ticks), size=k)
+        action = np.array(["buy", "sell", "Buy"])[self.rng.integers(3, size=k)]
+        shares = np.floor(self.rng.random(k) * 100) + np.where(self.rng.random(k) < 0.2, 0.1, 0)
+        price = self.rng.random(k) * 50
+        h = k // 2
+        for i in range(h):
+            log.append(self.ticks[n[i]], dates[t[i]], action[i], shares[i], price[i])
+        log.extend_pos(t[h:], n[h:], action[h:], shares[h:], price[h:])
+        return log, (t, n, action, shares, price)
+
+    def test_growth(self):
+        print("test growth past capacity...")
+        dates = pd.bdate_range("2020-01-01", periods=20)
+        log, (t, n, action, shares, price) = self.fill(dates)
+        self.assertEqual(len(log), 100)
+        np.testing.assert_array_equal(log.date_pos, t)
+        np.testing.assert_array_equal(log.tick_pos, n)
+        np.testing.assert_array_equal(log.shares, shares)
+        np.testing.assert_array_equal(log.price, price)
+        side = np.where(np.char.lower(action.astype(str)) == "buy", 1, -1)
+        np.testing.assert_array_equal(log.signed_shares(), side * shares)
+
+    def test_iter(self):
+        print("test iterating Order objects...")
+        dates = pd.bdate_range("2020-01-01", periods=20)
+        log, (t, n, action, shares, price) = self.fill(dates)
+        orders = list(log)
+        self.assertTrue(all(isinstance(o, Order) for o in orders))
+        self.assertEqual([o.tick for o in orders], [self.ticks[i] for i in n])
+        self.assertEqual([o.date for o in orders], list(dates[t]))
+        self.assertEqual([o.action for o in orders], list(action))
+        self.assertEqual([o.shares for o in orders], list(shares))
+        self.assertEqual([o.price for o in orders], list(price))
+        frame = log.frame
+        self.assertEqual(list(frame.index.names), ["tick", "date"])
+        self.assertEqual(list(frame['action']), list(action))
+
+    def test_write_csv(self):
+        print("test write_csv against DataFrame.to_csv...")
+        for dates in (pd.bdate_range("2020-01-01", periods=20),
+                      pd.bdate_range("2020-01-01", periods=20) + pd.Timedelta(hours=16)):
+            log, (t, n, action, shares, price) = self.fill(dates)
+            path = os.path.join(self.dir, "orders.csv")
+            log.write_csv(path, chunk=7)
+            # The order frame and the call of write_order_csv before the OrderLog.
+            old = pd.DataFrame({"action": action, "shares": shares, "price": price},
+                index=pd.MultiIndex.from_arrays([np.array(self.ticks)[n], dates[t]], names=["tick", "date"]))
+            old_path = os.path.join(self.dir, "old.csv")
+            old.reorder_levels(["date", "tick"]).to_csv(path_or_buf=old_path, sep=',', header=False, columns=["action", "shares"])
+            with open(path) as f, open(old_path) as g:
+                self.assertEqual(f.read(), g.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.data.panel import PricePanel
+
+class TestSharedPanel(unittest.TestCase):
+    """
+    A PricePanel put in shared memory and attached to by name.
+    """
+    def test_share_attach(self):
+        print("test shared panel...")
+        values = np.arange(60, dtype=np.float32).reshape(10, 3, 2)
+        panel = PricePanel(values, pd.bdate_range("2020-01-01", periods=10), ["A", "B", "C"], ["open", "close"])
+        shm, spec = panel.share()
+        try:
+            shared = PricePanel.attach(spec)
+            np.testing.assert_array_equal(shared.values, values)
+            self.assertEqual(shared.symbols, panel.symbols)
+            self.assertTrue(shared.dates.equals(panel.dates))
+            # The attached panel is the shared block itself.
+            other = PricePanel.attach(spec)
+            other.values[0, 0, 0] = -1
+            self.assertEqual(shared.values[0, 0, 0], -1)
+            stocks = shared.to_dict(["B"], start=3)
+            self.assertEqual(len(stocks["B"]), 7)
+            self.assertEqual(stocks["B"]["shares"].iloc[0], 0)
+            stocks["B"].iloc[0, 0] = -2
+            self.assertNotEqual(shared.values[3, 1, 0], -2)
+            del shared, other, stocks
+        finally:
+            shm.close()
+            shm.unlink()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from finpy.financial.order import OrderLog
+from finpy.financial.transaction import Transaction
+from finpy.sim.results import ResultStore
+
+class TestResultStore(unittest.TestCase):
+    """
+    The heavy results of a ticker go through a ResultStore and come back the same.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResultStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_orders(self):
+        print("test result store orders...")
+        dates = pd.bdate_range("2020-01-01", periods=5)
+        log = OrderLog(["AAPL"], dates)
+        log.append("AAPL", dates[1], "buy", 10, 100.5)
+        log.append("AAPL", dates[3], "sell", 10, 110.0)
+        self.store.put_orders("AAPL", log)
+        orders = self.store.get_orders("AAPL")
+        self.assertEqual([o.action for o in orders], ["buy", "sell"])
+        self.assertEqual([o.date for o in orders], [dates[1], dates[3]])
+        self.assertEqual([o.price for o in orders], [100.5, 110.0])
+        self.assertEqual(orders[0].tick, "AAPL")
+
+    def test_lazy(self):
+        print("test result store transactions and html...")
+        self.store.put_transactions("IBM", [Transaction(1, 10.0, 5, 12.0), Transaction(7, 11.0)])
+        self.store.put_html("IBM", "div", "<div>IBM</div>")
+        stat = self.store.transactions(["IBM"])
+        self.assertEqual(list(stat), ["IBM"])
+        t = stat["IBM"]
+        self.assertEqual((t[0].buy_date, t[0].sell_date, t[0].sell_price), (1, 5, 12.0))
+        self.assertIsNone(t[1].sell_date)
+        self.assertIsNone(t[1].sell_price)
+        self.assertEqual(self.store.html(["IBM"], "div")["IBM"], "<div>IBM</div>")
+        with self.assertRaises(KeyError):
+            stat["XOM"]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import finpy.data.dataaccess as da
+from finpy.utils import utils as ut
+from helpers import stand_in_prices, write_yahoo
+
+class TestRiskfree(unittest.TestCase):
+    """
+    utils.riskfree_return over a local $TNX file from 2006-01-02 to 2006-01-20,
+    with a rate of 3.65 plus the day count, so the daily rate of day i is (3.65 + i)/36500.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scratch = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.root, "Yahoo")
+        os.mkdir(self.data_path)
+        self.prices = stand_in_prices()
+        self.prices["Adj Close"] = 3.65 + np.arange(len(self.prices))
+        self.write(self.prices.iloc[:7])
+        self.env = mock.patch.dict(os.environ, {"FINPYDATA": self.root, "FINPYSCRATCH": self.scratch})
+        self.env.start()
+        ut._riskfree.clear()
+        self.loads = 0
+        get_history = da.DataAccess.get_history
+        def counted(obj, *args, **kwargs):
+            self.loads += 1
+            # Widen the window of the concurrent test.
+            time.sleep(0.05)
+            return get_history(obj, *args, **kwargs)
+        self.patch = mock.patch.object(da.DataAccess, "get_history", counted)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.env.stop()
+        ut._riskfree.clear()
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.scratch)
+
+    def write(self, prices):
+        write_yahoo(self.data_path, "$TNX", prices, actions=False)
+        path = os.path.join(self.data_path, "$TNX.csv")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    def rate(self, i):
+        return (3.65 + i) / 36500
+
+    def test_cache(self):
+        print("test risk-free history read once per process...")
+        dates = self.prices.index[:5]
+        rf = ut.riskfree_return(dates)
+        np.testing.assert_allclose(rf.values, [self.rate(i) for i in range(5)])
+        ut.riskfree_return(dates[1:3])
+        ut.riskfree_return(self.prices.index[:7])
+        self.assertEqual(self.loads, 1)
+
+    def test_reload(self):
+        print("test reload after the last checked date...")
+        ut.riskfree_return(self.prices.index[:7])
+        self.write(self.prices)
+        # Up to the last checked date, the cached history is used, even though the file grew.
+        self.assertEqual(len(ut.riskfree_history("$TNX", self.prices.index[6])), 7)
+        self.assertEqual(self.loads, 1)
+        rf = ut.riskfree_return(self.prices.index[5:])
+        self.assertEqual(self.loads, 2)
+        np.testing.assert_allclose(rf.values, [self.rate(i) for i in range(5, len(self.prices))])
+        ut.riskfree_return(self.prices.index)
+        self.assertEqual(self.loads, 2)
+
+    def test_concurrent(self):
+        print("test concurrent callers...")
+        results = [None] * 8
+        def call(k):
+            results[k] = ut.riskfree_return(self.prices.index[:7])
+        threads = [threading.Thread(target=call, args=(k,)) for k in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loads, 1)
+        for rf in results:
+            pd.testing.assert_series_equal(rf, results[0])
+
+    def test_fill(self):
+        print("test dates without a rate...")
+        prices = self.prices.iloc[:7].drop(self.prices.index[3])
+        prices.loc[self.prices.index[5], "Adj Close"] = np.nan
+        self.write(prices)
+        # NYSE-style timestamps, at 16:00.
+        stamps = self.prices.index[:7] + pd.Timedelta(hours=16)
+        rf = ut.riskfree_return(stamps)
+        self.assertFalse(rf.isna().any())
+        np.testing.assert_allclose(rf.values, [self.rate(i) for i in [0, 1, 2, 2, 4, 4, 6]])
+        before = ut.riskfree_return(pd.DatetimeIndex(["2005-12-30", "2006-01-02"]))
+        self.assertTrue(np.isnan(before.iloc[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import pandas as pd
+from finpy.financial import signals
+
+class TestCompileOrders(unittest.TestCase):
+    """
+    signals.compile_orders against the buy/sell loop of the Bollinger algo of Sim.
+    """
+    def loop(self, entry, exit, close, cash):
+        orders = []
+        mode = "buy"
+        for i in range(len(close)):
+            if mode == "buy":
+                if entry[i]:
+                    shares = np.floor(cash/close[i])
+                    cash -= shares*close[i]
+                    orders.append((i, "buy", shares, close[i]))
+                    mode = "sell"
+            elif exit[i]:
+                cash += shares*close[i]
+                orders.append((i, "sell", shares, close[i]))
+                mode = "buy"
+        return orders
+
+    def test_compile(self):
+        print("test compile orders...")
+        rng = np.random.default_rng(9)
+        T, N = 300, 6
+        close = 10 + np.cumsum(rng.normal(0, 0.5, size=(T, N)), axis=0).clip(-9)
+        entry = rng.random((T, N)) < 0.05
+        exit = rng.random((T, N)) < 0.05
+        exit[entry] = False
+        close[:20, 5] = np.nan
+        dates = pd.bdate_range("2015-01-01", periods=T)
+        ticks = ["T%d" % n for n in range(N)]
+        orders, trips = signals.compile_orders(entry, exit, close, 10000, ticks, dates)
+        self.assertTrue(orders['date'].is_monotonic_increasing)
+        for n, tick in enumerate(ticks):
+            valid = ~np.isnan(close[:, n])
+            expected = self.loop(entry[:, n] & valid, exit[:, n] & valid, close[:, n], 10000)
+            got = orders[orders['tick'] == tick]
+            self.assertEqual(list(dates[[e[0] for e in expected]]), list(got['date']))
+            self.assertEqual([e[1] for e in expected], list(got['action']))
+            np.testing.assert_allclose([e[2] for e in expected], got['shares'])
+            np.testing.assert_allclose([e[3] for e in expected], got['price'])
+            self.assertEqual(len(trips[trips['tick'] == tick]), sum(e[1] == "buy" for e in expected))
+
+    def test_positions(self):
+        print("test positions...")
+        entry = np.array([0, 1, 1, 0, 0, 1, 0], dtype=bool)
+        exit = np.array([1, 0, 0, 1, 1, 1, 0], dtype=bool)
+        np.testing.assert_array_equal(signals.positions(entry, exit), [0, 1, 1, 0, 0, 0, 0])
+
+if __name__ == '__main__':
+    unittest.main()
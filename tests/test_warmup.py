@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+import datetime as dt
+import numpy as np
+import pandas as pd
+import finpy.utils.fpdateutil as du
+from finpy.financial.portfolio import Portfolio
+
+def stand_in_close(ticks, timestamps, csv_col=None, actions=True):
+    """
+    A stand-in of get_tickdata: the close of a date counts the trading days
+    since 2019-01-02, plus 1000 for B.
+    """
+    pos = du.GTS_DATES.index.get_indexer(pd.DatetimeIndex(timestamps)) - du.GTS_DATES.index.get_loc(pd.Timestamp("2019-01-02"))
+    return dict((t, pd.DataFrame({'close': pos + (1000.0 if t == "B" else 0.0)}, index=timestamps)) for t in ticks)
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.dates = pd.DatetimeIndex(du.getNYSEdays(dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 31), dt.timedelta(hours=16)))
+        close = stand_in_close(["A", "B"], self.dates)
+        self.equities = dict((t, close[t].assign(shares=0.0)) for t in close)
+        patcher = mock.patch("finpy.financial.portfolio.get_tickdata", side_effect=stand_in_close)
+        self.get_tickdata = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prev_days(self):
+        print("test getPrevNNYSEdays...")
+        # 2020-01-01 and 2019-12-25 are holidays.
+        prev = du.getPrevNNYSEdays(pd.Timestamp("2020-01-02 16:00"), 5)
+        self.assertEqual([d.strftime("%Y-%m-%d") for d in prev.index],
+                         ["2019-12-24", "2019-12-26", "2019-12-27", "2019-12-30", "2019-12-31"])
+        prev = du.getPrevNNYSEdays(pd.Timestamp("2020-01-02"), 250)
+        self.assertEqual(len(prev), 250)
+        self.assertEqual(du.GTS_DATES.index.get_loc(pd.Timestamp("2020-01-02")) - du.GTS_DATES.index.get_loc(prev.index[0]), 250)
+        self.assertEqual(len(du.getPrevNNYSEdays(pd.Timestamp("1962-07-09"), 10)), 2)
+
+    def test_load_once(self):
+        print("test the warm-up history loads once...")
+        pf = Portfolio(self.equities, 10000, self.dates, warmup=20)
+        self.assertEqual(self.get_tickdata.call_count, 1)
+        self.assertEqual(pf.warmup, 20)
+        self.assertEqual(self.get_tickdata.call_args[0][0], ["A", "B"])
+        self.assertEqual(len(self.get_tickdata.call_args[0][1]), 20)
+        pf.close_history(20)
+        pf.close_history(5)
+        pf.moving_average(window=10)
+        pf.rolling_normalized_stdev(window=20)
+        pf.RSI(period=5, history=20)
+        pf.up_ratio(days=10)
+        self.assertEqual(self.get_tickdata.call_count, 1)
+
+    def test_prefix(self):
+        print("test close_history...")
+        pf = Portfolio(self.equities, 10000, self.dates, warmup=20)
+        close = pf.close_history(5)
+        self.assertEqual(len(close), 5 + len(self.dates))
+        self.assertEqual([d.strftime("%Y-%m-%d") for d in close.index[:6]],
+                         ["2019-12-24", "2019-12-26", "2019-12-27", "2019-12-30", "2019-12-31", "2020-01-02"])
+        # The closes count the trading days, so the whole history is consecutive.
+        np.testing.assert_array_equal(np.diff(close['A'].values), 1)
+        np.testing.assert_array_equal(close['B'].values - close['A'].values, 1000)
+        pd.testing.assert_frame_equal(pf.close_history(20).iloc[15:], close)
+        self.assertEqual(len(pf.close_history(0)), len(self.dates))
+
+    def test_extend(self):
+        print("test a longer window extends the warm-up history...")
+        pf = Portfolio(self.equities, 10000, self.dates, warmup=20)
+        first = pf.close_history(20).index[0]
+        close = pf.close_history(30)
+        self.assertEqual(self.get_tickdata.call_count, 2)
+        # The second load only reads the 10 days before the first one.
+        extra = pd.DatetimeIndex(self.get_tickdata.call_args[0][1])
+        self.assertEqual(len(extra), 10)
+        self.assertEqual(extra[-1], close.index[9])
+        self.assertEqual(close.index[10], first)
+        np.testing.assert_array_equal(np.diff(close['A'].values), 1)
+        pf.close_history(30)
+        self.assertEqual(self.get_tickdata.call_count, 2)
+
+    def test_indicators(self):
+        print("test the indicators read the warm-up prefix...")
+        pf = Portfolio(self.equities, 10000, self.dates, warmup=20)
+        engine = pf.indicator_engine(10)
+        ma = pf.moving_average(tick="A", window=5)
+        self.assertIs(pf.indicator_engine(15), engine)
+        # The window of the first date has the four warm-up days before it.
+        close = pf.close_history(20)['A']
+        self.assertAlmostEqual(ma.iloc[0], close.iloc[16:21].mean())
+        self.assertAlmostEqual(pf.max_rise(tick="A", date=0, window=5), (close.iloc[20] - close.iloc[15]) / close.iloc[20])
+        self.assertEqual(self.get_tickdata.call_count, 1)
+        pf.moving_average(tick="A", window=25)
+        self.assertIsNot(pf.indicator_engine(25), engine)
+        self.assertEqual(self.get_tickdata.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()